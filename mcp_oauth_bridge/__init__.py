@@ -8,8 +8,27 @@ for developers using MCP servers with AI APIs.
 __version__ = "0.1.0"
 __author__ = "MCP OAuth Bridge Team"
 
+from typing import TYPE_CHECKING, Any
+
 from .config import Config
-from .oauth import OAuthHandler
-from .proxy import ProxyServer
 
-__all__ = ["Config", "OAuthHandler", "ProxyServer"] 
\ No newline at end of file
+if TYPE_CHECKING:
+    from .oauth import OAuthHandler
+    from .proxy import ProxyServer
+
+__all__ = ["Config", "OAuthHandler", "ProxyServer"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import OAuthHandler and ProxyServer on first access
+
+    They pull in requests, cryptography, FastAPI and uvicorn, which the
+    CLI only needs for some commands.
+    """
+    if name == "OAuthHandler":
+        from .oauth import OAuthHandler
+        return OAuthHandler
+    if name == "ProxyServer":
+        from .proxy import ProxyServer
+        return ProxyServer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
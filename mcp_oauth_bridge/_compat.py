@@ -0,0 +1,9 @@
+"""
+Compatibility helpers for the Python versions supported by MCP OAuth Bridge
+"""
+
+import sys
+
+# ``dataclass(slots=True)`` is only available on Python 3.10+; older
+# interpreters fall back to regular ``__dict__``-backed instances
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
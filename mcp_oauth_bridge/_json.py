@@ -0,0 +1,50 @@
+"""
+JSON helpers for MCP OAuth Bridge
+
+Uses orjson when it is installed (``pip install mcp-oauth-bridge[fast]``)
+and falls back to the standard library otherwise. Both paths work on bytes
+so callers can hand the result straight to HTTP clients and files.
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse a JSON document
+
+    Args:
+        data: JSON text, as bytes or str
+
+    Returns:
+        Parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serialize an object to UTF-8 JSON
+    
+    Args:
+        obj: Object to serialize
+        pretty: Indent by two spaces and sort keys, for files people read
+        
+    Returns:
+        JSON document as bytes
+    """
+    if orjson is not None:
+        if pretty:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+        return orjson.dumps(obj)
+    if pretty:
+        return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
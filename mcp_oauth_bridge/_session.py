@@ -0,0 +1,50 @@
+"""
+Shared requests session for MCP OAuth Bridge
+
+Discovery, client registration, token exchange and refresh all talk to the
+same few hosts, so they share one pooled ``requests.Session``. Keep-alive
+connections (and their TLS sessions) are then reused from one step of the
+OAuth flow to the next.
+"""
+
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'MCP-OAuth-Bridge/0.1.0'
+
+# Only idempotent requests are retried: replaying a token POST could spend
+# an authorization code or refresh token twice
+_RETRY_METHODS = frozenset({'GET', 'HEAD'})
+_RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def _retry_policy() -> Retry:
+    """Retry policy for transient failures on metadata requests"""
+    options = dict(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=_RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(allowed_methods=_RETRY_METHODS, **options)
+    except TypeError:  # pragma: no cover - urllib3 < 1.26
+        return Retry(method_whitelist=_RETRY_METHODS, **options)
+
+
+@lru_cache(maxsize=None)
+def get_shared_session() -> requests.Session:
+    """Get the process-wide session used for OAuth HTTP calls
+
+    Returns:
+        Shared, pooled requests session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_retry_policy())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
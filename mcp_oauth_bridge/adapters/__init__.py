@@ -7,5 +7,6 @@ and the MCP protocol, handling the specifics of each platform.
 
 from .openai import OpenAIAdapter
 from .anthropic import AnthropicAdapter
+from .models import AnthropicRequest, OpenAIRequest
 
-__all__ = ["OpenAIAdapter", "AnthropicAdapter"] 
\ No newline at end of file
+__all__ = ["OpenAIAdapter", "AnthropicAdapter", "AnthropicRequest", "OpenAIRequest"] 
\ No newline at end of file
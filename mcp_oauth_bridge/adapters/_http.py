@@ -0,0 +1,239 @@
+"""
+Shared HTTP client and MCP forwarding for MCP OAuth Bridge adapters
+
+All adapters forward MCP calls through a shared, pooled
+``httpx.AsyncClient`` so keep-alive connections (and their TLS sessions) are
+reused across adapters and across requests. There is one such client per
+event loop, since its connections belong to the loop that opened them. The forwarding itself lives in
+``MCPForwarder``, which every adapter extends. Pool limits can be tuned
+with environment variables:
+
+- ``MCP_OAUTH_BRIDGE_MAX_CONNECTIONS`` (default 500)
+- ``MCP_OAUTH_BRIDGE_MAX_KEEPALIVE`` (default 100)
+- ``MCP_OAUTH_BRIDGE_KEEPALIVE_EXPIRY`` seconds (default 30)
+"""
+
+import asyncio
+import importlib.util
+import os
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .. import _json
+from ..tokens import TokenProvider
+
+
+def _env_number(name: str, default: float) -> float:
+    """Read a numeric setting from the environment, falling back to default"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def http2_available() -> bool:
+    """Check whether the optional ``h2`` package needed for HTTP/2 is installed"""
+    return importlib.util.find_spec('h2') is not None
+
+
+# Shared clients keyed by the event loop they were created on
+_shared_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Get the running loop's AsyncClient used for MCP forwarding
+
+    Clients left behind by loops that have since closed are dropped.
+
+    Returns:
+        Shared, pooled HTTP client
+    """
+    loop = asyncio.get_running_loop()
+    client = _shared_clients.get(loop)
+    if client is None or client.is_closed:
+        for stale in [other for other in _shared_clients if other.is_closed()]:
+            del _shared_clients[stale]
+        client = _shared_clients[loop] = _new_client()
+    return client
+
+
+def _new_client() -> httpx.AsyncClient:
+    """Create a pooled AsyncClient with the configured limits"""
+    limits = httpx.Limits(
+        max_keepalive_connections=int(_env_number('MCP_OAUTH_BRIDGE_MAX_KEEPALIVE', 100)),
+        max_connections=int(_env_number('MCP_OAUTH_BRIDGE_MAX_CONNECTIONS', 500)),
+        keepalive_expiry=_env_number('MCP_OAUTH_BRIDGE_KEEPALIVE_EXPIRY', 30.0),
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx.Timeout(30.0),
+        http2=http2_available(),
+    )
+
+
+async def close_shared_client() -> None:
+    """Close the running loop's shared client (call once on shutdown)
+
+    The next get_shared_client() on this loop creates a new client.
+    """
+    client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class MCPForwarder:
+    """Base for adapters: forwards MCP requests over the shared client"""
+    
+    # Headers sent on every MCP call; only copied when a token is added
+    _BASE_HEADERS = MappingProxyType({
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+    })
+    
+    def __init__(self, timeout: int = 30) -> None:
+        """Initialize adapter
+        
+        Args:
+            timeout: Request timeout in seconds
+        """
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP client used for forwarding; the running loop's shared client unless one was assigned"""
+        return self._client if self._client is not None else get_shared_client()
+    
+    @client.setter
+    def client(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit
+
+        The HTTP client is shared across adapters and closed on shutdown
+        via ``close_shared_client``, so there is nothing to release here.
+        """
+    
+    async def forward_to_mcp_server(
+        self, 
+        server_url: str, 
+        mcp_request: Dict[str, Any], 
+        auth_token: Optional[str] = None,
+        token_provider: Optional[TokenProvider] = None
+    ) -> Dict[str, Any]:
+        """Forward request to MCP server
+        
+        Args:
+            server_url: MCP server URL
+            mcp_request: MCP-formatted request
+            auth_token: OAuth token for authorization
+            token_provider: Async callable supplying the token; takes
+                precedence over auth_token and lets refreshes happen ahead
+                of expiry instead of after a 401
+            
+        Returns:
+            MCP server response
+        """
+        if token_provider is not None:
+            auth_token = await token_provider()
+        
+        headers = self._BASE_HEADERS if not auth_token else {
+            **self._BASE_HEADERS,
+            'Authorization': f'Bearer {auth_token}',
+        }
+        
+        try:
+            async with self.client.stream(
+                'POST',
+                server_url,
+                content=_json.dumps(mcp_request),
+                headers=headers,
+                timeout=self.timeout
+            ) as response:
+                status = response.status_code
+                
+                # Read the body incrementally into one buffer and parse it
+                # once, rather than letting httpx buffer it separately
+                body = bytearray()
+                async for chunk in response.aiter_bytes(65536):
+                    body.extend(chunk)
+        except Exception as e:
+            raise ValueError(f"MCP server request failed: {e}")
+        
+        if status == 401:
+            # Token might be expired, let the proxy handle refresh
+            raise ValueError("Authentication failed - token may need refresh")
+        if status >= 400:
+            detail = body[:200].decode('utf-8', 'replace')
+            raise ValueError(f"MCP server {status}: {detail}")
+        
+        try:
+            return _json.loads(body)
+        except ValueError as e:
+            raise ValueError(f"MCP server request failed: {e}")
+    
+    async def forward_many(
+        self,
+        mcp_requests: List[Dict[str, Any]],
+        auth_tokens: Dict[str, str],
+        max_concurrent: int = 8,
+        stop_on_error: bool = False,
+        token_providers: Optional[Dict[str, TokenProvider]] = None
+    ) -> List[Any]:
+        """Forward several MCP requests concurrently
+        
+        Args:
+            mcp_requests: Requests as produced by the adapter's convert method
+            auth_tokens: OAuth tokens keyed by server name
+            max_concurrent: Maximum number of requests in flight at once
+            stop_on_error: Cancel outstanding requests and raise on first failure
+            token_providers: Token providers keyed by server name, used in
+                preference to auth_tokens
+            
+        Returns:
+            Responses in the same order as mcp_requests; when stop_on_error is
+            False, failed requests are returned as their exception
+        """
+        if not mcp_requests:
+            return []
+        
+        semaphore = asyncio.Semaphore(max_concurrent)
+        token_providers = token_providers or {}
+        
+        async def forward(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.forward_to_mcp_server(
+                    item['server_url'],
+                    item['request'],
+                    auth_tokens.get(item['server_name']),
+                    token_providers.get(item['server_name'])
+                )
+        
+        if not stop_on_error:
+            return await asyncio.gather(
+                *(forward(item) for item in mcp_requests),
+                return_exceptions=True
+            )
+        
+        tasks = [asyncio.ensure_future(forward(item)) for item in mcp_requests]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+        
+        return [task.result() for task in tasks]
@@ -5,31 +5,33 @@ Handles translation between Anthropic Messages API format and MCP protocol.
 Supports Anthropic's MCP server integration patterns.
 """
 
-from typing import Dict, Any, Optional, List
-import httpx
-import json
-from urllib.parse import urljoin
+import uuid
+from typing import Dict, Any, Optional, List, Union
 
+from ..approvals import now_iso
+from ._http import MCPForwarder
+from .models import AnthropicRequest
 
-class AnthropicAdapter:
+# Top-level request fields that identify an Anthropic Messages API request
+_ANTHROPIC_FIELDS = frozenset({
+    'messages', 'system', 'max_tokens', 'stop_sequences',
+    'temperature', 'top_p', 'top_k'
+})
+
+
+class AnthropicAdapter(MCPForwarder):
     """Adapter for Anthropic Messages API format"""
     
-    def __init__(self, timeout: int = 30) -> None:
-        """Initialize Anthropic adapter
+    def parse_request(self, raw_body: Union[bytes, str]) -> AnthropicRequest:
+        """Parse and validate a raw Anthropic request body in one pass
         
         Args:
-            timeout: Request timeout in seconds
+            raw_body: JSON request body
+            
+        Returns:
+            Validated Anthropic request
         """
-        self.timeout = timeout
-        self.client = httpx.AsyncClient()
-    
-    async def __aenter__(self):
-        """Async context manager entry"""
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit"""
-        await self.client.aclose()
+        return AnthropicRequest.model_validate_json(raw_body)
     
     def detect_anthropic_request(self, request_data: Dict[str, Any]) -> bool:
         """Detect if this is an Anthropic-style request
@@ -44,122 +46,67 @@ class AnthropicAdapter:
         if 'mcp_servers' in request_data:
             return True
         
-        # Check for other Anthropic-specific fields
-        anthropic_fields = [
-            'messages', 'system', 'max_tokens', 'stop_sequences',
-            'temperature', 'top_p', 'top_k'
-        ]
-        
         # Must have messages field for Anthropic
         if 'messages' not in request_data:
             return False
         
-        return any(field in request_data for field in anthropic_fields)
+        # Check for other Anthropic-specific fields
+        return not _ANTHROPIC_FIELDS.isdisjoint(request_data)
     
-    def extract_mcp_server_info(self, request_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def extract_mcp_server_info(
+        self, request_data: Union[AnthropicRequest, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """Extract MCP server information from Anthropic request
         
         Args:
-            request_data: Anthropic request data
+            request_data: Anthropic request (model or raw dict)
             
         Returns:
             List of MCP server configurations
         """
-        servers = []
-        mcp_servers = request_data.get('mcp_servers', [])
-        
-        for server in mcp_servers:
-            if isinstance(server, dict):
-                server_info = {
-                    'name': server.get('name', 'unknown'),
-                    'url': server.get('url'),
-                    'type': server.get('type', 'url'),
-                    'require_approval': 'always',  # Default for Anthropic
-                }
-                if server_info['url']:
-                    servers.append(server_info)
-        
-        return servers
+        # Filter on the URL before building each server dict
+        return [
+            {
+                'name': server.name,
+                'url': server.url,
+                'type': server.type,
+                'require_approval': 'always',  # Default for Anthropic
+            }
+            for server in AnthropicRequest.coerce(request_data).mcp_servers or ()
+            if server.url
+        ]
     
-    def extract_user_message(self, request_data: Dict[str, Any]) -> str:
+    def extract_user_message(self, request_data: Union[AnthropicRequest, Dict[str, Any]]) -> str:
         """Extract user message from Anthropic messages format
         
         Args:
-            request_data: Anthropic request data
+            request_data: Anthropic request (model or raw dict)
             
         Returns:
             Combined user message text
         """
-        messages = request_data.get('messages', [])
-        user_messages = []
-        
-        for message in messages:
-            if isinstance(message, dict) and message.get('role') == 'user':
-                content = message.get('content', '')
-                if isinstance(content, list):
-                    # Handle content blocks
-                    text_parts = []
-                    for block in content:
-                        if isinstance(block, dict) and block.get('type') == 'text':
-                            text_parts.append(block.get('text', ''))
-                    content = ' '.join(text_parts)
-                user_messages.append(str(content))
-        
-        return ' '.join(user_messages)
+        # Plain string content is validated into a single text block
+        return ' '.join(
+            block.text or ''
+            for message in AnthropicRequest.coerce(request_data).messages
+            if message.role == 'user'
+            for block in message.content
+            if block.type == 'text'
+        )
     
-    async def forward_to_mcp_server(
-        self, 
-        server_url: str, 
-        mcp_request: Dict[str, Any], 
-        auth_token: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Forward request to MCP server
-        
-        Args:
-            server_url: MCP server URL
-            mcp_request: MCP-formatted request
-            auth_token: OAuth token for authorization
-            
-        Returns:
-            MCP server response
-        """
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
-        
-        if auth_token:
-            headers['Authorization'] = f'Bearer {auth_token}'
-        
-        try:
-            response = await self.client.post(
-                server_url,
-                json=mcp_request,
-                headers=headers,
-                timeout=self.timeout
-            )
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                # Token might be expired, let the proxy handle refresh
-                raise ValueError("Authentication failed - token may need refresh")
-            raise
-        except Exception as e:
-            raise ValueError(f"MCP server request failed: {e}")
-    
-    def convert_anthropic_to_mcp(self, anthropic_request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def convert_anthropic_to_mcp(
+        self, anthropic_request: Union[AnthropicRequest, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """Convert Anthropic request to MCP format
         
         Args:
-            anthropic_request: Anthropic Messages API request
+            anthropic_request: Anthropic Messages API request (model or raw dict)
             
         Returns:
             List of MCP requests to send to servers
         """
         mcp_requests = []
+        anthropic_request = AnthropicRequest.coerce(anthropic_request)
         
         # Extract user input from messages
         user_input = self.extract_user_message(anthropic_request)
@@ -180,10 +127,10 @@ class AnthropicAdapter:
                     'arguments': {
                         'user_input': user_input,
                         'context': {
-                            'model': anthropic_request.get('model'),
-                            'system': anthropic_request.get('system'),
-                            'max_tokens': anthropic_request.get('max_tokens'),
-                            'temperature': anthropic_request.get('temperature'),
+                            'model': anthropic_request.model,
+                            'system': anthropic_request.system,
+                            'max_tokens': anthropic_request.max_tokens,
+                            'temperature': anthropic_request.temperature,
                         }
                     }
                 }
@@ -201,17 +148,23 @@ class AnthropicAdapter:
     def convert_mcp_to_anthropic(
         self, 
         mcp_responses: List[Dict[str, Any]], 
-        original_request: Dict[str, Any]
+        original_request: Union[AnthropicRequest, Dict[str, Any]],
+        user_input: Optional[str] = None
     ) -> Dict[str, Any]:
         """Convert MCP responses back to Anthropic format
         
         Args:
             mcp_responses: List of MCP server responses
-            original_request: Original Anthropic request
+            original_request: Original Anthropic request (model or raw dict)
+            user_input: User message already extracted by convert_anthropic_to_mcp
+                (the 'user_input' argument of the MCP requests); re-extracted
+                from original_request when omitted
             
         Returns:
             Anthropic Messages API response
         """
+        original_request = AnthropicRequest.coerce(original_request)
+        
         # Combine all MCP responses into a single assistant message
         content_parts = []
         
@@ -228,7 +181,7 @@ class AnthropicAdapter:
         response_content = '\n\n'.join(content_parts) if content_parts else "No valid responses from MCP servers"
         
         response = {
-            'id': f'msg_{hash(str(original_request))}',
+            'id': f'msg_{uuid.uuid4().hex}',
             'type': 'message',
             'role': 'assistant',
             'content': [
@@ -237,14 +190,16 @@ class AnthropicAdapter:
                     'text': response_content
                 }
             ],
-            'model': original_request.get('model', 'claude-3-sonnet-20240229'),
+            'model': original_request.model or 'claude-3-sonnet-20240229',
             'stop_reason': 'end_turn',
             'stop_sequence': None,
         }
         
         # Add usage information
+        if user_input is None:
+            user_input = self.extract_user_message(original_request)
         response['usage'] = {
-            'input_tokens': self._estimate_tokens(self.extract_user_message(original_request)),
+            'input_tokens': self._estimate_tokens(user_input),
             'output_tokens': self._estimate_tokens(response_content),
         }
         
@@ -260,7 +215,7 @@ class AnthropicAdapter:
             Estimated token count
         """
         # Very rough estimation: ~4 characters per token
-        return max(1, len(text) // 4)
+        return max(1, len(text) >> 2)
     
     def build_approval_request(self, mcp_request: Dict[str, Any], server_name: str) -> Dict[str, Any]:
         """Build approval request for Anthropic format
@@ -273,11 +228,11 @@ class AnthropicAdapter:
             Approval request data
         """
         return {
-            'id': f'approval_{hash(str(mcp_request))}',
+            'id': f'approval_{uuid.uuid4().hex}',
             'type': 'tool_approval',
             'server_name': server_name,
             'tool_name': mcp_request['params'].get('name', 'unknown'),
             'arguments': mcp_request['params'].get('arguments', {}),
             'description': f"Tool call to {server_name}: {mcp_request['params'].get('name')}",
-            'timestamp': __import__('datetime').datetime.now().isoformat(),
+            'timestamp': now_iso(),
         } 
\ No newline at end of file
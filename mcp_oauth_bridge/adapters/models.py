@@ -0,0 +1,121 @@
+"""
+Request models for the API adapters
+
+Pydantic models for the parts of OpenAI and Anthropic requests the adapters
+read. Raw request bodies are parsed and validated in a single pass with
+``model_validate_json``; unknown fields are kept so nothing the client sent
+is lost. List entries (tools, servers, messages, content blocks) are
+validated one by one, and entries that are not objects or do not fit are
+skipped rather than failing the whole request.
+"""
+
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+
+_Model = TypeVar('_Model', bound='_RequestModel')
+
+
+class _RequestModel(BaseModel):
+    """Base model that keeps fields it does not declare"""
+
+    model_config = ConfigDict(extra='allow')
+
+    @classmethod
+    def coerce(cls: Type[_Model], data: Union[_Model, Dict[str, Any]]) -> _Model:
+        """Validate a request dict into this model (models pass through)"""
+        if isinstance(data, cls):
+            return data
+        return cls.model_validate(data)
+
+
+def _valid_entries(model: Type[_Model], value: Any) -> Any:
+    """Validate the entries of a list field, dropping those that do not fit"""
+    if not isinstance(value, list):
+        return value
+    entries = []
+    for entry in value:
+        if isinstance(entry, model):
+            entries.append(entry)
+        elif isinstance(entry, dict):
+            try:
+                entries.append(model.model_validate(entry))
+            except ValidationError:
+                continue
+    return entries
+
+
+class ContentBlock(_RequestModel):
+    """Anthropic message content block"""
+
+    type: str = 'text'
+    text: Optional[str] = None
+
+
+class Message(_RequestModel):
+    """Anthropic message"""
+
+    role: Optional[str] = None
+    content: List[ContentBlock] = []
+
+    @field_validator('content', mode='before')
+    @classmethod
+    def _wrap_plain_text(cls, value: Any) -> Any:
+        """Accept plain (or other non-list) content as a single text block"""
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            return [ContentBlock(text=str(value))]
+        return _valid_entries(ContentBlock, value)
+
+
+class MCPServerSpec(_RequestModel):
+    """Entry of the Anthropic ``mcp_servers`` list"""
+
+    name: Optional[str] = 'unknown'
+    url: Optional[str] = None
+    type: Optional[str] = 'url'
+
+
+class AnthropicRequest(_RequestModel):
+    """Anthropic Messages API request"""
+
+    model: Optional[str] = None
+    messages: List[Message] = []
+    mcp_servers: Optional[List[MCPServerSpec]] = None
+    system: Optional[Any] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+    @field_validator('messages', mode='before')
+    @classmethod
+    def _valid_messages(cls, value: Any) -> Any:
+        return _valid_entries(Message, value)
+
+    @field_validator('mcp_servers', mode='before')
+    @classmethod
+    def _valid_servers(cls, value: Any) -> Any:
+        return _valid_entries(MCPServerSpec, value)
+
+
+class OpenAITool(_RequestModel):
+    """Entry of the OpenAI ``tools`` list"""
+
+    type: Optional[str] = None
+    server_label: Optional[str] = 'unknown'
+    server_url: Optional[str] = None
+    require_approval: Any = 'always'
+
+
+class OpenAIRequest(_RequestModel):
+    """OpenAI Responses API request"""
+
+    model: Optional[str] = None
+    input: Any = ''
+    tools: Optional[List[OpenAITool]] = None
+
+    @field_validator('tools', mode='before')
+    @classmethod
+    def _valid_tools(cls, value: Any) -> Any:
+        return _valid_entries(OpenAITool, value)
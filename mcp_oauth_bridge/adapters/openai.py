@@ -5,31 +5,33 @@ Handles translation between OpenAI Responses API format and MCP protocol.
 Supports OpenAI's MCP tool integration patterns.
 """
 
-from typing import Dict, Any, Optional, List
-import httpx
-import json
-from urllib.parse import urljoin
+import uuid
+from typing import Dict, Any, List, Union
 
+from ..approvals import now_iso
+from ._http import MCPForwarder
+from .models import OpenAIRequest
 
-class OpenAIAdapter:
+# Top-level request fields that identify an OpenAI Responses API request
+_OPENAI_FIELDS = frozenset({
+    'model', 'input', 'response_format', 'tool_choice',
+    'require_approval', 'server_label', 'server_url'
+})
+
+
+class OpenAIAdapter(MCPForwarder):
     """Adapter for OpenAI Responses API format"""
     
-    def __init__(self, timeout: int = 30) -> None:
-        """Initialize OpenAI adapter
+    def parse_request(self, raw_body: Union[bytes, str]) -> OpenAIRequest:
+        """Parse and validate a raw OpenAI request body in one pass
         
         Args:
-            timeout: Request timeout in seconds
+            raw_body: JSON request body
+            
+        Returns:
+            Validated OpenAI request
         """
-        self.timeout = timeout
-        self.client = httpx.AsyncClient()
-    
-    async def __aenter__(self):
-        """Async context manager entry"""
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit"""
-        await self.client.aclose()
+        return OpenAIRequest.model_validate_json(raw_body)
     
     def detect_openai_request(self, request_data: Dict[str, Any]) -> bool:
         """Detect if this is an OpenAI-style request
@@ -50,93 +52,46 @@ class OpenAIAdapter:
                         return True
         
         # Check for other OpenAI-specific fields
-        openai_fields = [
-            'model', 'input', 'response_format', 'tool_choice',
-            'require_approval', 'server_label', 'server_url'
-        ]
-        
-        return any(field in request_data for field in openai_fields)
+        return not _OPENAI_FIELDS.isdisjoint(request_data)
     
-    def extract_mcp_server_info(self, request_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def extract_mcp_server_info(
+        self, request_data: Union[OpenAIRequest, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """Extract MCP server information from OpenAI request
         
         Args:
-            request_data: OpenAI request data
+            request_data: OpenAI request (model or raw dict)
             
         Returns:
             List of MCP server configurations
         """
-        servers = []
-        tools = request_data.get('tools', [])
-        
-        for tool in tools:
-            if isinstance(tool, dict) and tool.get('type') == 'mcp':
-                server_info = {
-                    'name': tool.get('server_label', 'unknown'),
-                    'url': tool.get('server_url'),
-                    'require_approval': tool.get('require_approval', 'always'),
-                }
-                if server_info['url']:
-                    servers.append(server_info)
-        
-        return servers
-    
-    async def forward_to_mcp_server(
-        self, 
-        server_url: str, 
-        mcp_request: Dict[str, Any], 
-        auth_token: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Forward request to MCP server
-        
-        Args:
-            server_url: MCP server URL
-            mcp_request: MCP-formatted request
-            auth_token: OAuth token for authorization
-            
-        Returns:
-            MCP server response
-        """
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
-        
-        if auth_token:
-            headers['Authorization'] = f'Bearer {auth_token}'
-        
-        try:
-            response = await self.client.post(
-                server_url,
-                json=mcp_request,
-                headers=headers,
-                timeout=self.timeout
-            )
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                # Token might be expired, let the proxy handle refresh
-                raise ValueError("Authentication failed - token may need refresh")
-            raise
-        except Exception as e:
-            raise ValueError(f"MCP server request failed: {e}")
+        # Filter on the URL before building each server dict
+        return [
+            {
+                'name': tool.server_label,
+                'url': tool.server_url,
+                'require_approval': tool.require_approval,
+            }
+            for tool in OpenAIRequest.coerce(request_data).tools or ()
+            if tool.type == 'mcp' and tool.server_url
+        ]
     
-    def convert_openai_to_mcp(self, openai_request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def convert_openai_to_mcp(
+        self, openai_request: Union[OpenAIRequest, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         """Convert OpenAI request to MCP format
         
         Args:
-            openai_request: OpenAI Responses API request
+            openai_request: OpenAI Responses API request (model or raw dict)
             
         Returns:
             List of MCP requests to send to servers
         """
         mcp_requests = []
+        openai_request = OpenAIRequest.coerce(openai_request)
         
         # Extract input/prompt from OpenAI request
-        user_input = openai_request.get('input', '')
+        user_input = openai_request.input
         if not user_input:
             return mcp_requests
         
@@ -154,7 +109,7 @@ class OpenAIAdapter:
                     'arguments': {
                         'user_input': user_input,
                         'context': {
-                            'model': openai_request.get('model'),
+                            'model': openai_request.model,
                             'require_approval': server.get('require_approval', 'always'),
                         }
                     }
@@ -173,23 +128,25 @@ class OpenAIAdapter:
     def convert_mcp_to_openai(
         self, 
         mcp_responses: List[Dict[str, Any]], 
-        original_request: Dict[str, Any]
+        original_request: Union[OpenAIRequest, Dict[str, Any]]
     ) -> Dict[str, Any]:
         """Convert MCP responses back to OpenAI format
         
         Args:
             mcp_responses: List of MCP server responses
-            original_request: Original OpenAI request
+            original_request: Original OpenAI request (model or raw dict)
             
         Returns:
             OpenAI Responses API response
         """
+        original_request = OpenAIRequest.coerce(original_request)
+        
         # Build OpenAI response format
         response = {
-            'id': f'resp_{hash(str(original_request))}',
+            'id': f'resp_{uuid.uuid4().hex}',
             'object': 'response',
             'created': int(__import__('time').time()),
-            'model': original_request.get('model', 'gpt-4'),
+            'model': original_request.model or 'gpt-4',
         }
         
         # Process MCP responses into choices
@@ -236,7 +193,7 @@ class OpenAIAdapter:
         
         # Add usage information
         response['usage'] = {
-            'prompt_tokens': len(original_request.get('input', '').split()),
+            'prompt_tokens': len(str(original_request.input or '').split()),
             'completion_tokens': sum(
                 len(choice['message']['content'].split()) 
                 for choice in response['choices']
@@ -261,11 +218,11 @@ class OpenAIAdapter:
             Approval request data
         """
         return {
-            'id': f'approval_{hash(str(mcp_request))}',
+            'id': f'approval_{uuid.uuid4().hex}',
             'type': 'tool_approval',
             'server_name': server_name,
             'tool_name': mcp_request['params'].get('name', 'unknown'),
             'arguments': mcp_request['params'].get('arguments', {}),
             'description': f"Tool call to {server_name}: {mcp_request['params'].get('name')}",
-            'timestamp': __import__('datetime').datetime.now().isoformat(),
+            'timestamp': now_iso(),
         } 
\ No newline at end of file
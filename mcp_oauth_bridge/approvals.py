@@ -6,13 +6,38 @@ Provides a web UI for approving or denying tool calls.
 """
 
 import asyncio
+import logging
+import time
 import uuid
-from typing import Dict, Any, Optional, List, Callable
-from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, List, Callable, Set
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
 import json
 
+from ._compat import DATACLASS_SLOTS
+
+logger = logging.getLogger(__name__)
+
+# Last formatted timestamp as [epoch, iso string]
+_ts_cache: List[Any] = [0.0, ""]
+
+
+def now_iso() -> str:
+    """Current UTC time as an ISO 8601 string
+    
+    The formatted value is reused for 50 ms, so a burst of approvals does
+    not format a new datetime for every request.
+    
+    Returns:
+        ISO 8601 timestamp
+    """
+    now = time.time()
+    if now - _ts_cache[0] > 0.05:
+        _ts_cache[0] = now
+        _ts_cache[1] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+    return _ts_cache[1]
+
 
 class ApprovalStatus(str, Enum):
     """Status of an approval request"""
@@ -22,7 +47,7 @@ class ApprovalStatus(str, Enum):
     EXPIRED = "expired"
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ApprovalRequest:
     """Approval request data structure"""
     id: str
@@ -34,23 +59,31 @@ class ApprovalRequest:
     status: ApprovalStatus = ApprovalStatus.PENDING
     expires_at: Optional[str] = None
     approved_by: Optional[str] = None
+    expires_at_epoch: Optional[float] = None
     
     def is_expired(self) -> bool:
         """Check if approval request has expired"""
-        if not self.expires_at:
-            return False
-        
-        try:
-            expiry = datetime.fromisoformat(self.expires_at.replace('Z', '+00:00'))
-            return datetime.now(timezone.utc) >= expiry
-        except (ValueError, AttributeError):
+        if self.expires_at_epoch is None:
             return False
+        return time.time() >= self.expires_at_epoch
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['status'] = self.status.value
-        return data
+        """Convert to dictionary for JSON serialization
+        
+        ``arguments`` is returned by reference rather than deep-copied;
+        treat the result as read-only.
+        """
+        return {
+            'id': self.id,
+            'server_name': self.server_name,
+            'tool_name': self.tool_name,
+            'arguments': self.arguments,
+            'description': self.description,
+            'timestamp': self.timestamp,
+            'status': self.status.value,
+            'expires_at': self.expires_at,
+            'approved_by': self.approved_by,
+        }
 
 
 class ApprovalManager:
@@ -66,14 +99,45 @@ class ApprovalManager:
         self.pending_requests: Dict[str, ApprovalRequest] = {}
         self.approval_futures: Dict[str, asyncio.Future] = {}
         self.approval_callbacks: List[Callable[[ApprovalRequest], None]] = []
+        self._blocking_callbacks: Set[Callable[[ApprovalRequest], None]] = set()
+        self._callback_futures: Set[asyncio.Future] = set()
+        # One timer per pending request that expires it when due
+        self._expiry_handles: Dict[str, asyncio.TimerHandle] = {}
+        # Number of tracked requests in each status, kept current on every
+        # transition so stats never scan the requests
+        self._counts: Dict[ApprovalStatus, int] = {status: 0 for status in ApprovalStatus}
     
-    def add_approval_callback(self, callback: Callable[[ApprovalRequest], None]) -> None:
+    def _set_status(self, request: ApprovalRequest, status: ApprovalStatus) -> None:
+        """Move a tracked request to a new status and update the counts"""
+        self._counts[request.status] -= 1
+        self._counts[status] += 1
+        request.status = status
+    
+    def add_approval_callback(
+        self,
+        callback: Callable[[ApprovalRequest], Any],
+        blocking: bool = False
+    ) -> None:
         """Add callback to be notified of approval events
         
+        Coroutine functions are scheduled as tasks on the running loop.
+        Plain functions are called inline unless ``blocking`` is set, in
+        which case they run in the default executor. Deferred callbacks see
+        the request as it is when they run.
+        
         Args:
             callback: Function to call when approval status changes
+            blocking: Whether the callback does blocking I/O
         """
         self.approval_callbacks.append(callback)
+        if blocking:
+            self._blocking_callbacks.add(callback)
+    
+    def _on_callback_done(self, future: asyncio.Future) -> None:
+        """Report errors from callbacks that ran in the background"""
+        self._callback_futures.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("⚠️  Approval callback error: %s", future.exception())
     
     def _notify_callbacks(self, request: ApprovalRequest) -> None:
         """Notify all callbacks of approval status change
@@ -83,9 +147,21 @@ class ApprovalManager:
         """
         for callback in self.approval_callbacks:
             try:
-                callback(request)
+                if asyncio.iscoroutinefunction(callback):
+                    loop = asyncio.get_running_loop()
+                    future = loop.create_task(callback(request))
+                elif callback in self._blocking_callbacks:
+                    loop = asyncio.get_running_loop()
+                    future = loop.run_in_executor(None, callback, request)
+                else:
+                    callback(request)
+                    continue
+                
+                # Keep a reference until done so the task isn't collected
+                self._callback_futures.add(future)
+                future.add_done_callback(self._on_callback_done)
             except Exception as e:
-                print(f"⚠️  Approval callback error: {e}")
+                logger.warning("⚠️  Approval callback error: %s", e)
     
     async def request_approval(
         self, 
@@ -111,9 +187,9 @@ class ApprovalManager:
         timeout = timeout_minutes or self.default_timeout_minutes
         
         # Calculate expiry time
-        expires_at = datetime.now(timezone.utc)
+        expiry_epoch = time.time() + timeout * 60
+        expires_at = datetime.fromtimestamp(expiry_epoch, timezone.utc)
         expires_at = expires_at.replace(microsecond=0)  # Remove microseconds for cleaner timestamps
-        expires_at = expires_at.replace(second=expires_at.second + (timeout * 60))
         
         # Create approval request
         request = ApprovalRequest(
@@ -122,36 +198,37 @@ class ApprovalManager:
             tool_name=tool_name,
             arguments=arguments,
             description=description,
-            timestamp=datetime.now(timezone.utc).isoformat(),
-            expires_at=expires_at.isoformat()
+            timestamp=now_iso(),
+            expires_at=expires_at.isoformat(),
+            expires_at_epoch=expiry_epoch
         )
         
-        # Store request and create future for waiting
+        # Store request, create future for waiting and schedule expiry
+        loop = asyncio.get_running_loop()
         self.pending_requests[request_id] = request
-        future = asyncio.Future()
+        self._counts[request.status] += 1
+        future = loop.create_future()
         self.approval_futures[request_id] = future
+        self._expiry_handles[request_id] = loop.call_later(
+            timeout * 60, self._expire_request, request_id
+        )
         
-        print(f"🔔 Approval required for {server_name}.{tool_name}")
-        print(f"📋 Request ID: {request_id}")
-        print(f"📋 Description: {description}")
-        print(f"⏰ Expires at: {expires_at.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+        logger.info("🔔 Approval required for %s.%s", server_name, tool_name)
+        logger.info("📋 Request ID: %s", request_id)
+        logger.info("📋 Description: %s", description)
+        logger.info("⏰ Expires at: %s", expires_at.strftime('%Y-%m-%d %H:%M:%S UTC'))
         
         # Notify callbacks
         self._notify_callbacks(request)
         
         try:
-            # Wait for approval or timeout
-            result = await asyncio.wait_for(future, timeout=timeout * 60)
-            return result
-        except asyncio.TimeoutError:
-            # Mark as expired
-            request.status = ApprovalStatus.EXPIRED
-            self._notify_callbacks(request)
-            print(f"⏰ Approval request {request_id} expired")
-            return False
+            # Resolved by approve/deny, or with False by the expiry timer
+            return await future
         finally:
             # Clean up
-            self.pending_requests.pop(request_id, None)
+            self._cancel_expiry(request_id)
+            if self.pending_requests.pop(request_id, None) is not None:
+                self._counts[request.status] -= 1
             self.approval_futures.pop(request_id, None)
     
     def approve_request(self, request_id: str, approved_by: str = "user") -> bool:
@@ -169,12 +246,13 @@ class ApprovalManager:
             return False
         
         if request.is_expired():
-            request.status = ApprovalStatus.EXPIRED
-            self._notify_callbacks(request)
+            self._cancel_expiry(request_id)
+            self._expire_request(request_id)
             return False
         
         # Approve the request
-        request.status = ApprovalStatus.APPROVED
+        self._cancel_expiry(request_id)
+        self._set_status(request, ApprovalStatus.APPROVED)
         request.approved_by = approved_by
         
         # Resolve the future
@@ -182,7 +260,7 @@ class ApprovalManager:
         if future and not future.done():
             future.set_result(True)
         
-        print(f"✅ Approved: {request.server_name}.{request.tool_name} by {approved_by}")
+        logger.info("✅ Approved: %s.%s by %s", request.server_name, request.tool_name, approved_by)
         self._notify_callbacks(request)
         return True
     
@@ -201,7 +279,8 @@ class ApprovalManager:
             return False
         
         # Deny the request
-        request.status = ApprovalStatus.DENIED
+        self._cancel_expiry(request_id)
+        self._set_status(request, ApprovalStatus.DENIED)
         request.approved_by = denied_by
         
         # Resolve the future
@@ -209,7 +288,7 @@ class ApprovalManager:
         if future and not future.done():
             future.set_result(False)
         
-        print(f"❌ Denied: {request.server_name}.{request.tool_name} by {denied_by}")
+        logger.info("❌ Denied: %s.%s by %s", request.server_name, request.tool_name, denied_by)
         self._notify_callbacks(request)
         return True
     
@@ -219,9 +298,6 @@ class ApprovalManager:
         Returns:
             List of pending requests
         """
-        # Clean up expired requests first
-        self._cleanup_expired_requests()
-        
         return [
             request for request in self.pending_requests.values()
             if request.status == ApprovalStatus.PENDING
@@ -238,24 +314,32 @@ class ApprovalManager:
         """
         return self.pending_requests.get(request_id)
     
-    def _cleanup_expired_requests(self) -> None:
-        """Clean up expired requests"""
-        expired_ids = []
+    def _cancel_expiry(self, request_id: str) -> None:
+        """Cancel the expiry timer of a request, if it is still scheduled"""
+        handle = self._expiry_handles.pop(request_id, None)
+        if handle is not None:
+            handle.cancel()
+    
+    def _expire_request(self, request_id: str) -> None:
+        """Expire a request whose timeout has elapsed (expiry timer callback)
         
-        for request_id, request in self.pending_requests.items():
-            if request.status == ApprovalStatus.PENDING and request.is_expired():
-                request.status = ApprovalStatus.EXPIRED
-                
-                # Resolve future with False
-                future = self.approval_futures.get(request_id)
-                if future and not future.done():
-                    future.set_result(False)
-                
-                expired_ids.append(request_id)
-                self._notify_callbacks(request)
+        Args:
+            request_id: ID of the request to expire
+        """
+        self._expiry_handles.pop(request_id, None)
+        request = self.pending_requests.get(request_id)
+        if not request or request.status != ApprovalStatus.PENDING:
+            return
+        
+        self._set_status(request, ApprovalStatus.EXPIRED)
         
-        for request_id in expired_ids:
-            print(f"⏰ Cleaned up expired approval request: {request_id}")
+        # Resolve future with False
+        future = self.approval_futures.get(request_id)
+        if future and not future.done():
+            future.set_result(False)
+        
+        self._notify_callbacks(request)
+        logger.info("⏰ Approval request %s expired", request_id)
     
     def get_approval_stats(self) -> Dict[str, int]:
         """Get approval statistics
@@ -263,23 +347,8 @@ class ApprovalManager:
         Returns:
             Dictionary with approval stats
         """
-        stats = {
-            'pending': 0,
-            'approved': 0,
-            'denied': 0,
-            'expired': 0,
-            'total': len(self.pending_requests)
-        }
-        
-        for request in self.pending_requests.values():
-            if request.status == ApprovalStatus.PENDING:
-                if request.is_expired():
-                    stats['expired'] += 1
-                else:
-                    stats['pending'] += 1
-            else:
-                stats[request.status.value] += 1
-        
+        stats = {status.value: count for status, count in self._counts.items()}
+        stats['total'] = len(self.pending_requests)
         return stats
 
 
@@ -8,27 +8,85 @@ Provides commands for:
 - Managing servers and tokens
 """
 
-import asyncio
-import os
+import atexit
+import queue
 import sys
 import logging
+import logging.handlers
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TextIO
 
 import click
-import uvicorn
 
 from .config import Config, ServerConfig, ApprovalPolicy
-from .oauth import OAuthHandler
-from .discovery import OAuthDiscovery
-from .proxy import ProxyServer, run_proxy_server
-from .tokens import TokenManager, TokenData
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+
+# OAuth, token, HTTP and ASGI modules are imported inside the commands that
+# use them, so read-only commands like list start without loading them
+
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_log_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def _setup_logging(stream: Optional[TextIO] = None) -> logging.handlers.QueueListener:
+    """Route log records through a queue so emitting never blocks on stderr
+
+    Records are enqueued by a QueueHandler and written by a listener thread.
+    Only the listener's handler formats them; the QueueHandler keeps its
+    default formatter, which leaves the message as is. Later calls reuse the
+    listener started by the first one.
+
+    Args:
+        stream: Stream to write to, defaults to stderr
+
+    Returns:
+        The running queue listener
+    """
+    global _log_listener, _log_handler
+    if _log_listener is not None:
+        return _log_listener
+    
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(_stop_logging)
+    
+    root = logging.getLogger()
+    _log_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(_log_handler)
+    root.setLevel(logging.INFO)
+    _log_listener = listener
+    return listener
+
+
+def _stop_logging() -> None:
+    """Write out queued records and undo _setup_logging"""
+    global _log_listener, _log_handler
+    listener, _log_listener = _log_listener, None
+    handler, _log_handler = _log_handler, None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+
+
+def _use_uvloop() -> None:
+    """Run asyncio on uvloop when it is installed (it does not support Windows)"""
+    if sys.platform == 'win32':
+        return
+    try:
+        import uvloop
+    except ImportError:
+        return
+    
+    import asyncio
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,7 +94,9 @@ logger = logging.getLogger(__name__)
 @click.version_option()
 def main():
     """MCP OAuth Bridge - Local OAuth bridge for MCP servers supporting OpenAI and Anthropic APIs"""
-    pass
+    _setup_logging()
+    # Every asyncio.run() in the commands below picks up the policy
+    _use_uvloop()
 
 
 @main.command()
@@ -58,6 +118,7 @@ def init(config_dir: Optional[str]):
         click.echo(f"🔧 Config file: {config.config_file}")
         
         # Create token manager to show tokens file path
+        from .tokens import TokenManager
         token_manager = TokenManager(config.config_dir)
         click.echo(f"🔑 Tokens file: {token_manager.tokens_file}")
         click.echo("")
@@ -81,13 +142,14 @@ def add(name: str, url: str, config_dir: Optional[str], no_browser: bool):
         config = Config(config_dir)
         
         # Ensure configuration is initialized
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             sys.exit(1)
         
         click.echo(f"🔍 Discovering OAuth server for {url}...")
         
         # Run discovery and OAuth flow
+        import asyncio
         asyncio.run(_add_server_async(name, url, config, no_browser))
         
     except KeyboardInterrupt:
@@ -100,67 +162,76 @@ def add(name: str, url: str, config_dir: Optional[str], no_browser: bool):
 
 async def _add_server_async(name: str, url: str, config: Config, no_browser: bool):
     """Async helper for adding a server"""
+    from .discovery import OAuthDiscovery
+    from .oauth import OAuthHandler
+    from .tokens import TokenManager, TokenData
+    
     try:
-        # Initialize discovery
-        discovery = OAuthDiscovery()
-        token_manager = TokenManager(config.config_dir)
-        oauth_handler = OAuthHandler(token_manager)
-        
-        # Discover OAuth configuration
-        oauth_config = discovery.discover_oauth_config(url)
-        if not oauth_config:
-            click.echo(f"❌ Could not discover OAuth configuration for {url}")
-            click.echo("Make sure the server supports OAuth 2.0 and returns proper WWW-Authenticate headers")
-            return
-        
-        click.echo(f"📋 Found authorization server: {oauth_config['authorization_endpoint']}")
-        
-        # Attempt dynamic client registration if supported
-        client_config = None
-        if oauth_config.get('registration_endpoint'):
-            click.echo("🔧 Attempting dynamic client registration...")
-            client_config = await oauth_handler.register_client(oauth_config)
-            if client_config:
-                click.echo("✅ Client registered successfully")
+        # The discovery cache and the new server are written to config.json together
+        with config:
+            token_manager = TokenManager(config.config_dir)
+            oauth_handler = OAuthHandler(token_manager)
+            
+            # Reuse a recent discovery for this origin, otherwise probe the server
+            oauth_config = config.get_cached_discovery(url)
+            if oauth_config:
+                click.echo("📋 Using cached OAuth discovery results")
             else:
-                click.echo("⚠️ Dynamic client registration failed, using default client")
-        
-        # Perform OAuth flow
-        if not no_browser:
-            click.echo("🌐 Opening browser for authorization...")
-        
-        token = await oauth_handler.authorize_server_async(oauth_config, client_config, not no_browser)
-        if not token:
-            click.echo("❌ OAuth authorization failed")
-            return
-        
-        # Store server configuration
-        server_config = ServerConfig(
-            name=name,
-            url=url,
-            oauth_config=oauth_config,
-            approval_policy=ApprovalPolicy.ALWAYS_ASK,
-            tool_approvals={}
-        )
-        
-        config.add_server(server_config)
-        config.save()
-        
-        # Store token
-        token_data = TokenData(
-            access_token=token.get('access_token'),
-            refresh_token=token.get('refresh_token'),
-            token_type=token.get('token_type', 'Bearer'),
-            expires_at=token.get('expires_at'),
-            scope=token.get('scope')
-        )
-        token_manager.store_token(name, token_data)
-        
-        click.echo("✅ Authorization successful! Tokens saved.")
-        click.echo(f"✅ Server '{name}' added to configuration.")
-        click.echo("")
-        click.echo("You can now start the proxy server:")
-        click.echo("mcp-oauth-bridge start")
+                discovery = OAuthDiscovery()
+                oauth_config = discovery.discover_oauth_config(url)
+                if not oauth_config:
+                    click.echo(f"❌ Could not discover OAuth configuration for {url}")
+                    click.echo("Make sure the server supports OAuth 2.0 and returns proper WWW-Authenticate headers")
+                    return
+                config.cache_discovery(url, oauth_config)
+            
+            click.echo(f"📋 Found authorization server: {oauth_config['authorization_endpoint']}")
+            
+            # Attempt dynamic client registration if supported
+            client_config = None
+            if oauth_config.get('registration_endpoint'):
+                click.echo("🔧 Attempting dynamic client registration...")
+                client_config = await oauth_handler.register_client(oauth_config)
+                if client_config:
+                    click.echo("✅ Client registered successfully")
+                else:
+                    click.echo("⚠️ Dynamic client registration failed, using default client")
+            
+            # Perform OAuth flow
+            if not no_browser:
+                click.echo("🌐 Opening browser for authorization...")
+            
+            token = await oauth_handler.authorize_server_async(oauth_config, client_config, not no_browser)
+            if not token:
+                click.echo("❌ OAuth authorization failed")
+                return
+            
+            # Store server configuration
+            server_config = ServerConfig(
+                name=name,
+                url=url,
+                oauth_config=oauth_config,
+                approval_policy=ApprovalPolicy.ALWAYS_ASK,
+                tool_approvals={}
+            )
+            
+            config.add_server(server_config)
+            
+            # Store token
+            token_data = TokenData(
+                access_token=token.get('access_token'),
+                refresh_token=token.get('refresh_token'),
+                token_type=token.get('token_type', 'Bearer'),
+                expires_at=token.get('expires_at'),
+                scope=token.get('scope')
+            )
+            token_manager.store_token(name, token_data)
+            
+            click.echo("✅ Authorization successful! Tokens saved.")
+            click.echo(f"✅ Server '{name}' added to configuration.")
+            click.echo("")
+            click.echo("You can now start the proxy server:")
+            click.echo("mcp-oauth-bridge start")
         
     except Exception as e:
         click.echo(f"❌ Error in server setup: {e}")
@@ -170,19 +241,22 @@ async def _add_server_async(name: str, url: str, config: Config, no_browser: boo
 @main.command()
 @click.option('--host', default='localhost', help='Host to bind to')
 @click.option('--port', default=3000, help='Port to bind to')
+@click.option('--workers', default=1, type=click.IntRange(min=1), help='Number of worker processes')
 @click.option('--config-dir', default=None, help='Custom configuration directory')
-def start(host: str, port: int, config_dir: Optional[str]):
+def start(host: str, port: int, workers: int, config_dir: Optional[str]):
     """Start the MCP OAuth Bridge proxy server"""
     try:
         config = Config(config_dir)
         
         # Ensure configuration is initialized
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             sys.exit(1)
         
         # Start the proxy server
-        asyncio.run(run_proxy_server(config_dir, host, port))
+        import asyncio
+        from .proxy import run_proxy_server
+        asyncio.run(run_proxy_server(config_dir, host, port, workers))
         
     except KeyboardInterrupt:
         click.echo("\n🛑 Shutting down...")
@@ -198,7 +272,7 @@ def list(config_dir: Optional[str]):
     try:
         config = Config(config_dir)
         
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             sys.exit(1)
         
@@ -225,11 +299,13 @@ def list(config_dir: Optional[str]):
 @click.option('--config-dir', default=None, help='Custom configuration directory')
 def remove(name: str, config_dir: Optional[str]):
     """Remove a configured MCP server"""
+    from .tokens import TokenManager
+    
     try:
         config = Config(config_dir)
         token_manager = TokenManager(config.config_dir)
         
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             sys.exit(1)
         
@@ -244,7 +320,6 @@ def remove(name: str, config_dir: Optional[str]):
         
         # Remove server and tokens
         config.remove_server(name)
-        config.save()
         token_manager.remove_token(name)
         
         click.echo(f"✅ Server '{name}' removed successfully.")
@@ -258,11 +333,13 @@ def remove(name: str, config_dir: Optional[str]):
 @click.option('--config-dir', default=None, help='Custom configuration directory')
 def status(config_dir: Optional[str]):
     """Show MCP OAuth Bridge status"""
+    from .tokens import TokenManager
+    
     try:
         config = Config(config_dir)
         token_manager = TokenManager(config.config_dir)
         
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             return
         
@@ -309,7 +386,7 @@ def refresh(name: str, config_dir: Optional[str], no_browser: bool):
     try:
         config = Config(config_dir)
         
-        if not os.path.exists(config.config_file):
+        if not config.initialized:
             click.echo("❌ Configuration not initialized. Run 'mcp-oauth-bridge init' first.")
             sys.exit(1)
         
@@ -318,6 +395,7 @@ def refresh(name: str, config_dir: Optional[str], no_browser: bool):
             sys.exit(1)
         
         # Run token refresh
+        import asyncio
         asyncio.run(_refresh_token_async(name, config, no_browser))
         
     except Exception as e:
@@ -327,6 +405,9 @@ def refresh(name: str, config_dir: Optional[str], no_browser: bool):
 
 async def _refresh_token_async(name: str, config: Config, no_browser: bool):
     """Async helper for refreshing token"""
+    from .oauth import OAuthHandler
+    from .tokens import TokenManager, TokenData
+    
     try:
         token_manager = TokenManager(config.config_dir)
         oauth_handler = OAuthHandler(token_manager)
@@ -5,12 +5,17 @@ Handles storing and loading server configurations, approval policies,
 and other settings in ~/.mcp-oauth-bridge/
 """
 
-import json
+import hashlib
 import os
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, List, Tuple, Union
+from dataclasses import dataclass
 from enum import Enum
+from urllib.parse import urlparse
+
+from . import _json
+from ._compat import DATACLASS_SLOTS
 
 
 class ApprovalPolicy(str, Enum):
@@ -20,7 +25,32 @@ class ApprovalPolicy(str, Enum):
     NEVER_ALLOW = "never_allow"
 
 
-@dataclass
+# Plain dict lookup for deserializing policies, instead of the Enum call
+_POLICY_BY_VALUE: Dict[str, ApprovalPolicy] = {p.value: p for p in ApprovalPolicy}
+
+
+# Parsed config.json contents keyed by path, along with the (st_mtime_ns,
+# st_size) of the file they came from; an entry is only reused while the
+# file on disk still has the same signature
+_CONFIG_CACHE: Dict[Path, Tuple[int, int, Dict[str, Any]]] = {}
+
+# How long discovered OAuth metadata is reused before probing again
+DISCOVERY_CACHE_TTL = 24 * 60 * 60
+
+# Connection pool and timeouts of the proxy's HTTP client; any of these can
+# be overridden under "http_client" in config.json
+DEFAULT_HTTP_CLIENT_SETTINGS: Dict[str, float] = {
+    "max_connections": 1000,
+    "max_keepalive_connections": 100,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 5.0,
+    "read_timeout": 30.0,
+    "write_timeout": 30.0,
+    "pool_timeout": 5.0,
+}
+
+
+@dataclass(**DATACLASS_SLOTS)
 class ServerConfig:
     """Configuration for a single MCP server"""
     name: str
@@ -37,17 +67,34 @@ class ServerConfig:
 class Config:
     """Main configuration manager for MCP OAuth Bridge"""
     
-    def __init__(self, config_dir: Optional[Path] = None) -> None:
+    def __init__(self, config_dir: Optional[Union[str, Path]] = None) -> None:
         """Initialize configuration manager
         
         Args:
             config_dir: Custom config directory, defaults to ~/.mcp-oauth-bridge
         """
-        self.config_dir = config_dir or Path.home() / ".mcp-oauth-bridge"
+        self.config_dir = Path(config_dir) if config_dir else Path.home() / ".mcp-oauth-bridge"
         self.config_file = self.config_dir / "config.json"
+        # Whether config.json exists, as seen by the last load or save
+        self.initialized = False
         self.servers: Dict[str, ServerConfig] = {}
+        # Server names, an ETag over them and a counter bumped on every
+        # change, kept up to date by the methods that add or remove servers
+        self.server_names: Tuple[str, ...] = ()
+        self.servers_etag = ""
+        self.servers_version = 0
+        self._servers_changed()
         self.proxy_port = 3000
         self.proxy_host = "localhost"
+        self.http_client = dict(DEFAULT_HTTP_CLIENT_SETTINGS)
+        # Discovered OAuth configurations keyed by server origin, each
+        # stored as {"fetched_at": epoch, "oauth_config": {...}}
+        self.discovery_cache: Dict[str, Dict[str, Any]] = {}
+        
+        # Unsaved changes, and how many ``with config:`` blocks are open;
+        # mutators only write immediately outside of such a block
+        self._dirty = False
+        self._batch_depth = 0
         
         # Ensure config directory exists
         self.config_dir.mkdir(exist_ok=True)
@@ -57,73 +104,158 @@ class Config:
     
     def _load_config(self) -> None:
         """Load configuration from config.json"""
-        if not self.config_file.exists():
+        try:
+            st = os.stat(self.config_file)
+        except FileNotFoundError:
             return
+        self.initialized = True
             
         try:
-            with open(self.config_file, 'r') as f:
-                data = json.load(f)
+            cached = _CONFIG_CACHE.get(self.config_file)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                data = cached[2]
+            else:
+                data = _json.loads(self.config_file.read_bytes())
+                _CONFIG_CACHE[self.config_file] = (st.st_mtime_ns, st.st_size, data)
             
             # Load proxy settings
             self.proxy_port = data.get("proxy_port", 3000)
             self.proxy_host = data.get("proxy_host", "localhost")
+            self.http_client = {**DEFAULT_HTTP_CLIENT_SETTINGS, **data.get("http_client", {})}
+            self.discovery_cache = dict(data.get("discovery_cache", {}))
             
             # Load server configurations
             servers_data = data.get("servers", {})
             for name, server_data in servers_data.items():
                 # Convert approval policy strings back to enums
-                approval_policy = ApprovalPolicy(server_data.get("approval_policy", "always_ask"))
+                approval_policy = _POLICY_BY_VALUE.get(
+                    server_data.get("approval_policy", "always_ask"), ApprovalPolicy.ALWAYS_ASK
+                )
                 tool_approvals = {
-                    tool: ApprovalPolicy(policy) 
+                    tool: _POLICY_BY_VALUE[policy]
                     for tool, policy in server_data.get("tool_approvals", {}).items()
                 }
                 
                 self.servers[name] = ServerConfig(
                     name=server_data["name"],
                     url=server_data["url"],
-                    oauth_config=server_data["oauth_config"],
+                    # Copied so edits never leak into the cached data
+                    oauth_config=dict(server_data["oauth_config"]),
                     approval_policy=approval_policy,
                     tool_approvals=tool_approvals
                 )
                 
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+        except (KeyError, ValueError) as e:
             print(f"⚠️  Warning: Could not load config file: {e}")
             print("Using default configuration")
+        
+        self._servers_changed()
+    
+    def _servers_changed(self) -> None:
+        """Recompute server_names and servers_etag, and bump servers_version"""
+        self.server_names = tuple(self.servers)
+        self.servers_version += 1
+        digest = hashlib.sha256(",".join(sorted(self.servers)).encode()).hexdigest()
+        self.servers_etag = f'"{digest[:16]}"'
     
     def _save_config(self) -> None:
         """Save current configuration to config.json"""
-        # Convert server configs to serializable format
-        servers_data = {}
-        for name, server in self.servers.items():
-            server_dict = asdict(server)
-            # Convert enums to strings for JSON serialization
-            server_dict["approval_policy"] = server.approval_policy.value
-            server_dict["tool_approvals"] = {
-                tool: policy.value for tool, policy in server.tool_approvals.items()
+        # Convert server configs to serializable format; oauth_config is
+        # referenced rather than copied since it is only serialized
+        servers_data = {
+            name: {
+                "name": server.name,
+                "url": server.url,
+                "oauth_config": server.oauth_config,
+                "approval_policy": server.approval_policy.value,
+                "tool_approvals": {
+                    tool: policy.value for tool, policy in server.tool_approvals.items()
+                },
             }
-            servers_data[name] = server_dict
+            for name, server in self.servers.items()
+        }
         
         config_data = {
             "proxy_port": self.proxy_port,
             "proxy_host": self.proxy_host,
-            "servers": servers_data
+            "http_client": dict(self.http_client),
+            "servers": servers_data,
+            "discovery_cache": dict(self.discovery_cache)
         }
         
         # Ensure directory exists
         self.config_dir.mkdir(exist_ok=True)
         
-        # Write config file
-        with open(self.config_file, 'w') as f:
-            json.dump(config_data, f, indent=2)
+        # Write to a temporary file and rename it over config.json, so a
+        # crash mid-write never leaves a truncated config behind
+        tmp_file = self.config_file.with_suffix(".json.tmp")
+        tmp_file.write_bytes(_json.dumps(config_data, pretty=True))
+        os.replace(tmp_file, self.config_file)
+        
+        # Later Config() instances can reuse what was just written; the
+        # cached servers get their own oauth_config, and the discovery
+        # cache above is a copy, so later edits don't reach the cache
+        for server_dict in servers_data.values():
+            server_dict["oauth_config"] = dict(server_dict["oauth_config"])
+        st = os.stat(self.config_file)
+        self.initialized = True
+        _CONFIG_CACHE[self.config_file] = (st.st_mtime_ns, st.st_size, config_data)
+    
+    def __enter__(self) -> "Config":
+        """Batch changes: mutators inside the block write once, on exit"""
+        self._batch_depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """Write batched changes when the outermost block exits"""
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.flush()
+    
+    def _mark_dirty(self) -> None:
+        """Record a change and save it unless writes are being batched"""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write pending changes to config.json, if there are any"""
+        if self._dirty:
+            self._save_config()
+            self._dirty = False
     
-    def add_server(self, server: ServerConfig) -> None:
+    def add_server(
+        self,
+        server: Union[ServerConfig, str],
+        config_dict: Optional[Dict[str, Any]] = None
+    ) -> None:
         """Add or update a server configuration
         
         Args:
-            server: Server configuration to add
+            server: Server configuration to add, or the server name when
+                the configuration is given as a dict
+            config_dict: Server settings ("url", "oauth_config" and
+                optionally "approval_policy"/"tool_approvals") used with a name
         """
+        if not isinstance(server, ServerConfig):
+            if config_dict is None:
+                raise TypeError("add_server() needs a ServerConfig or a name and config dict")
+            server = ServerConfig(
+                name=server,
+                url=config_dict["url"],
+                oauth_config=config_dict.get("oauth_config") or {},
+                approval_policy=_POLICY_BY_VALUE.get(
+                    config_dict.get("approval_policy"), ApprovalPolicy.ALWAYS_ASK
+                ),
+                tool_approvals={
+                    tool: _POLICY_BY_VALUE[policy]
+                    for tool, policy in (config_dict.get("tool_approvals") or {}).items()
+                }
+            )
+        
         self.servers[server.name] = server
-        self._save_config()
+        self._servers_changed()
+        self._mark_dirty()
     
     def remove_server(self, name: str) -> bool:
         """Remove a server configuration
@@ -136,7 +268,8 @@ class Config:
         """
         if name in self.servers:
             del self.servers[name]
-            self._save_config()
+            self._servers_changed()
+            self._mark_dirty()
             return True
         return False
     
@@ -157,7 +290,7 @@ class Config:
         Returns:
             List of server names
         """
-        return list(self.servers.keys())
+        return list(self.server_names)
     
     def set_approval_policy(self, server_name: str, policy: ApprovalPolicy, tool_name: Optional[str] = None) -> bool:
         """Set approval policy for a server or specific tool
@@ -179,7 +312,7 @@ class Config:
         else:
             server.approval_policy = policy
         
-        self._save_config()
+        self._mark_dirty()
         return True
     
     def get_approval_policy(self, server_name: str, tool_name: Optional[str] = None) -> Optional[ApprovalPolicy]:
@@ -210,7 +343,42 @@ class Config:
         """
         self.proxy_host = host
         self.proxy_port = port
-        self._save_config()
+        self._mark_dirty()
+    
+    @staticmethod
+    def _origin(url: str) -> str:
+        """Scheme and host part of a URL, used as the discovery cache key"""
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+    
+    def get_cached_discovery(self, resource_url: str) -> Optional[Dict[str, Any]]:
+        """Get a cached OAuth discovery result for a server
+        
+        Args:
+            resource_url: MCP server URL; entries are shared per origin
+            
+        Returns:
+            OAuth configuration with resource_url set to the given URL, or
+            None if nothing was cached or the entry is older than
+            DISCOVERY_CACHE_TTL
+        """
+        entry = self.discovery_cache.get(self._origin(resource_url))
+        if not entry or time.time() - entry.get("fetched_at", 0) >= DISCOVERY_CACHE_TTL:
+            return None
+        return {**entry["oauth_config"], "resource_url": resource_url}
+    
+    def cache_discovery(self, resource_url: str, oauth_config: Dict[str, Any]) -> None:
+        """Remember an OAuth discovery result for a server's origin
+        
+        Args:
+            resource_url: MCP server URL that was discovered
+            oauth_config: Configuration returned by OAuth discovery
+        """
+        self.discovery_cache[self._origin(resource_url)] = {
+            "fetched_at": time.time(),
+            "oauth_config": dict(oauth_config),
+        }
+        self._mark_dirty()
     
     @property
     def proxy_url(self) -> str:
@@ -218,5 +386,11 @@ class Config:
         return f"http://{self.proxy_host}:{self.proxy_port}"
 
     def save(self) -> None:
-        """Save current configuration (public interface)"""
-        self._save_config() 
\ No newline at end of file
+        """Save current configuration (public interface)
+        
+        Writes only when there are unsaved changes or the config file
+        does not exist yet.
+        """
+        if self._dirty or not self.initialized:
+            self._save_config()
+            self._dirty = False 
\ No newline at end of file
@@ -5,10 +5,32 @@ Implements RFC 9728 (OAuth 2.0 Protected Resource Metadata) and RFC 8414
 (OAuth 2.0 Authorization Server Metadata) for automatic discovery of OAuth endpoints.
 """
 
+import logging
+import re
+import time
 import requests
-from typing import Dict, Any, Optional, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, List, Tuple
 from urllib.parse import urljoin, urlparse
 from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from . import _json
+from ._session import get_shared_session
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of cached discovery metadata when the server sends no caching headers
+DEFAULT_METADATA_TTL = 300.0
+
+# One auth-param of a WWW-Authenticate challenge (RFC 7235): name=token or
+# name="quoted string"
+_WWW_AUTH_PARAM = re.compile(r'([\w-]+)\s*=\s*(?:"([^"]*)"|([^\s,"]+))')
+
+# Well-known path of protected resource metadata (RFC 9728)
+_PRM_PATH = '/.well-known/oauth-protected-resource'
 
 
 @dataclass
@@ -47,6 +69,9 @@ class ProtectedResourceMetadata:
     authorization_servers: List[str]
     scopes_supported: Optional[List[str]] = None
     bearer_methods_supported: Optional[List[str]] = None
+    # Authorization server metadata some resources embed in their own
+    # metadata document, saving the RFC 8414 lookup
+    authorization_server_metadata: Optional[Dict[str, Any]] = None
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ProtectedResourceMetadata':
@@ -56,24 +81,131 @@ class ProtectedResourceMetadata:
             authorization_servers=data['authorization_servers'],
             scopes_supported=data.get('scopes_supported'),
             bearer_methods_supported=data.get('bearer_methods_supported'),
+            authorization_server_metadata=data.get('authorization_server_metadata'),
         )
 
 
+# Discovery results shared by every OAuthDiscovery in the process, keyed by
+# the URL they were discovered for: (monotonic deadline, metadata)
+_resource_cache: Dict[str, Tuple[float, ProtectedResourceMetadata]] = {}
+_auth_server_cache: Dict[str, Tuple[float, AuthorizationServerMetadata]] = {}
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Thread pool used to issue discovery requests concurrently"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mcp-discovery')
+    return _executor
+
+
+@lru_cache(maxsize=128)
+def _wellknown_urls(resource_url: str) -> Tuple[str, Optional[str]]:
+    """Origin of a resource URL and its protected resource metadata URL
+    
+    The metadata URL is None when resource_url already is one.
+    """
+    parsed = urlparse(resource_url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}"
+    if parsed.path.endswith(_PRM_PATH):
+        return base_url, None
+    return base_url, urljoin(base_url, _PRM_PATH)
+
+
+@lru_cache(maxsize=128)
+def _as_metadata_url(auth_server_url: str) -> str:
+    """RFC 8414 metadata URL for an authorization server"""
+    return urljoin(auth_server_url.rstrip('/'), '/.well-known/oauth-authorization-server')
+
+
+@lru_cache(maxsize=128)
+def _oidc_metadata_url(auth_server_url: str) -> str:
+    """OpenID Connect discovery URL for an issuer"""
+    return urljoin(auth_server_url.rstrip('/') + '/', '.well-known/openid-configuration')
+
+
+def _cache_ttl(response: requests.Response) -> float:
+    """Work out how long a metadata response may be cached
+    
+    Honours Cache-Control (no-store, no-cache, max-age) and Expires, and
+    falls back to DEFAULT_METADATA_TTL.
+    
+    Args:
+        response: Metadata response
+        
+    Returns:
+        Cache lifetime in seconds
+    """
+    cache_control = response.headers.get('Cache-Control', '').lower()
+    for directive in cache_control.split(','):
+        directive = directive.strip()
+        if directive in ('no-store', 'no-cache'):
+            return 0.0
+        if directive.startswith('max-age='):
+            try:
+                return max(0.0, float(directive[8:]))
+            except ValueError:
+                break
+    
+    expires = response.headers.get('Expires')
+    if expires:
+        try:
+            expires_at = parsedate_to_datetime(expires)
+            return max(0.0, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return 0.0
+    
+    return DEFAULT_METADATA_TTL
+
+
+def _get_cached(cache: Dict[str, Tuple[float, Any]], key: str) -> Optional[Any]:
+    """Return a cached value if it has not expired yet"""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        cache.pop(key, None)
+        return None
+    return entry[1]
+
+
+def _store_cached(cache: Dict[str, Tuple[float, Any]], key: str, value: Any, ttl: float) -> None:
+    """Cache a value for ttl seconds (nothing is stored for a zero ttl)"""
+    if ttl > 0:
+        cache[key] = (time.monotonic() + ttl, value)
+
+
+def _close_response(future: "Future[requests.Response]") -> None:
+    """Close the response of a finished request, if it produced one"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _discard_request(future: "Future[requests.Response]") -> None:
+    """Drop a speculative request whose response is not needed
+    
+    A request that has not started yet is cancelled; one already on the
+    wire releases its connection as soon as it returns.
+    """
+    if not future.cancel():
+        future.add_done_callback(_close_response)
+
+
 class OAuthDiscovery:
     """OAuth server discovery using RFC standards"""
     
-    def __init__(self, timeout: int = 10) -> None:
+    def __init__(self, timeout: int = 10, session: Optional[requests.Session] = None) -> None:
         """Initialize discovery client
         
         Args:
             timeout: Request timeout in seconds
+            session: HTTP session to use, defaults to the shared pooled session
         """
         self.timeout = timeout
-        self.session = requests.Session()
-        # Set a proper User-Agent
-        self.session.headers.update({
-            'User-Agent': 'MCP-OAuth-Bridge/0.1.0'
-        })
+        self.session = session or get_shared_session()
     
     def discover_protected_resource(self, resource_url: str) -> Optional[ProtectedResourceMetadata]:
         """Discover OAuth configuration for a protected resource using RFC 9728
@@ -84,33 +216,52 @@ class OAuthDiscovery:
         Returns:
             Protected resource metadata or None if not found
         """
+        cached = _get_cached(_resource_cache, resource_url)
+        if cached is not None:
+            logger.debug("✅ Using cached protected resource metadata")
+            return cached
+        
         try:
             # Step 1: Try to get protected resource metadata from well-known endpoint
-            parsed = urlparse(resource_url)
-            base_url = f"{parsed.scheme}://{parsed.netloc}"
-            metadata_url = urljoin(base_url, "/.well-known/oauth-protected-resource")
+            _, metadata_url = _wellknown_urls(resource_url)
+            if metadata_url is None:
+                # Already the metadata URL: probing it for WWW-Authenticate
+                # would only fetch the same document again
+                metadata_url = resource_url
             
-            print(f"🔍 Checking protected resource metadata at {metadata_url}")
+            logger.debug("🔍 Checking protected resource metadata at %s", metadata_url)
             response = self.session.get(metadata_url, timeout=self.timeout)
             
             if response.status_code == 200:
-                metadata = ProtectedResourceMetadata.from_dict(response.json())
-                print(f"✅ Found protected resource metadata")
+                metadata = ProtectedResourceMetadata.from_dict(_json.loads(response.content))
+                logger.info("✅ Found protected resource metadata")
+                _store_cached(_resource_cache, resource_url, metadata, _cache_ttl(response))
                 return metadata
             
-            # Step 2: Try making a request to the resource to get WWW-Authenticate header
-            print(f"🔍 Probing resource for WWW-Authenticate header")
-            response = self.session.get(resource_url, timeout=self.timeout)
+            if metadata_url == resource_url:
+                logger.warning("⚠️  No OAuth metadata found for %s", resource_url)
+                return None
             
-            if 'WWW-Authenticate' in response.headers:
-                auth_header = response.headers['WWW-Authenticate']
-                return self._parse_www_authenticate(auth_header, resource_url)
+            # Step 2: Try making a request to the resource to get WWW-Authenticate header.
+            # Only the headers are needed, and MCP endpoints may answer with an
+            # event stream, so the body is never read
+            logger.debug("🔍 Probing resource for WWW-Authenticate header")
+            response = self.session.get(resource_url, timeout=self.timeout, stream=True)
+            try:
+                if 'WWW-Authenticate' in response.headers:
+                    auth_header = response.headers['WWW-Authenticate']
+                    metadata = self._parse_www_authenticate(auth_header, resource_url)
+                    if metadata:
+                        _store_cached(_resource_cache, resource_url, metadata, _cache_ttl(response))
+                    return metadata
+            finally:
+                response.close()
             
-            print(f"⚠️  No OAuth metadata found for {resource_url}")
+            logger.warning("⚠️  No OAuth metadata found for %s", resource_url)
             return None
             
         except Exception as e:
-            print(f"❌ Error discovering protected resource: {e}")
+            logger.error("❌ Error discovering protected resource: %s", e)
             return None
     
     def _parse_www_authenticate(self, auth_header: str, resource_url: str) -> Optional[ProtectedResourceMetadata]:
@@ -124,32 +275,23 @@ class OAuthDiscovery:
             Protected resource metadata or None
         """
         try:
-            # Simple parsing of Bearer realm parameter
             # Format: Bearer realm="https://auth.example.com", scope="read write"
-            if not auth_header.startswith('Bearer'):
+            if auth_header[:6].lower() != 'bearer':
                 return None
             
-            # Extract realm (authorization server)
-            realm_start = auth_header.find('realm="')
-            if realm_start == -1:
-                return None
+            # Parse every parameter in one pass
+            params = {
+                name.lower(): quoted or token
+                for name, quoted, token in _WWW_AUTH_PARAM.findall(auth_header)
+            }
             
-            realm_start += 7  # len('realm="')
-            realm_end = auth_header.find('"', realm_start)
-            if realm_end == -1:
+            # The realm names the authorization server
+            auth_server = params.get('realm')
+            if not auth_server:
                 return None
             
-            auth_server = auth_header[realm_start:realm_end]
-            
-            # Extract scope if present
-            scopes = None
-            scope_start = auth_header.find('scope="')
-            if scope_start != -1:
-                scope_start += 7  # len('scope="')
-                scope_end = auth_header.find('"', scope_start)
-                if scope_end != -1:
-                    scope_str = auth_header[scope_start:scope_end]
-                    scopes = scope_str.split()
+            scope = params.get('scope')
+            scopes = scope.split() if scope is not None else None
             
             return ProtectedResourceMetadata(
                 resource=resource_url,
@@ -158,48 +300,66 @@ class OAuthDiscovery:
             )
             
         except Exception as e:
-            print(f"❌ Error parsing WWW-Authenticate header: {e}")
+            logger.error("❌ Error parsing WWW-Authenticate header: %s", e)
             return None
     
-    def discover_authorization_server(self, auth_server_url: str) -> Optional[AuthorizationServerMetadata]:
+    def discover_authorization_server(
+        self,
+        auth_server_url: str,
+        prefetched: Optional["Future[requests.Response]"] = None
+    ) -> Optional[AuthorizationServerMetadata]:
         """Discover authorization server metadata using RFC 8414
         
         Args:
             auth_server_url: Authorization server base URL
+            prefetched: Request for the metadata URL already in flight
             
         Returns:
             Authorization server metadata or None if not found
         """
+        cached = _get_cached(_auth_server_cache, auth_server_url)
+        if cached is not None:
+            logger.debug("✅ Using cached authorization server metadata")
+            if prefetched is not None:
+                _discard_request(prefetched)
+            return cached
+        
+        # RFC 8414 metadata, with OpenID Connect discovery as the fallback;
+        # both candidates are requested at once
+        metadata_url = _as_metadata_url(auth_server_url)
+        fallback_url = _oidc_metadata_url(auth_server_url)
+        
+        logger.debug("🔍 Discovering authorization server metadata at %s", metadata_url)
+        executor = _get_executor()
+        if prefetched is None:
+            prefetched = executor.submit(self.session.get, metadata_url, timeout=self.timeout, stream=True)
+        # Streamed, so an unneeded candidate is closed without reading its body
+        fallback = executor.submit(self.session.get, fallback_url, timeout=self.timeout, stream=True)
+        
         try:
-            # RFC 8414: Authorization server metadata endpoint
-            metadata_url = urljoin(auth_server_url.rstrip('/'), '/.well-known/oauth-authorization-server')
-            
-            print(f"🔍 Discovering authorization server metadata at {metadata_url}")
-            response = self.session.get(metadata_url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                metadata = AuthorizationServerMetadata.from_dict(response.json())
-                print(f"✅ Found authorization server metadata")
-                return metadata
-            
-            # Fallback: try issuer-specific discovery
-            # Some servers use issuer/.well-known/oauth-authorization-server
-            if not auth_server_url.endswith('/.well-known/oauth-authorization-server'):
-                fallback_url = urljoin(auth_server_url.rstrip('/'), '/.well-known/oauth-authorization-server')
-                if fallback_url != metadata_url:
-                    print(f"🔍 Trying fallback discovery at {fallback_url}")
-                    response = self.session.get(fallback_url, timeout=self.timeout)
-                    if response.status_code == 200:
-                        metadata = AuthorizationServerMetadata.from_dict(response.json())
-                        print(f"✅ Found authorization server metadata")
-                        return metadata
+            for candidate in (prefetched, fallback):
+                # A failed candidate (connection error, timeout, bad
+                # document) only moves discovery on to the next one
+                try:
+                    response = candidate.result()
+                    try:
+                        if response.status_code == 200:
+                            metadata = AuthorizationServerMetadata.from_dict(_json.loads(response.content))
+                            logger.info("✅ Found authorization server metadata at %s", response.url)
+                            _store_cached(_auth_server_cache, auth_server_url, metadata, _cache_ttl(response))
+                            return metadata
+                    finally:
+                        response.close()
+                except Exception as e:
+                    logger.debug("🔍 Authorization server metadata request failed: %s", e)
+                if candidate is prefetched:
+                    logger.debug("🔍 Trying fallback discovery at %s", fallback_url)
             
-            print(f"⚠️  No authorization server metadata found at {auth_server_url}")
+            logger.warning("⚠️  No authorization server metadata found at %s", auth_server_url)
             return None
             
-        except Exception as e:
-            print(f"❌ Error discovering authorization server: {e}")
-            return None
+        finally:
+            _discard_request(fallback)
     
     def discover_oauth_config(self, resource_url: str) -> Optional[Dict[str, Any]]:
         """Complete OAuth discovery process for a resource
@@ -210,21 +370,49 @@ class OAuthDiscovery:
         Returns:
             Complete OAuth configuration or None if discovery fails
         """
-        print(f"🔍 Starting OAuth discovery for {resource_url}")
+        logger.info("🔍 Starting OAuth discovery for %s", resource_url)
         
-        # Step 1: Discover protected resource metadata
-        resource_metadata = self.discover_protected_resource(resource_url)
-        if not resource_metadata:
-            return None
-        
-        # Step 2: Discover authorization server metadata
-        if not resource_metadata.authorization_servers:
-            print("❌ No authorization servers found in resource metadata")
-            return None
+        # The authorization server usually lives on the resource's host, so
+        # request its metadata speculatively while the resource is discovered
+        speculative = None
+        if _get_cached(_resource_cache, resource_url) is None:
+            speculative_url = _as_metadata_url(_wellknown_urls(resource_url)[0])
+            speculative = _get_executor().submit(
+                self.session.get, speculative_url, timeout=self.timeout, stream=True
+            )
         
-        # Use the first authorization server
-        auth_server_url = resource_metadata.authorization_servers[0]
-        auth_metadata = self.discover_authorization_server(auth_server_url)
+        try:
+            # Step 1: Discover protected resource metadata
+            resource_metadata = self.discover_protected_resource(resource_url)
+            if not resource_metadata:
+                return None
+            
+            # Step 2: Discover authorization server metadata
+            if not resource_metadata.authorization_servers:
+                logger.error("❌ No authorization servers found in resource metadata")
+                return None
+            
+            # Use the first authorization server
+            auth_server_url = resource_metadata.authorization_servers[0]
+            auth_metadata = None
+            inline_metadata = resource_metadata.authorization_server_metadata
+            if isinstance(inline_metadata, dict):
+                try:
+                    auth_metadata = AuthorizationServerMetadata.from_dict(inline_metadata)
+                    logger.info("✅ Using authorization server metadata embedded in the resource metadata")
+                except KeyError:
+                    auth_metadata = None
+            
+            if auth_metadata is None:
+                prefetched = None
+                if speculative is not None and _as_metadata_url(auth_server_url) == speculative_url:
+                    prefetched, speculative = speculative, None
+                auth_metadata = self.discover_authorization_server(auth_server_url, prefetched)
+        finally:
+            # A speculative request nobody used is released, whichever way
+            # discovery ended
+            if speculative is not None:
+                _discard_request(speculative)
         
         if not auth_metadata:
             return None
@@ -232,8 +420,10 @@ class OAuthDiscovery:
         # Step 3: Validate PKCE support (required for OAuth 2.1)
         pkce_methods = auth_metadata.code_challenge_methods_supported or []
         if 'S256' not in pkce_methods:
-            print("⚠️  Warning: Authorization server does not advertise S256 PKCE support")
-            print("Proceeding anyway as many servers support it without advertising")
+            logger.warning(
+                "⚠️  Authorization server does not advertise S256 PKCE support; "
+                "proceeding anyway as many servers support it without advertising"
+            )
         
         # Step 4: Build complete configuration
         config = {
@@ -249,10 +439,10 @@ class OAuthDiscovery:
             'code_challenge_methods_supported': auth_metadata.code_challenge_methods_supported,
         }
         
-        print(f"✅ OAuth discovery completed successfully")
-        print(f"📋 Authorization endpoint: {auth_metadata.authorization_endpoint}")
-        print(f"📋 Token endpoint: {auth_metadata.token_endpoint}")
+        logger.info("✅ OAuth discovery completed successfully")
+        logger.info("📋 Authorization endpoint: %s", auth_metadata.authorization_endpoint)
+        logger.info("📋 Token endpoint: %s", auth_metadata.token_endpoint)
         if auth_metadata.registration_endpoint:
-            print(f"📋 Registration endpoint: {auth_metadata.registration_endpoint}")
+            logger.info("📋 Registration endpoint: %s", auth_metadata.registration_endpoint)
         
         return config 
\ No newline at end of file
@@ -5,20 +5,72 @@ Implements OAuth 2.1 authorization code flow with PKCE (RFC 7636),
 dynamic client registration (RFC 7591), and token management.
 """
 
+import asyncio
 import base64
 import hashlib
+import html
+import logging
 import secrets
 import webbrowser
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urlencode, parse_qs, urlparse
-from datetime import datetime, timezone, timedelta
 import requests
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from .tokens import TokenData, TokenStorage
 from .discovery import OAuthDiscovery
+from . import _json
+from ._session import get_shared_session
+
+logger = logging.getLogger(__name__)
+
+
+# Redirect URI served by the local callback server, and the out-of-band
+# URI used when no browser is opened
+CALLBACK_PORT = 8081
+CALLBACK_PATH = '/oauth/callback'
+REDIRECT_URI = f'http://localhost:{CALLBACK_PORT}{CALLBACK_PATH}'
+OOB_REDIRECT_URI = 'urn:ietf:wg:oauth:2.0:oob'
+
+# Refreshes requested within this many seconds go out as one burst
+REFRESH_BATCH_DELAY = 0.05
+
+# Pages shown in the browser after the authorization redirect
+SUCCESS_HTML_BYTES = """
+<html>
+<head><title>Authorization Successful</title></head>
+<body>
+    <h1>✅ Authorization Successful</h1>
+    <p>You can close this window and return to your terminal.</p>
+    <script>window.close();</script>
+</body>
+</html>
+""".encode('utf-8')
+
+ERROR_TEMPLATE = """
+<html>
+<head><title>Authorization Failed</title></head>
+<body>
+    <h1>❌ Authorization Failed</h1>
+    <p>Error: {error}</p>
+    <p>You can close this window and try again.</p>
+    <script>window.close();</script>
+</body>
+</html>
+"""
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Thread pool for work that can overlap with the network calls of a flow"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mcp-oauth')
+    return _executor
 
 
 class CallbackHandler(BaseHTTPRequestHandler):
@@ -28,42 +80,35 @@ class CallbackHandler(BaseHTTPRequestHandler):
         """Handle GET request to callback endpoint"""
         # Parse callback parameters
         parsed = urlparse(self.path)
+        if parsed.path != CALLBACK_PATH:
+            # The server outlives a single flow; stray requests such as
+            # /favicon.ico must not complete it
+            self.send_error(404)
+            return
         params = parse_qs(parsed.query)
         
-        # Store callback data for retrieval
-        self.server.callback_params = params
+        # Store callback data for retrieval and wake up the waiting flow.
+        # Requests are handled on their own threads, so only the first
+        # callback of a flow is kept
+        with self.server.callback_lock:
+            if not self.server.callback_event.is_set():
+                self.server.callback_params = params
+                self.server.callback_event.set()
         
-        # Send response to browser
+        # Send response to browser; the error comes from the query string
+        # and is escaped before it goes into the page
         if 'code' in params:
-            response = """
-            <html>
-            <head><title>Authorization Successful</title></head>
-            <body>
-                <h1>✅ Authorization Successful</h1>
-                <p>You can close this window and return to your terminal.</p>
-                <script>window.close();</script>
-            </body>
-            </html>
-            """
             self.send_response(200)
+            body = SUCCESS_HTML_BYTES
         else:
-            error = params.get('error', ['unknown'])[0]
-            response = f"""
-            <html>
-            <head><title>Authorization Failed</title></head>
-            <body>
-                <h1>❌ Authorization Failed</h1>
-                <p>Error: {error}</p>
-                <p>You can close this window and try again.</p>
-                <script>window.close();</script>
-            </body>
-            </html>
-            """
             self.send_response(400)
+            error = params.get('error', ['unknown'])[0]
+            body = ERROR_TEMPLATE.format(error=html.escape(error)).encode('utf-8')
         
-        self.send_header('Content-type', 'text/html')
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(response.encode())
+        self.wfile.write(body)
     
     def log_message(self, format: str, *args: Any) -> None:
         """Suppress log messages"""
@@ -73,18 +118,44 @@ class CallbackHandler(BaseHTTPRequestHandler):
 class OAuthHandler:
     """OAuth 2.1 flow handler with PKCE"""
     
-    def __init__(self, token_storage: Optional[TokenStorage] = None) -> None:
+    def __init__(
+        self,
+        token_storage: Optional[TokenStorage] = None,
+        session: Optional[requests.Session] = None
+    ) -> None:
         """Initialize OAuth handler
         
         Args:
             token_storage: Token storage instance, creates new if None
+            session: HTTP session to use, defaults to the shared pooled session
         """
         self.token_storage = token_storage or TokenStorage()
-        self.discovery = OAuthDiscovery()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'MCP-OAuth-Bridge/0.1.0'
-        })
+        self.session = session or get_shared_session()
+        self.discovery = OAuthDiscovery(session=self.session)
+        self._callback_server: Optional[ThreadingHTTPServer] = None
+        self._callback_lock = threading.Lock()
+        
+        # Async refreshes: one future per server with a refresh under way,
+        # the servers waiting for the next batch, the timer that starts it
+        # and the task sending it; the loop only keeps a weak reference to
+        # tasks, so the running flush is held here
+        self._inflight_refresh: Dict[str, asyncio.Future] = {}
+        self._refresh_queue: Dict[str, Dict[str, Any]] = {}
+        self._refresh_flush: Optional[asyncio.TimerHandle] = None
+        self._refresh_flush_task: Optional[asyncio.Task] = None
+    
+    def close(self) -> None:
+        """Shut down the callback server, if one was started"""
+        server, self._callback_server = self._callback_server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
     
     def _generate_pkce_pair(self) -> Tuple[str, str]:
         """Generate PKCE code verifier and challenge
@@ -92,21 +163,33 @@ class OAuthHandler:
         Returns:
             Tuple of (code_verifier, code_challenge)
         """
-        # Generate code verifier (RFC 7636)
-        code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
+        # Generate code verifier (RFC 7636), kept as bytes until the end
+        verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).rstrip(b'=')
         
-        # Generate code challenge (S256 method)
-        code_challenge = base64.urlsafe_b64encode(
-            hashlib.sha256(code_verifier.encode('utf-8')).digest()
-        ).decode('utf-8').rstrip('=')
+        # Generate code challenge (S256 method) from the same bytes
+        challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier).digest()).rstrip(b'=')
         
-        return code_verifier, code_challenge
+        return verifier.decode('ascii'), challenge.decode('ascii')
     
-    def _attempt_dynamic_registration(self, oauth_config: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    def _generate_flow_secrets(self) -> Tuple[str, str, str]:
+        """Generate the per-flow PKCE pair and state parameter
+        
+        Returns:
+            Tuple of (code_verifier, code_challenge, state)
+        """
+        code_verifier, code_challenge = self._generate_pkce_pair()
+        return code_verifier, code_challenge, secrets.token_urlsafe(32)
+    
+    def _attempt_dynamic_registration(
+        self,
+        oauth_config: Dict[str, Any],
+        redirect_uri: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
         """Attempt dynamic client registration per RFC 7591
         
         Args:
             oauth_config: OAuth configuration from discovery
+            redirect_uri: Callback redirect URI, defaults to REDIRECT_URI
             
         Returns:
             Client credentials dict or None if registration fails/unavailable
@@ -115,13 +198,25 @@ class OAuthHandler:
         if not registration_endpoint:
             return None
         
+        redirect_uris = [redirect_uri or REDIRECT_URI, OOB_REDIRECT_URI]
+        
+        # Reuse an earlier registration with this issuer when it is still valid
+        issuer = oauth_config.get('issuer') or registration_endpoint
+        stored = self.token_storage.get_client_registration(issuer)
+        if stored and self._registration_usable(stored, redirect_uris):
+            logger.debug("✅ Using stored client registration")
+            return {
+                'client_id': stored['client_id'],
+                'client_secret': stored.get('client_secret')
+            }
+        
         try:
-            print(f"🔧 Attempting dynamic client registration...")
+            logger.info("🔧 Attempting dynamic client registration...")
             
             # Build registration request
             registration_data = {
                 'client_name': 'MCP OAuth Bridge',
-                'redirect_uris': ['http://localhost:8081/oauth/callback', 'urn:ietf:wg:oauth:2.0:oob'],
+                'redirect_uris': redirect_uris,
                 'grant_types': ['authorization_code'],
                 'response_types': ['code'],
                 'token_endpoint_auth_method': 'none',  # Public client
@@ -131,36 +226,94 @@ class OAuthHandler:
             response = self.session.post(
                 registration_endpoint,
                 json=registration_data,
-                headers={'Content-Type': 'application/json'},
                 timeout=10
             )
             
             if response.status_code in (200, 201):
-                client_data = response.json()
-                print(f"✅ Client registered successfully")
+                client_data = _json.loads(response.content)
+                logger.info("✅ Client registered successfully")
+                self.token_storage.store_client_registration(issuer, {
+                    'client_id': client_data['client_id'],
+                    'client_secret': client_data.get('client_secret'),
+                    'client_id_issued_at': client_data.get('client_id_issued_at'),
+                    'client_secret_expires_at': client_data.get('client_secret_expires_at'),
+                    'redirect_uris': redirect_uris,
+                })
                 return {
                     'client_id': client_data['client_id'],
                     'client_secret': client_data.get('client_secret')  # May be None for public clients
                 }
             else:
-                print(f"⚠️  Dynamic client registration failed: {response.status_code}")
+                logger.warning("⚠️  Dynamic client registration failed: %s", response.status_code)
                 return None
                 
         except Exception as e:
-            print(f"⚠️  Dynamic client registration error: {e}")
+            logger.warning("⚠️  Dynamic client registration error: %s", e)
             return None
     
-    def _start_callback_server(self) -> HTTPServer:
-        """Start temporary HTTP server for OAuth callback"""
-        server = HTTPServer(('localhost', 8081), CallbackHandler)
-        server.callback_params = None
+    @staticmethod
+    def _registration_usable(registration: Dict[str, Any], redirect_uris: list) -> bool:
+        """Check whether a stored client registration can be reused
+        
+        Args:
+            registration: Stored registration
+            redirect_uris: Redirect URIs the current flow needs
+            
+        Returns:
+            True if the registration covers the redirect URIs and its
+            secret (if any) has not expired
+        """
+        if registration.get('redirect_uris') != redirect_uris:
+            return False
+        
+        # RFC 7591: 0 means the secret does not expire
+        secret_expires_at = registration.get('client_secret_expires_at')
+        if secret_expires_at and secret_expires_at <= time.time():
+            return False
+        
+        return 'client_id' in registration
+    
+    def _start_callback_server(self) -> ThreadingHTTPServer:
+        """Get the HTTP server for OAuth callbacks, ready for a new flow
         
-        def run_server():
-            server.handle_request()  # Handle one request then stop
+        The server is started on first use and then kept for the lifetime
+        of the handler, so authorizing several servers reuses one socket
+        and thread. It listens on CALLBACK_PORT when that is free, keeping
+        the redirect URI stable for stored client registrations, and on an
+        ephemeral port otherwise.
         
-        threading.Thread(target=run_server, daemon=True).start()
+        Returns:
+            Callback server with its result cleared
+        """
+        server = self._get_callback_server()
+        with server.callback_lock:
+            server.callback_params = None
+            server.callback_event.clear()
         return server
     
+    def _get_callback_server(self) -> ThreadingHTTPServer:
+        """Get the callback server, starting it on first use"""
+        with self._callback_lock:
+            server = self._callback_server
+            if server is None:
+                try:
+                    server = ThreadingHTTPServer(('localhost', CALLBACK_PORT), CallbackHandler)
+                except OSError:
+                    server = ThreadingHTTPServer(('localhost', 0), CallbackHandler)
+                server.callback_params = None
+                server.callback_event = threading.Event()
+                server.callback_lock = threading.Lock()
+                threading.Thread(
+                    target=server.serve_forever, name='mcp-oauth-callback', daemon=True
+                ).start()
+                self._callback_server = server
+            return server
+    
+    @staticmethod
+    def _redirect_uri_for(server: ThreadingHTTPServer) -> str:
+        """Redirect URI pointing at a callback server"""
+        return f'http://localhost:{server.server_address[1]}{CALLBACK_PATH}'
+    
     def authorize_server(self, server_name: str, server_url: str) -> bool:
         """Complete OAuth authorization flow for a server
         
@@ -171,112 +324,185 @@ class OAuthHandler:
         Returns:
             True if authorization successful, False otherwise
         """
+        # The PKCE pair and state are generated while discovery and
+        # registration are on the network
+        flow_secrets = _get_executor().submit(self._generate_flow_secrets)
+        
         try:
-            # Step 1: Discover OAuth configuration
-            print(f"🔍 Discovering OAuth configuration for {server_url}...")
-            oauth_config = self.discovery.discover_oauth_config(server_url)
-            if not oauth_config:
-                print(f"❌ Could not discover OAuth configuration for {server_url}")
+            prepared = self._prepare_authorization(server_url)
+            if not prepared:
                 return False
+            return self._complete_authorization(server_name, *prepared, flow_secrets.result())
             
-            # Step 2: Attempt dynamic client registration
-            client_credentials = self._attempt_dynamic_registration(oauth_config)
-            if not client_credentials:
-                print(f"⚠️  Using default client configuration (public client)")
-                client_credentials = {
-                    'client_id': 'mcp-oauth-bridge',
-                    'client_secret': None
-                }
-            
-            # Step 3: Generate PKCE parameters
-            code_verifier, code_challenge = self._generate_pkce_pair()
-            
-            # Step 4: Start callback server
-            print(f"🔧 Starting callback server on http://localhost:8080...")
-            callback_server = self._start_callback_server()
+        except Exception as e:
+            logger.error("❌ Authorization error: %s", e)
+            return False
+    
+    async def authorize_servers(self, servers: List[Tuple[str, str]]) -> Dict[str, bool]:
+        """Authorize several servers, overlapping their network steps
+        
+        Discovery and client registration run concurrently for all servers.
+        The browser step needs the user, so each server is then completed
+        in turn.
+        
+        Args:
+            servers: (server_name, server_url) pairs
             
+        Returns:
+            Mapping of server name to whether authorization succeeded
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def prepare(server_url: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], str]]:
             try:
-                # Step 5: Build authorization URL
-                state = secrets.token_urlsafe(32)
-                auth_params = {
-                    'response_type': 'code',
-                    'client_id': client_credentials['client_id'],
-                    'redirect_uri': 'http://localhost:8080/oauth/callback',
-                    'code_challenge': code_challenge,
-                    'code_challenge_method': 'S256',
-                    'state': state,
-                }
-                
-                # Add scope if available
-                scopes = oauth_config.get('scopes_supported')
-                if scopes:
-                    auth_params['scope'] = ' '.join(scopes[:3])  # Use first few scopes
-                
-                auth_url = f"{oauth_config['authorization_endpoint']}?{urlencode(auth_params)}"
-                
-                # Step 6: Open browser for authorization
-                print(f"🌐 Opening browser for authorization...")
-                print(f"📋 Authorization URL: {auth_url}")
-                webbrowser.open(auth_url)
-                
-                # Step 7: Wait for callback
-                print(f"⏳ Waiting for authorization callback...")
-                timeout = 300  # 5 minutes
-                start_time = time.time()
-                
-                while callback_server.callback_params is None and (time.time() - start_time) < timeout:
-                    time.sleep(0.5)
-                
-                if callback_server.callback_params is None:
-                    print(f"❌ Authorization timeout after {timeout} seconds")
-                    return False
-                
-                callback_params = callback_server.callback_params
-                
-                # Step 8: Handle callback
-                if 'error' in callback_params:
-                    error = callback_params['error'][0]
-                    error_description = callback_params.get('error_description', [''])[0]
-                    print(f"❌ Authorization error: {error}")
-                    if error_description:
-                        print(f"   Description: {error_description}")
-                    return False
-                
-                if 'code' not in callback_params:
-                    print(f"❌ No authorization code received")
-                    return False
-                
-                auth_code = callback_params['code'][0]
-                received_state = callback_params.get('state', [''])[0]
-                
-                # Verify state parameter
-                if received_state != state:
-                    print(f"❌ State parameter mismatch")
-                    return False
-                
-                # Step 9: Exchange code for tokens
-                print(f"🔄 Exchanging authorization code for tokens...")
-                token_data = self._exchange_code_for_tokens(
-                    oauth_config, client_credentials, auth_code, code_verifier
+                return await loop.run_in_executor(None, self._prepare_authorization, server_url)
+            except Exception as e:
+                logger.error("❌ Authorization error for %s: %s", server_url, e)
+                return None
+        
+        prepared = await asyncio.gather(*(prepare(url) for _, url in servers))
+        
+        results = {}
+        for (server_name, _), flow in zip(servers, prepared):
+            if not flow:
+                results[server_name] = False
+                continue
+            try:
+                results[server_name] = await loop.run_in_executor(
+                    None, self._complete_authorization, server_name, *flow, self._generate_flow_secrets()
                 )
-                
-                if not token_data:
-                    print(f"❌ Token exchange failed")
-                    return False
-                
-                # Step 10: Store tokens and configuration
-                self.token_storage.store_token(server_name, token_data)
-                
-                print(f"✅ Authorization successful! Tokens saved for server '{server_name}'")
-                return True
-                
-            finally:
-                # Clean up callback server
-                callback_server.shutdown()
-                
-        except Exception as e:
-            print(f"❌ Authorization error: {e}")
+            except Exception as e:
+                logger.error("❌ Authorization error: %s", e)
+                results[server_name] = False
+        return results
+    
+    def _prepare_authorization(
+        self, server_url: str
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], str]]:
+        """Run the non-interactive steps of the authorization flow
+        
+        Args:
+            server_url: MCP server URL
+            
+        Returns:
+            Tuple of (oauth_config, client_credentials, redirect_uri), or
+            None if discovery fails
+        """
+        # Step 1: Discover OAuth configuration
+        logger.info("🔍 Discovering OAuth configuration for %s...", server_url)
+        oauth_config = self.discovery.discover_oauth_config(server_url)
+        if not oauth_config:
+            logger.error("❌ Could not discover OAuth configuration for %s", server_url)
+            return None
+        
+        # Step 2: Start callback server, whose address is the redirect URI
+        redirect_uri = self._redirect_uri_for(self._get_callback_server())
+        logger.debug("🔧 Callback server listening on %s", redirect_uri)
+        
+        # Step 3: Attempt dynamic client registration
+        client_credentials = self._attempt_dynamic_registration(oauth_config, redirect_uri)
+        if not client_credentials:
+            logger.warning("⚠️  Using default client configuration (public client)")
+            client_credentials = {
+                'client_id': 'mcp-oauth-bridge',
+                'client_secret': None
+            }
+        
+        return oauth_config, client_credentials, redirect_uri
+    
+    def _complete_authorization(
+        self,
+        server_name: str,
+        oauth_config: Dict[str, Any],
+        client_credentials: Dict[str, Any],
+        redirect_uri: str,
+        flow_secrets: Tuple[str, str, str]
+    ) -> bool:
+        """Run the browser steps of the authorization flow and store tokens
+        
+        Args:
+            server_name: Name to identify the server
+            oauth_config: OAuth configuration from discovery
+            client_credentials: Client ID and secret
+            redirect_uri: Redirect URI of the callback server
+            flow_secrets: (code_verifier, code_challenge, state) for this flow
+            
+        Returns:
+            True if authorization successful, False otherwise
+        """
+        # Step 4: Collect PKCE parameters and state
+        code_verifier, code_challenge, state = flow_secrets
+        callback_server = self._start_callback_server()
+        
+        # Step 5: Build authorization URL
+        auth_params = {
+            'response_type': 'code',
+            'client_id': client_credentials['client_id'],
+            'redirect_uri': redirect_uri,
+            'code_challenge': code_challenge,
+            'code_challenge_method': 'S256',
+            'state': state,
+        }
+        
+        # Add scope if available
+        scopes = oauth_config.get('scopes_supported')
+        if scopes:
+            auth_params['scope'] = ' '.join(scopes[:3])  # Use first few scopes
+        
+        auth_url = f"{oauth_config['authorization_endpoint']}?{urlencode(auth_params)}"
+        
+        # Step 6: Open browser for authorization
+        logger.info("🌐 Opening browser for authorization...")
+        logger.info("📋 Authorization URL: %s", auth_url)
+        webbrowser.open(auth_url)
+        
+        # Step 7: Wait for callback
+        logger.info("⏳ Waiting for authorization callback...")
+        timeout = 300  # 5 minutes
+        
+        if not callback_server.callback_event.wait(timeout):
+            logger.error("❌ Authorization timeout after %s seconds", timeout)
+            return False
+        
+        callback_params = callback_server.callback_params
+        
+        # Step 8: Handle callback
+        if 'error' in callback_params:
+            error = callback_params['error'][0]
+            error_description = callback_params.get('error_description', [''])[0]
+            if error_description:
+                logger.error("❌ Authorization error: %s (%s)", error, error_description)
+            else:
+                logger.error("❌ Authorization error: %s", error)
             return False
+        
+        if 'code' not in callback_params:
+            logger.error("❌ No authorization code received")
+            return False
+        
+        auth_code = callback_params['code'][0]
+        received_state = callback_params.get('state', [''])[0]
+        
+        # Verify state parameter
+        if received_state != state:
+            logger.error("❌ State parameter mismatch")
+            return False
+        
+        # Step 9: Exchange code for tokens
+        logger.info("🔄 Exchanging authorization code for tokens...")
+        token_data = self._exchange_code_for_tokens(
+            oauth_config, client_credentials, auth_code, code_verifier, redirect_uri
+        )
+        
+        if not token_data:
+            logger.error("❌ Token exchange failed")
+            return False
+        
+        # Step 10: Store tokens and configuration
+        self.token_storage.store_token(server_name, token_data)
+        
+        logger.info("✅ Authorization successful! Tokens saved for server '%s'", server_name)
+        return True
     
     def _exchange_code_for_tokens(
         self, 
@@ -299,41 +525,38 @@ class OAuthHandler:
             Token data or None if exchange fails
         """
         try:
-            # Use provided redirect_uri or default
-            if not redirect_uri:
-                redirect_uri = 'http://localhost:8081/oauth/callback'
-                
+            # Add client secret if available (confidential client); unset
+            # fields are left out rather than sent as the string "None"
             token_data = {
-                'grant_type': 'authorization_code',
-                'code': auth_code,
-                'redirect_uri': redirect_uri,
-                'code_verifier': code_verifier,
-                'client_id': client_credentials['client_id'],
+                key: value
+                for key, value in (
+                    ('grant_type', 'authorization_code'),
+                    ('code', auth_code),
+                    ('redirect_uri', redirect_uri or REDIRECT_URI),
+                    ('code_verifier', code_verifier),
+                    ('client_id', client_credentials['client_id']),
+                    ('client_secret', client_credentials.get('client_secret')),
+                )
+                if value
             }
             
-            # Add client secret if available (confidential client)
-            if client_credentials.get('client_secret'):
-                token_data['client_secret'] = client_credentials['client_secret']
-            
+            # requests form-encodes the dict and sets the Content-Type
             response = self.session.post(
                 oauth_config['token_endpoint'],
                 data=token_data,
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
                 timeout=10
             )
             
             if response.status_code != 200:
-                print(f"❌ Token exchange failed: {response.status_code}")
-                print(f"   Response: {response.text}")
+                logger.error("❌ Token exchange failed: %s %s", response.status_code, response.text)
                 return None
             
-            token_response = response.json()
+            token_response = _json.loads(response.content)
             
             # Calculate expiry time
             expires_at = None
             if 'expires_in' in token_response:
-                expires_in = int(token_response['expires_in'])
-                expires_at = (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).isoformat()
+                expires_at = time.time() + int(token_response['expires_in'])
             
             return TokenData(
                 access_token=token_response['access_token'],
@@ -344,12 +567,16 @@ class OAuthHandler:
             )
             
         except Exception as e:
-            print(f"❌ Token exchange error: {e}")
+            logger.error("❌ Token exchange error: %s", e)
             return None
     
     def refresh_token(self, server_name: str, oauth_config: Dict[str, Any]) -> bool:
         """Refresh access token for a server
         
+        The server's refresh lock is held for the whole refresh, so other
+        proxy workers and CLI runs sharing the token storage never send the
+        same (possibly rotating) refresh token twice.
+        
         Args:
             server_name: Server name
             oauth_config: OAuth configuration
@@ -362,49 +589,74 @@ class OAuthHandler:
             if not token_data or not token_data.refresh_token:
                 return False
             
-            print(f"🔄 Refreshing token for server '{server_name}'...")
-            
-            refresh_data = {
-                'grant_type': 'refresh_token',
-                'refresh_token': token_data.refresh_token,
-            }
-            
-            response = self.session.post(
-                oauth_config['token_endpoint'],
-                data=refresh_data,
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                print(f"❌ Token refresh failed: {response.status_code}")
-                return False
-            
-            token_response = response.json()
-            
-            # Calculate new expiry time
-            expires_at = None
-            if 'expires_in' in token_response:
-                expires_in = int(token_response['expires_in'])
-                expires_at = (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).isoformat()
-            
-            # Update token data
-            new_token_data = TokenData(
-                access_token=token_response['access_token'],
-                refresh_token=token_response.get('refresh_token', token_data.refresh_token),
-                token_type=token_response.get('token_type', 'Bearer'),
-                expires_at=expires_at,
-                scope=token_response.get('scope', token_data.scope)
-            )
-            
-            self.token_storage.store_token(server_name, new_token_data)
-            print(f"✅ Token refreshed successfully for server '{server_name}'")
-            return True
+            with self.token_storage.refresh_lock(server_name):
+                # Someone else refreshed while we waited for the lock
+                current = self.token_storage.get_token(server_name)
+                if current is None or current.refresh_token is None:
+                    return False
+                if current.access_token != token_data.access_token:
+                    logger.debug("✅ Token for server '%s' was refreshed elsewhere", server_name)
+                    return True
+                
+                return self._send_refresh(server_name, oauth_config, current)
             
         except Exception as e:
-            print(f"❌ Token refresh error: {e}")
+            logger.error("❌ Token refresh error: %s", e)
             return False
     
+    def _send_refresh(self, server_name: str, oauth_config: Dict[str, Any], token_data: TokenData) -> bool:
+        """Exchange a refresh token and store the result
+        
+        Called with the server's refresh lock held. The new token is written
+        out before the lock is released, even with write-behind, so the next
+        holder reads it instead of reusing the old refresh token.
+        
+        Args:
+            server_name: Server name
+            oauth_config: OAuth configuration
+            token_data: Stored token holding the refresh token
+            
+        Returns:
+            True if refresh successful, False otherwise
+        """
+        logger.debug("🔄 Refreshing token for server '%s'...", server_name)
+        
+        refresh_data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': token_data.refresh_token,
+        }
+        
+        response = self.session.post(
+            oauth_config['token_endpoint'],
+            data=refresh_data,
+            timeout=10
+        )
+        
+        if response.status_code != 200:
+            logger.error("❌ Token refresh failed: %s", response.status_code)
+            return False
+        
+        token_response = _json.loads(response.content)
+        
+        # Calculate new expiry time
+        expires_at = None
+        if 'expires_in' in token_response:
+            expires_at = time.time() + int(token_response['expires_in'])
+        
+        # Update token data
+        new_token_data = TokenData(
+            access_token=token_response['access_token'],
+            refresh_token=token_response.get('refresh_token', token_data.refresh_token),
+            token_type=token_response.get('token_type', 'Bearer'),
+            expires_at=expires_at,
+            scope=token_response.get('scope', token_data.scope)
+        )
+        
+        self.token_storage.store_token(server_name, new_token_data)
+        self.token_storage.flush()
+        logger.info("✅ Token refreshed successfully for server '%s'", server_name)
+        return True
+    
     def get_valid_token(self, server_name: str, oauth_config: Dict[str, Any]) -> Optional[str]:
         """Get a valid access token for a server, refreshing if necessary
         
@@ -428,17 +680,99 @@ class OAuthHandler:
             token_data = self.token_storage.get_token(server_name)
         
         return token_data.access_token if token_data else None
+    
+    async def get_valid_token_async(self, server_name: str, oauth_config: Dict[str, Any]) -> Optional[str]:
+        """Async variant of get_valid_token that batches refreshes
+        
+        Args:
+            server_name: Server name
+            oauth_config: OAuth configuration
+            
+        Returns:
+            Valid access token or None if unavailable
+        """
+        token_data = self.token_storage.get_token(server_name)
+        if not token_data:
+            return None
+        
+        if token_data.expires_soon(minutes=5):
+            if not await self.refresh_token_batched(server_name, oauth_config):
+                return None
+            token_data = self.token_storage.get_token(server_name)
+        
+        return token_data.access_token if token_data else None
+    
+    async def refresh_token_batched(self, server_name: str, oauth_config: Dict[str, Any]) -> bool:
+        """Refresh a server's token together with other pending refreshes
+        
+        Refreshes requested within REFRESH_BATCH_DELAY are sent concurrently,
+        and callers asking for a server that is already being refreshed wait
+        for that refresh instead of sending another request.
+        
+        Args:
+            server_name: Server name
+            oauth_config: OAuth configuration
+            
+        Returns:
+            True if refresh successful, False otherwise
+        """
+        future = self._inflight_refresh.get(server_name)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight_refresh[server_name] = future
+            self._refresh_queue[server_name] = oauth_config
+            if self._refresh_flush is None:
+                self._refresh_flush = loop.call_later(REFRESH_BATCH_DELAY, self._start_flush, loop)
+        
+        # Shielded so one cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(future)
+    
+    def _start_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start sending the queued refreshes, keeping the task until it ends"""
+        task = loop.create_task(self._flush_refreshes())
+        self._refresh_flush_task = task
+        task.add_done_callback(self._flush_done)
+    
+    def _flush_done(self, task: asyncio.Task) -> None:
+        """Forget a finished flush task"""
+        if self._refresh_flush_task is task:
+            self._refresh_flush_task = None
+    
+    async def _flush_refreshes(self) -> None:
+        """Send every queued refresh at once and resolve their waiters"""
+        self._refresh_flush = None
+        queued, self._refresh_queue = self._refresh_queue, {}
+        
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(None, self.refresh_token, server_name, oauth_config)
+                for server_name, oauth_config in queued.items()
+            ),
+            return_exceptions=True
+        )
+        
+        for server_name, result in zip(queued, results):
+            future = self._inflight_refresh.pop(server_name)
+            if not future.done():
+                future.set_result(result is True)
 
     async def register_client(self, oauth_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Async wrapper for dynamic client registration
         
+        The client is registered for the callback server's redirect URI, so
+        it matches the one authorize_server_async sends even when the server
+        had to fall back to an ephemeral port.
+        
         Args:
             oauth_config: OAuth configuration from discovery
             
         Returns:
             Client configuration dict or None if registration fails
         """
-        return self._attempt_dynamic_registration(oauth_config)
+        redirect_uri = self._redirect_uri_for(self._get_callback_server())
+        return self._attempt_dynamic_registration(oauth_config, redirect_uri)
 
     async def authorize_server_async(self, oauth_config: Dict[str, Any], client_config: Optional[Dict[str, Any]] = None, open_browser: bool = True) -> Optional[Dict[str, Any]]:
         """Async method for OAuth authorization flow
@@ -465,10 +799,15 @@ class OAuthHandler:
             # Start callback server
             if open_browser:
                 callback_server = self._start_callback_server()
-                redirect_uri = 'http://localhost:8081/oauth/callback'
+                redirect_uri = self._redirect_uri_for(callback_server)
+                if redirect_uri != REDIRECT_URI:
+                    logger.warning(
+                        "⚠️  Port %d is in use, so the callback is %s; a client registered "
+                        "for %s will be rejected by the server", CALLBACK_PORT, redirect_uri, REDIRECT_URI
+                    )
             else:
                 callback_server = None
-                redirect_uri = 'urn:ietf:wg:oauth:2.0:oob'  # Out-of-band flow
+                redirect_uri = OOB_REDIRECT_URI  # Out-of-band flow
             
             # Build authorization URL
             auth_params = {
@@ -484,32 +823,25 @@ class OAuthHandler:
             auth_url = f"{oauth_config['authorization_endpoint']}?{urlencode(auth_params)}"
             
             if open_browser:
-                print(f"🌐 Opening browser for authorization...")
+                logger.info("🌐 Opening browser for authorization...")
                 webbrowser.open(auth_url)
                 
                 # Wait for callback
-                start_time = time.time()
                 timeout = 300  # 5 minutes
-                
-                while time.time() - start_time < timeout:
-                    if callback_server.callback_params:
-                        break
-                    time.sleep(0.5)
-                
-                callback_server.shutdown()
+                callback_server.callback_event.wait(timeout)
                 
                 if not callback_server.callback_params:
-                    print("❌ Authorization timeout")
+                    logger.error("❌ Authorization timeout")
                     return None
                 
                 # Get authorization code
                 params = callback_server.callback_params
                 if 'error' in params:
-                    print(f"❌ Authorization failed: {params['error'][0]}")
+                    logger.error("❌ Authorization failed: %s", params['error'][0])
                     return None
                 
                 if 'code' not in params:
-                    print("❌ No authorization code received")
+                    logger.error("❌ No authorization code received")
                     return None
                 
                 auth_code = params['code'][0]
@@ -533,7 +865,7 @@ class OAuthHandler:
             return None
             
         except Exception as e:
-            print(f"❌ Authorization error: {e}")
+            logger.error("❌ Authorization error: %s", e)
             return None
 
     async def refresh_token_async(self, oauth_config: Dict[str, Any], refresh_token: str) -> Optional[Dict[str, Any]]:
@@ -547,7 +879,7 @@ class OAuthHandler:
             New token dictionary or None if refresh fails
         """
         try:
-            print(f"🔄 Refreshing token...")
+            logger.debug("🔄 Refreshing token...")
             
             refresh_data = {
                 'grant_type': 'refresh_token',
@@ -557,21 +889,19 @@ class OAuthHandler:
             response = self.session.post(
                 oauth_config['token_endpoint'],
                 data=refresh_data,
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
                 timeout=10
             )
             
             if response.status_code != 200:
-                print(f"❌ Token refresh failed: {response.status_code}")
+                logger.error("❌ Token refresh failed: %s", response.status_code)
                 return None
             
-            token_response = response.json()
+            token_response = _json.loads(response.content)
             
             # Calculate new expiry time
             expires_at = None
             if 'expires_in' in token_response:
-                expires_in = int(token_response['expires_in'])
-                expires_at = (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).isoformat()
+                expires_at = time.time() + int(token_response['expires_in'])
             
             return {
                 'access_token': token_response['access_token'],
@@ -582,5 +912,5 @@ class OAuthHandler:
             }
             
         except Exception as e:
-            print(f"❌ Token refresh error: {e}")
+            logger.error("❌ Token refresh error: %s", e)
             return None 
\ No newline at end of file
@@ -9,28 +9,105 @@ This module provides a proxy server that:
 """
 
 import asyncio
-import json
+import importlib.util
 import logging
-from typing import Dict, Any, Optional, List
-from urllib.parse import urlparse, parse_qs
-import uuid
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, Any, Awaitable, Callable, Optional, List, Set, Tuple
 
 from fastapi import FastAPI, Request, Response, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import httpx
+from jinja2 import FileSystemBytecodeCache
 import uvicorn
+from starlette.background import BackgroundTask
 
-from .config import Config
+from . import _json
+from ._compat import DATACLASS_SLOTS
+from .config import Config, ServerConfig
 from .oauth import OAuthHandler
 from .tokens import TokenManager
 from .approvals import ApprovalManager
 from .adapters.openai import OpenAIAdapter
 from .adapters.anthropic import AnthropicAdapter
+from .adapters._http import close_shared_client, http2_available
 
 logger = logging.getLogger(__name__)
 
+# Hop-by-hop headers (RFC 9110 section 7.6.1) apply to a single connection and
+# are never forwarded
+_HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade",
+})
+
+# Request headers replaced by the proxy: httpx sets host and content-length
+# for the upstream request, and authorization carries the server's token
+_REQUEST_SKIP_HEADERS = _HOP_BY_HOP_HEADERS | {b"host", b"content-length", b"authorization"}
+
+# MCP request bodies of at least this size (or of unknown size) are streamed
+# upstream as they arrive instead of being read into memory first; smaller
+# ones are buffered so they can be replayed after a token refresh
+_STREAM_BODY_BYTES = 1024 * 1024
+
+# API request bodies larger than this are parsed, and their responses
+# serialized, on a worker thread so they do not stall the event loop; for
+# smaller ones the thread hop costs more than it saves
+_OFFLOAD_JSON_BYTES = 64 * 1024
+
+
+async def _json_work(size: int, func: Callable[..., Any], *args: Any) -> Any:
+    """Run JSON parsing or serialization, off the event loop for large bodies"""
+    if size > _OFFLOAD_JSON_BYTES:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    return func(*args)
+
+
+# Methods forwarded to MCP servers
+_MCP_METHODS = ["GET", "POST", "PUT", "DELETE", "PATCH"]
+
+# Environment variable that passes the config directory to worker processes
+_WORKER_CONFIG_ENV = "MCP_OAUTH_BRIDGE_CONFIG_DIR"
+
+
+def _uvicorn_implementations() -> Tuple[str, str]:
+    """Pick uvicorn's event loop and HTTP parser
+
+    uvloop and httptools (``pip install mcp-oauth-bridge[fast]``) are used
+    when they are installed; neither supports every platform, so asyncio and
+    h11 are the fallbacks.
+
+    Returns:
+        ``(loop, http)`` names for ``uvicorn.Config``
+    """
+    loop_impl = "asyncio"
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None:
+        loop_impl = "uvloop"
+    http_impl = "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+    return loop_impl, http_impl
+
+
+class _JSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed"""
+    
+    def render(self, content: Any) -> bytes:
+        return _json.dumps(content)
+
+
+@dataclass(**DATACLASS_SLOTS)
+class _Upstream:
+    """An MCP server's configuration and its forwarding client"""
+    server: ServerConfig
+    client: httpx.AsyncClient
+    # Forwarded requests whose responses are still being streamed
+    active: int = 0
+    # Set once the server was removed or moved to another URL; the client
+    # is closed when its last response finishes
+    retired: bool = False
+
 
 class ProxyServer:
     """Multi-API HTTP proxy server for MCP OAuth Bridge"""
@@ -44,16 +121,106 @@ class ProxyServer:
         self.anthropic_adapter = AnthropicAdapter()
         
         # Create FastAPI app
-        self.app = FastAPI(title="MCP OAuth Bridge", version="0.1.0")
+        self.app = FastAPI(
+            title="MCP OAuth Bridge",
+            version="0.1.0",
+            default_response_class=_JSONResponse
+        )
         
-        # Setup templates
+        # Setup templates. Compiled templates are kept in a bytecode cache
+        # under the config directory and are not re-checked for changes, so
+        # each one is parsed once rather than on every render
         self.templates = Jinja2Templates(directory="templates")
+        jinja_cache_dir = config.config_dir / "jinja_cache"
+        jinja_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.templates.env.bytecode_cache = FileSystemBytecodeCache(str(jinja_cache_dir))
+        self.templates.env.auto_reload = False
         
         # Setup routes
         self._setup_routes()
         
-        # HTTP client for forwarding requests
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        # Token refreshes in flight, by server name; concurrent callers
+        # await the same one
+        self._refresh_futures: Dict[str, asyncio.Future] = {}
+        
+        # Server configuration and HTTP client for forwarding requests, by
+        # server name, resolved once and reused until that server changes.
+        # There is one client per MCP server so a slow server cannot exhaust
+        # the connection pool of the others. Each pool is sized from the
+        # config. Clients being closed are kept until they are
+        settings = config.http_client
+        self._upstreams: Dict[str, _Upstream] = {}
+        self._upstreams_version = config.servers_version
+        self._closing: Set[asyncio.Future] = set()
+        self._client_options: Dict[str, Any] = dict(
+            timeout=httpx.Timeout(
+                connect=settings["connect_timeout"],
+                read=settings["read_timeout"],
+                write=settings["write_timeout"],
+                pool=settings["pool_timeout"],
+            ),
+            limits=httpx.Limits(
+                max_keepalive_connections=int(settings["max_keepalive_connections"]),
+                max_connections=int(settings["max_connections"]),
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            http2=http2_available(),
+        )
+    
+    def _get_upstream(self, server_name: str) -> Optional[_Upstream]:
+        """Get the configuration and HTTP client for an MCP server
+        
+        Args:
+            server_name: Name of the server
+            
+        Returns:
+            The server's upstream, or None if the server is not configured
+        """
+        if self._upstreams_version != self.config.servers_version:
+            # A server was added, removed or replaced. Only clients of
+            # servers that are gone or have a new URL are retired
+            self._upstreams_version = self.config.servers_version
+            for name, upstream in list(self._upstreams.items()):
+                server = self.config.get_server(name)
+                if server is not None and server.url == upstream.server.url:
+                    upstream.server = server
+                else:
+                    del self._upstreams[name]
+                    self._retire_upstream(upstream)
+        
+        upstream = self._upstreams.get(server_name)
+        if upstream is None:
+            server = self.config.get_server(server_name)
+            if server is None:
+                return None
+            client = httpx.AsyncClient(base_url=server.url, **self._client_options)
+            upstream = self._upstreams[server_name] = _Upstream(server, client)
+        return upstream
+    
+    def _retire_upstream(self, upstream: _Upstream) -> None:
+        """Close an upstream's client once no response is using it"""
+        upstream.retired = True
+        if upstream.active == 0:
+            self._close_client(upstream.client)
+    
+    def _release_upstream(self, upstream: _Upstream) -> None:
+        """Mark one forwarded request of an upstream as finished"""
+        upstream.active -= 1
+        if upstream.retired and upstream.active == 0:
+            self._close_client(upstream.client)
+    
+    def _close_client(self, client: httpx.AsyncClient) -> None:
+        """Close a client in the background, keeping the task until it is done"""
+        task = asyncio.ensure_future(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    async def _finish_upstream_response(self, response: httpx.Response, upstream: _Upstream) -> None:
+        """Close a streamed upstream response and release its client"""
+        try:
+            await response.aclose()
+        finally:
+            self._release_upstream(upstream)
     
     def _setup_routes(self):
         """Setup all HTTP routes"""
@@ -63,10 +230,13 @@ class ProxyServer:
         async def health_check():
             return {"status": "ok", "message": "MCP OAuth Bridge is running"}
         
-        # MCP server proxy routes
-        @self.app.api_route("/mcp/{server_name}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
-        async def proxy_mcp_request(server_name: str, path: str, request: Request):
-            return await self._handle_mcp_request(server_name, path, request)
+        # MCP server proxy routes; the handler is registered directly rather
+        # than through a wrapper coroutine since this is the hot path
+        self.app.add_api_route(
+            "/mcp/{server_name}/{path:path}",
+            self._handle_mcp_request,
+            methods=_MCP_METHODS,
+        )
         
         # OpenAI-specific routes
         @self.app.post("/openai/responses")
@@ -103,8 +273,12 @@ class ProxyServer:
         
         # Configuration routes
         @self.app.get("/config/servers")
-        async def list_servers():
-            return {"servers": list(self.config.servers.keys())}
+        async def list_servers(request: Request):
+            # Polling clients revalidate with If-None-Match and get a bare 304
+            etag = self.config.servers_etag
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            return _JSONResponse({"servers": self.config.server_names}, headers={"ETag": etag})
         
         @self.app.get("/config/servers/{server_name}")
         async def get_server_config(server_name: str):
@@ -115,73 +289,117 @@ class ProxyServer:
     
     async def _handle_mcp_request(self, server_name: str, path: str, request: Request) -> Response:
         """Handle direct MCP server requests with OAuth token injection"""
+        # Upstream whose client this request holds until its response is done
+        leased: Optional[_Upstream] = None
         try:
             # Get server configuration
-            server = self.config.get_server(server_name)
-            if not server:
+            upstream = self._get_upstream(server_name)
+            if upstream is None:
                 raise HTTPException(status_code=404, detail=f"Server '{server_name}' not configured")
+            client = upstream.client
+            upstream.active += 1
+            leased = upstream
             
             # Get OAuth token
             token = self.token_manager.get_token(server_name)
             if not token:
                 raise HTTPException(status_code=401, detail=f"No valid OAuth token for server '{server_name}'")
             
-            # Prepare target URL
-            target_url = f"{server.url.rstrip('/')}/mcp/{path.lstrip('/')}"
+            # Refresh a token that is about to expire before forwarding, rather
+            # than paying for an upstream 401 first; the 401 retry below still
+            # covers clock skew. Concurrent requests share one refresh
+            if token.refresh_token and token.expires_soon(minutes=1):
+                if await self._refresh_token(server_name):
+                    token = self.token_manager.get_token(server_name) or token
+            
+            # Target path, relative to the server's base URL, with the query
+            # string passed through as sent (repeated keys included)
+            target_path = f"/mcp/{path.lstrip('/')}"
+            query = request.scope.get("query_string", b"")
+            if query:
+                target_path = f"{target_path}?{query.decode('latin-1')}"
             
-            # Get request data
-            body = await request.body()
-            headers = dict(request.headers)
+            # Get request data, filtering the raw header list in one pass
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit():
+                replayable = int(content_length) < _STREAM_BODY_BYTES
+            else:
+                replayable = "transfer-encoding" not in request.headers
+            body = await request.body() if replayable else request.stream()
+            headers = httpx.Headers([
+                (name, value) for name, value in request.headers.raw
+                if name not in _REQUEST_SKIP_HEADERS
+            ])
             
-            # Remove host and content-length headers
-            headers.pop('host', None)
-            headers.pop('content-length', None)
+            if not replayable and content_length.isdigit():
+                # Keep the declared length so the body is not re-chunked
+                headers['Content-Length'] = content_length
             
             # Add OAuth token
             headers['Authorization'] = f"Bearer {token.access_token}"
             
-            # Forward request
-            response = await self.http_client.request(
-                method=request.method,
-                url=target_url,
-                content=body,
-                headers=headers,
-                params=dict(request.query_params)
-            )
+            # Forward request; only the status line and headers are read here,
+            # the body is streamed through to the client below
+            def send() -> Awaitable[httpx.Response]:
+                return client.send(
+                    client.build_request(
+                        method=request.method,
+                        url=target_path,
+                        content=body,
+                        headers=headers
+                    ),
+                    stream=True
+                )
+            
+            response = await send()
             
             # Handle token refresh if needed
             if response.status_code == 401:
-                logger.info(f"Token expired for {server_name}, attempting refresh")
-                refreshed = await self._refresh_token(server_name)
-                if refreshed:
+                # Another request may have refreshed the token while this one
+                # was upstream; then only the retry is needed
+                current = self.token_manager.get_token(server_name)
+                if current is not None and current.access_token != token.access_token:
+                    refreshed = True
+                else:
+                    logger.info(f"Token expired for {server_name}, attempting refresh")
+                    refreshed = await self._refresh_token(server_name)
+                # A streamed body has been consumed and cannot be sent again;
+                # the refreshed token then serves the client's next request
+                if refreshed and replayable:
                     # Retry with new token
+                    await response.aclose()
                     token = self.token_manager.get_token(server_name)
                     headers['Authorization'] = f"Bearer {token.access_token}"
-                    response = await self.http_client.request(
-                        method=request.method,
-                        url=target_url,
-                        content=body,
-                        headers=headers,
-                        params=dict(request.query_params)
-                    )
+                    response = await send()
             
-            # Return response
-            return Response(
-                content=response.content,
+            # Return response, passing the raw (still encoded) body and the
+            # upstream headers through unchanged; headers stay raw pairs so
+            # repeated ones such as set-cookie survive
+            proxied = StreamingResponse(
+                response.aiter_raw(),
                 status_code=response.status_code,
-                headers=dict(response.headers)
+                background=BackgroundTask(self._finish_upstream_response, response, upstream)
+            )
+            proxied.raw_headers.extend(
+                (name.lower(), value) for name, value in response.headers.raw
+                if name.lower() not in _HOP_BY_HOP_HEADERS
             )
+            return proxied
             
         except Exception as e:
+            if leased is not None:
+                self._release_upstream(leased)
             logger.error(f"Error handling MCP request for {server_name}/{path}: {e}")
             raise HTTPException(status_code=500, detail=str(e))
     
     async def _handle_openai_request(self, request: Request) -> Response:
         """Handle OpenAI Responses API requests"""
         try:
-            body = await request.json()
+            raw_body = await request.body()
+            body = await _json_work(len(raw_body), self.openai_adapter.parse_request, raw_body)
             result = await self.openai_adapter.handle_request(body)
-            return JSONResponse(content=result)
+            payload = await _json_work(len(raw_body), _json.dumps, result)
+            return Response(content=payload, media_type="application/json")
         except Exception as e:
             logger.error(f"Error handling OpenAI request: {e}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -189,14 +407,27 @@ class ProxyServer:
     async def _handle_anthropic_request(self, request: Request) -> Response:
         """Handle Anthropic Messages API requests"""
         try:
-            body = await request.json()
+            raw_body = await request.body()
+            body = await _json_work(len(raw_body), self.anthropic_adapter.parse_request, raw_body)
             result = await self.anthropic_adapter.handle_request(body)
-            return JSONResponse(content=result)
+            payload = await _json_work(len(raw_body), _json.dumps, result)
+            return Response(content=payload, media_type="application/json")
         except Exception as e:
             logger.error(f"Error handling Anthropic request: {e}")
             raise HTTPException(status_code=500, detail=str(e))
     
     async def _refresh_token(self, server_name: str) -> bool:
+        """Refresh OAuth token for a server, joining a refresh already in flight"""
+        future = self._refresh_futures.get(server_name)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh_token_once(server_name))
+            self._refresh_futures[server_name] = future
+            future.add_done_callback(lambda _: self._refresh_futures.pop(server_name, None))
+        
+        # Shielded so a cancelled request does not cancel the shared refresh
+        return await asyncio.shield(future)
+    
+    async def _refresh_token_once(self, server_name: str) -> bool:
         """Refresh OAuth token for a server"""
         try:
             server = self.config.get_server(server_name)
@@ -208,34 +439,17 @@ class ProxyServer:
             if not current_token or not current_token.refresh_token:
                 return False
             
-            # Refresh token
-            new_token = await self.oauth_handler.refresh_token_async(
-                server.oauth_config, 
-                current_token.refresh_token
-            )
-            
-            if new_token:
-                # Convert dict to TokenData and store
-                from .tokens import TokenData
-                new_token_data = TokenData(
-                    access_token=new_token.get('access_token'),
-                    refresh_token=new_token.get('refresh_token'),
-                    token_type=new_token.get('token_type', 'Bearer'),
-                    expires_at=new_token.get('expires_at'),
-                    scope=new_token.get('scope')
-                )
-                self.token_manager.store_token(server_name, new_token_data)
+            refreshed = await self.oauth_handler.refresh_token_batched(server_name, server.oauth_config)
+            if refreshed:
                 logger.info(f"Successfully refreshed token for {server_name}")
-                return True
-            
-            return False
+            return refreshed
             
         except Exception as e:
             logger.error(f"Error refreshing token for {server_name}: {e}")
             return False
     
-    async def start(self, host: str = "localhost", port: int = 3000):
-        """Start the proxy server"""
+    def _log_startup(self, host: str, port: int) -> None:
+        """Log where the proxy listens and which servers it knows"""
         logger.info(f"🚀 MCP OAuth Bridge starting on http://{host}:{port}")
         logger.info(f"📋 Approval UI available at http://{host}:{port}/approvals")
         
@@ -247,32 +461,162 @@ class ProxyServer:
             logger.warning("⚠️ No servers configured. Use 'mcp-oauth-bridge add' to add servers.")
         
         logger.info("🔌 Supporting OpenAI Responses API and Anthropic Messages API")
+    
+    async def start(self, host: str = "localhost", port: int = 3000):
+        """Start the proxy server"""
+        self._log_startup(host, port)
         
         # Start server
-        config = uvicorn.Config(
-            self.app,
-            host=host,
-            port=port,
-            log_level="info",
-            access_log=True
-        )
-        server = uvicorn.Server(config)
-        await server.serve()
+        server = uvicorn.Server(uvicorn.Config(self.app, **_uvicorn_options(host, port)))
+        
+        # Token changes (mostly refreshes) are written in the background so
+        # bursts of updates cost one encrypted write
+        self.token_manager.write_behind = True
+        flusher = asyncio.ensure_future(self._flush_tokens_in_background())
+        try:
+            await server.serve()
+        finally:
+            flusher.cancel()
+    
+    def _run_in_worker(self) -> None:
+        """Hook token flushing and cleanup into the app's own lifecycle
+        
+        Worker processes are started by uvicorn rather than start(), so the
+        app starts and stops the background work itself.
+        """
+        flusher: List[asyncio.Future] = []
+        
+        async def on_startup() -> None:
+            self.token_manager.write_behind = True
+            flusher.append(asyncio.ensure_future(self._flush_tokens_in_background()))
+        
+        async def on_shutdown() -> None:
+            for task in flusher:
+                task.cancel()
+            await self.stop()
+        
+        self.app.router.on_startup.append(on_startup)
+        self.app.router.on_shutdown.append(on_shutdown)
+    
+    async def _flush_tokens_in_background(self, delay: float = 0.1) -> None:
+        """Write pending token changes shortly after they are made
+        
+        The task sleeps until the token manager queues a change, then waits
+        ``delay`` seconds so a burst of changes is written together.
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        
+        def wake() -> None:
+            # Tokens also change on executor threads, e.g. during refreshes
+            try:
+                on_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                changed.set()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(changed.set)
+        
+        self.token_manager.on_write_pending = wake
+        if self.token_manager.has_pending_writes:
+            changed.set()
+        try:
+            while True:
+                await changed.wait()
+                await asyncio.sleep(delay)
+                changed.clear()
+                if self.token_manager.has_pending_writes:
+                    try:
+                        await loop.run_in_executor(None, self.token_manager.flush)
+                    except Exception as e:
+                        logger.error(f"Error writing tokens: {e}")
+                        # Try again after the next delay
+                        changed.set()
+        finally:
+            self.token_manager.on_write_pending = None
     
     async def stop(self):
         """Stop the proxy server and cleanup"""
-        await self.http_client.aclose()
+        self.token_manager.flush()
+        upstreams, self._upstreams = list(self._upstreams.values()), {}
+        await asyncio.gather(
+            *(upstream.client.aclose() for upstream in upstreams),
+            *self._closing
+        )
+        await close_shared_client()
         logger.info("🛑 MCP OAuth Bridge stopped")
 
 
+def _uvicorn_options(host: str, port: int) -> Dict[str, Any]:
+    """uvicorn settings shared by single- and multi-process runs"""
+    loop_impl, http_impl = _uvicorn_implementations()
+    return dict(
+        host=host,
+        port=port,
+        loop=loop_impl,
+        http=http_impl,
+        lifespan="on",
+        log_level="info",
+        access_log=True,
+    )
+
+
 def create_proxy_server(config_path: Optional[str] = None) -> ProxyServer:
     """Create and configure a proxy server instance"""
     config = Config(config_path)
     return ProxyServer(config)
 
 
-async def run_proxy_server(config_path: Optional[str] = None, host: str = "localhost", port: int = 3000):
-    """Run the proxy server (convenience function)"""
+def _create_worker_app() -> FastAPI:
+    """App factory run by each uvicorn worker process"""
+    proxy = create_proxy_server(os.environ.get(_WORKER_CONFIG_ENV) or None)
+    proxy._run_in_worker()
+    return proxy.app
+
+
+def _serve_workers(config_path: Optional[str], host: str, port: int, workers: int) -> None:
+    """Serve the proxy from ``workers`` processes sharing one socket
+    
+    Each worker builds its own ProxyServer from the config directory; tokens
+    are shared through tokens.enc, whose writes are serialized with a file
+    lock.
+    """
+    if config_path:
+        os.environ[_WORKER_CONFIG_ENV] = str(config_path)
+    create_proxy_server(config_path)._log_startup(host, port)
+    logger.info(f"👥 Running {workers} worker processes")
+    
+    uvicorn.run(
+        f"{__name__}:_create_worker_app",
+        factory=True,
+        workers=workers,
+        **_uvicorn_options(host, port)
+    )
+
+
+async def run_proxy_server(
+    config_path: Optional[str] = None,
+    host: str = "localhost",
+    port: int = 3000,
+    workers: int = 1,
+):
+    """Run the proxy server (convenience function)
+    
+    Args:
+        config_path: Custom configuration directory
+        host: Host to bind to
+        port: Port to bind to
+        workers: Number of worker processes; more than one prefork
+            uvicorn workers so requests are handled on several cores
+    """
+    if workers > 1:
+        # The process supervisor blocks until shutdown and installs its own
+        # signal handlers, which requires the main thread; the event loop
+        # has nothing else to run in this process meanwhile
+        _serve_workers(config_path, host, port, workers)
+        return
+    
     proxy = create_proxy_server(config_path)
     try:
         await proxy.start(host, port)
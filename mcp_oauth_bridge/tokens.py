@@ -5,12 +5,17 @@ Handles secure local storage of OAuth tokens with encryption.
 Tokens are encrypted using a key derived from the system and user.
 """
 
-import json
+import asyncio
+import contextlib
+import logging
 import os
+import re
 import base64
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterator, Tuple, Union
+from dataclasses import dataclass, fields, replace
 from datetime import datetime, timezone
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
@@ -18,53 +23,137 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import getpass
 import socket
 
+from . import _json
+from ._compat import DATACLASS_SLOTS
 
-@dataclass
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Derived ciphers keyed by (username, hostname, salt); PBKDF2 runs once per
+# process instead of once per TokenStorage
+_FERNET_CACHE: Dict[Tuple[str, str, bytes], Fernet] = {}
+
+
+@dataclass(**DATACLASS_SLOTS)
 class TokenData:
-    """OAuth token data structure"""
+    """OAuth token data structure
+    
+    ``expires_at`` is a Unix timestamp. ISO 8601 strings written by older
+    versions are converted when a token is loaded.
+    """
     access_token: str
     refresh_token: Optional[str] = None
     token_type: str = "Bearer"
-    expires_at: Optional[str] = None
+    expires_at: Optional[float] = None
     scope: Optional[str] = None
     
+    def __post_init__(self) -> None:
+        if isinstance(self.expires_at, str):
+            self.expires_at = _parse_expiry(self.expires_at)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict of the token fields, for serialization"""
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "token_type": self.token_type,
+            "expires_at": self.expires_at,
+            "scope": self.scope,
+        }
+    
     def is_expired(self) -> bool:
         """Check if the token is expired"""
         if not self.expires_at:
             return False
-        
-        try:
-            expiry = datetime.fromisoformat(self.expires_at.replace('Z', '+00:00'))
-            return datetime.now(timezone.utc) >= expiry
-        except (ValueError, AttributeError):
-            return False
+        return time.time() >= self.expires_at
     
     def expires_soon(self, minutes: int = 5) -> bool:
         """Check if token expires within the given minutes"""
         if not self.expires_at:
             return False
-        
+        return time.time() >= self.expires_at - minutes * 60
+
+
+_TOKEN_FIELDS = frozenset(field.name for field in fields(TokenData))
+
+
+@contextlib.contextmanager
+def _exclusive_file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on ``path`` across processes
+
+    Proxy workers and CLI runs share tokens.enc, so its read-merge-write and
+    each server's refresh are serialized with flock. On platforms without
+    fcntl this does nothing, leaving only the in-process locks.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
         try:
-            expiry = datetime.fromisoformat(self.expires_at.replace('Z', '+00:00'))
-            soon = datetime.now(timezone.utc).timestamp() + (minutes * 60)
-            return expiry.timestamp() <= soon
-        except (ValueError, AttributeError):
-            return False
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_expiry(value: str) -> Optional[float]:
+    """Convert a stored expiry (ISO 8601 or numeric string) to a timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        expiry = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry.timestamp()
 
 
 class TokenStorage:
     """Secure token storage with encryption"""
     
-    def __init__(self, config_dir: Optional[Path] = None) -> None:
+    def __init__(self, config_dir: Optional[Union[str, Path]] = None) -> None:
         """Initialize token storage
         
         Args:
             config_dir: Custom config directory, defaults to ~/.mcp-oauth-bridge
         """
-        self.config_dir = config_dir or Path.home() / ".mcp-oauth-bridge"
+        self.config_dir = Path(config_dir) if config_dir else Path.home() / ".mcp-oauth-bridge"
         self.tokens_file = self.config_dir / "tokens.enc"
+        self.clients_file = self.config_dir / "clients.enc"
+        self._lock_file = self.config_dir / "tokens.lock"
         self._fernet = self._create_cipher()
         
+        # Decrypted tokens along with the signature of the file they came
+        # from; reused until tokens.enc changes on disk. The lock covers
+        # read-modify-write of the cached dict
+        self._cache: Optional[Dict[str, TokenData]] = None
+        self._cache_signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.RLock()
+        
+        # Servers changed by this process since the last save, mapped to
+        # their new token (None once removed). Saves apply only these
+        # entries to what is on disk, so other processes sharing tokens.enc
+        # keep their own changes
+        self._pending: Dict[str, Optional[TokenData]] = {}
+        
+        # With write_behind set, mutations only update the cache and queue
+        # the change, and flush() writes it out; otherwise every mutation is
+        # written immediately. on_write_pending, when set, is called (from
+        # whichever thread made the change) each time a change is queued
+        self.write_behind = False
+        self.on_write_pending: Optional[Callable[[], None]] = None
+        
+        # Earliest expiry among tokens that cleanup_expired_tokens could
+        # remove (no refresh token), or None when not known
+        self._next_expiry: Optional[float] = None
+        
         # Ensure config directory exists
         self.config_dir.mkdir(exist_ok=True)
     
@@ -82,6 +171,11 @@ class TokenStorage:
         # In production, you might want to store a random salt separately
         salt = b"mcp_oauth_bridge_salt_v1"
         
+        cache_key = (username, hostname, salt)
+        cached = _FERNET_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+        
         # Derive key using PBKDF2
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
@@ -90,59 +184,173 @@ class TokenStorage:
             iterations=100000,
         )
         key = base64.urlsafe_b64encode(kdf.derive(password))
-        return Fernet(key)
+        fernet = _FERNET_CACHE[cache_key] = Fernet(key)
+        return fernet
     
-    def _load_tokens(self) -> Dict[str, TokenData]:
-        """Load and decrypt tokens from storage"""
-        if not self.tokens_file.exists():
-            return {}
+    def _read_tokens_file(self) -> Tuple[Dict[str, TokenData], Optional[Tuple[int, int, int]]]:
+        """Read and decrypt tokens.enc as currently on disk
         
+        Returns:
+            Tuple of (tokens, file signature); empty tokens and a None
+            signature if the file does not exist
+        """
         try:
             with open(self.tokens_file, 'rb') as f:
+                st = os.fstat(f.fileno())
                 encrypted_data = f.read()
-            
+        except FileNotFoundError:
+            return {}, None
+        
+        # The file is replaced rather than rewritten, so a new inode also
+        # shows a change that kept the size and mtime
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        
+        try:
             # Decrypt the data
             decrypted_data = self._fernet.decrypt(encrypted_data)
-            tokens_dict = json.loads(decrypted_data.decode())
+            tokens_dict = _json.loads(decrypted_data)
             
             # Convert back to TokenData objects
             tokens = {}
             for server_name, token_dict in tokens_dict.items():
                 tokens[server_name] = TokenData(**token_dict)
-            
-            return tokens
+            return tokens, signature
             
         except Exception as e:
             print(f"⚠️  Warning: Could not load tokens: {e}")
             print("Token storage may be corrupted or from a different system")
-            return {}
+            return {}, signature
+    
+    def _apply_pending(self, tokens: Dict[str, TokenData]) -> Dict[str, TokenData]:
+        """Apply this process's unsaved changes on top of tokens"""
+        for server_name, token in self._pending.items():
+            if token is None:
+                tokens.pop(server_name, None)
+            else:
+                tokens[server_name] = token
+        return tokens
     
-    def _save_tokens(self, tokens: Dict[str, TokenData]) -> None:
-        """Encrypt and save tokens to storage"""
+    def _load_tokens(self) -> Dict[str, TokenData]:
+        """Load and decrypt tokens from storage
+        
+        Returns the cached dict while tokens.enc is unchanged. When another
+        process has replaced the file, it is read again and unsaved changes
+        of this process are applied on top. Callers must hold the lock and
+        change tokens through _set_token only.
+        """
+        try:
+            st = os.stat(self.tokens_file)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        
+        if self._cache is not None and self._cache_signature == signature:
+            return self._cache
+        
+        tokens, signature = self._read_tokens_file()
+        self._cache, self._cache_signature = self._apply_pending(tokens), signature
+        self._next_expiry = None
+        return self._cache
+    
+    def _save_tokens(self) -> None:
+        """Write this process's changed tokens to storage
+        
+        The file lock is held across reading tokens.enc, applying the
+        changes and replacing the file, so concurrent writers never drop
+        each other's servers.
+        """
         try:
-            # Convert TokenData objects to dict for JSON serialization
-            tokens_dict = {
-                server_name: asdict(token) 
-                for server_name, token in tokens.items()
-            }
-            
-            # Serialize to JSON
-            json_data = json.dumps(tokens_dict, indent=2).encode()
-            
-            # Encrypt the data
-            encrypted_data = self._fernet.encrypt(json_data)
-            
             # Ensure directory exists
             self.config_dir.mkdir(exist_ok=True)
             
-            # Write encrypted tokens
-            with open(self.tokens_file, 'wb') as f:
-                f.write(encrypted_data)
+            with _exclusive_file_lock(self._lock_file):
+                tokens = self._apply_pending(self._read_tokens_file()[0])
+                
+                # Convert TokenData objects to dict for JSON serialization
+                tokens_dict = {
+                    server_name: token.to_dict()
+                    for server_name, token in tokens.items()
+                }
+                
+                # Serialize to compact JSON; nobody reads the encrypted file
+                json_data = _json.dumps(tokens_dict)
+                
+                # Encrypt the data
+                encrypted_data = self._fernet.encrypt(json_data)
+                
+                # Write encrypted tokens to a temporary file and rename it
+                # over tokens.enc, so a crash mid-write never truncates the
+                # tokens
+                tmp_file = self.tokens_file.with_suffix(".enc.tmp")
+                with open(tmp_file, 'wb') as f:
+                    f.write(encrypted_data)
+                os.replace(tmp_file, self.tokens_file)
+                st = os.stat(self.tokens_file)
+            
+            self._cache = tokens
+            self._cache_signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._next_expiry = self._earliest_expiry(tokens)
+            self._pending.clear()
                 
         except Exception as e:
+            if not self.write_behind:
+                # Drop the change so the next read comes from disk
+                self._pending.clear()
+                self._cache = None
             print(f"❌ Error saving tokens: {e}")
             raise
     
+    @staticmethod
+    def _earliest_expiry(tokens: Dict[str, TokenData]) -> float:
+        """Earliest expiry of the tokens that cannot be refreshed"""
+        return min(
+            (t.expires_at for t in tokens.values() if t.expires_at and not t.refresh_token),
+            default=float('inf')
+        )
+    
+    def _set_token(self, tokens: Dict[str, TokenData], server_name: str, token: Optional[TokenData]) -> None:
+        """Change one server's token in the loaded dict and queue the change"""
+        if token is None:
+            tokens.pop(server_name, None)
+        else:
+            tokens[server_name] = token
+        self._pending[server_name] = token
+    
+    def _commit_tokens(self, tokens: Dict[str, TokenData]) -> None:
+        """Save queued changes now, or leave them for the next flush()"""
+        self._next_expiry = self._earliest_expiry(tokens)
+        if not self.write_behind:
+            self._save_tokens()
+        elif self.on_write_pending is not None:
+            self.on_write_pending()
+    
+    @property
+    def has_pending_writes(self) -> bool:
+        """Whether there are token changes that flush() has yet to write"""
+        return bool(self._pending)
+    
+    def flush(self) -> None:
+        """Write tokens changed since the last save"""
+        with self._lock:
+            if self._pending:
+                self._save_tokens()
+    
+    @contextlib.contextmanager
+    def refresh_lock(self, server_name: str) -> Iterator[None]:
+        """Hold a server's refresh lock, shared with other processes
+        
+        Refresh tokens may rotate on use, so only one process (or thread)
+        at a time may refresh a server. Whoever takes the lock next should
+        re-read the stored token before refreshing it again.
+        
+        Args:
+            server_name: Name of the server
+        """
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', server_name)
+        self.config_dir.mkdir(exist_ok=True)
+        with _exclusive_file_lock(self.config_dir / f"refresh-{safe_name}.lock"):
+            yield
+    
     def store_token(self, server_name: str, token_data: TokenData) -> None:
         """Store token for a server
         
@@ -150,9 +358,10 @@ class TokenStorage:
             server_name: Name of the server
             token_data: Token data to store
         """
-        tokens = self._load_tokens()
-        tokens[server_name] = token_data
-        self._save_tokens(tokens)
+        with self._lock:
+            tokens = self._load_tokens()
+            self._set_token(tokens, server_name, token_data)
+            self._commit_tokens(tokens)
     
     def get_token(self, server_name: str) -> Optional[TokenData]:
         """Get token for a server
@@ -163,8 +372,8 @@ class TokenStorage:
         Returns:
             Token data or None if not found
         """
-        tokens = self._load_tokens()
-        return tokens.get(server_name)
+        with self._lock:
+            return self._load_tokens().get(server_name)
     
     def remove_token(self, server_name: str) -> bool:
         """Remove token for a server
@@ -175,12 +384,13 @@ class TokenStorage:
         Returns:
             True if token was removed, False if not found
         """
-        tokens = self._load_tokens()
-        if server_name in tokens:
-            del tokens[server_name]
-            self._save_tokens(tokens)
-            return True
-        return False
+        with self._lock:
+            tokens = self._load_tokens()
+            if server_name in tokens:
+                self._set_token(tokens, server_name, None)
+                self._commit_tokens(tokens)
+                return True
+            return False
     
     def list_tokens(self) -> Dict[str, TokenData]:
         """Get all stored tokens
@@ -188,7 +398,8 @@ class TokenStorage:
         Returns:
             Dictionary of server names to token data
         """
-        return self._load_tokens()
+        with self._lock:
+            return dict(self._load_tokens())
     
     def update_token(self, server_name: str, **updates: Any) -> bool:
         """Update specific fields of a stored token
@@ -200,19 +411,82 @@ class TokenStorage:
         Returns:
             True if token was updated, False if not found
         """
-        tokens = self._load_tokens()
-        if server_name not in tokens:
-            return False
+        with self._lock:
+            tokens = self._load_tokens()
+            if server_name not in tokens:
+                return False
+            
+            # Update fields that exist in TokenData on a copy, so tokens
+            # already handed out do not change underneath their holders.
+            # replace() runs __post_init__ again, normalizing e.g. an
+            # expires_at given as ISO string
+            token = replace(
+                tokens[server_name],
+                **{field: value for field, value in updates.items() if field in _TOKEN_FIELDS}
+            )
+            
+            self._set_token(tokens, server_name, token)
+            self._commit_tokens(tokens)
+            return True
+    
+    def _load_clients(self) -> Dict[str, Dict[str, Any]]:
+        """Load and decrypt dynamic client registrations"""
+        try:
+            with open(self.clients_file, 'rb') as f:
+                encrypted_data = f.read()
+        except FileNotFoundError:
+            return {}
         
-        token = tokens[server_name]
+        try:
+            return _json.loads(self._fernet.decrypt(encrypted_data))
+            
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load client registrations: {e}")
+            return {}
+    
+    def _save_clients(self, clients: Dict[str, Dict[str, Any]]) -> None:
+        """Encrypt and save dynamic client registrations
+        
+        Written to a temporary file and renamed over clients.enc, so a crash
+        mid-write never loses the registrations already stored.
+        """
+        encrypted_data = self._fernet.encrypt(_json.dumps(clients))
+        
+        # Ensure directory exists
+        self.config_dir.mkdir(exist_ok=True)
+        
+        tmp_file = self.clients_file.with_suffix(".enc.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(encrypted_data)
+        os.replace(tmp_file, self.clients_file)
+    
+    def store_client_registration(self, issuer: str, registration: Dict[str, Any]) -> None:
+        """Store dynamic client registration credentials for an issuer
         
-        # Update fields that exist in TokenData
-        for field, value in updates.items():
-            if hasattr(token, field):
-                setattr(token, field, value)
+        Registrations for several servers may be stored at once (by
+        threads, or by other processes), so the read-modify-write of
+        clients.enc runs under both the storage lock and the file lock.
         
-        self._save_tokens(tokens)
-        return True
+        Args:
+            issuer: Authorization server issuer
+            registration: Client credentials and registration metadata
+        """
+        with self._lock, _exclusive_file_lock(self._lock_file):
+            clients = self._load_clients()
+            clients[issuer] = registration
+            self._save_clients(clients)
+    
+    def get_client_registration(self, issuer: str) -> Optional[Dict[str, Any]]:
+        """Get dynamic client registration credentials for an issuer
+        
+        Args:
+            issuer: Authorization server issuer
+            
+        Returns:
+            Stored registration or None if not found
+        """
+        with self._lock:
+            return self._load_clients().get(issuer)
     
     def cleanup_expired_tokens(self) -> int:
         """Remove expired tokens that cannot be refreshed
@@ -220,22 +494,109 @@ class TokenStorage:
         Returns:
             Number of tokens removed
         """
-        tokens = self._load_tokens()
-        expired_servers = []
+        with self._lock:
+            tokens = self._load_tokens()
+            
+            # Nothing can have expired before the earliest expiry
+            if self._next_expiry is not None and time.time() < self._next_expiry:
+                return 0
+            
+            expired_servers = []
+            
+            for server_name, token in tokens.items():
+                # Only remove if expired AND no refresh token
+                if token.is_expired() and not token.refresh_token:
+                    expired_servers.append(server_name)
+            
+            for server_name in expired_servers:
+                self._set_token(tokens, server_name, None)
+            
+            if expired_servers:
+                self._commit_tokens(tokens)
+            else:
+                self._next_expiry = self._earliest_expiry(tokens)
+            
+            return len(expired_servers)
+
+
+# Alias for compatibility
+TokenManager = TokenStorage
+
+# Async callable returning the access token to use for a request
+TokenProvider = Callable[[], Awaitable[Optional[str]]]
+
+
+class RefreshingTokenProvider:
+    """Token provider that refreshes ahead of expiry
+    
+    Tokens are treated as fresh, stale or expired:
+    
+    - fresh: returned as-is
+    - stale (expiring within ``stale_minutes``): returned immediately while
+      a refresh runs in the background
+    - expired: the caller waits for the refresh to finish
+    
+    Concurrent callers share a single in-flight refresh.
+    """
+    
+    def __init__(
+        self,
+        token_storage: TokenStorage,
+        server_name: str,
+        refresh: Callable[[], Awaitable[bool]],
+        stale_minutes: int = 5
+    ) -> None:
+        """Initialize token provider
         
-        for server_name, token in tokens.items():
-            # Only remove if expired AND no refresh token
-            if token.is_expired() and not token.refresh_token:
-                expired_servers.append(server_name)
+        Args:
+            token_storage: Storage holding the server's token
+            server_name: Name of the server
+            refresh: Coroutine function that refreshes and stores the token
+            stale_minutes: How long before expiry to start refreshing
+        """
+        self.token_storage = token_storage
+        self.server_name = server_name
+        self.stale_minutes = stale_minutes
+        self._refresh = refresh
+        self._refresh_task: Optional[asyncio.Future] = None
+    
+    def _ensure_refresh(self) -> asyncio.Future:
+        """Start a refresh unless one is already running"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(self._refresh_done)
+        return self._refresh_task
+    
+    def _refresh_done(self, task: asyncio.Future) -> None:
+        """Log a failed refresh, retrieving its exception
         
-        for server_name in expired_servers:
-            del tokens[server_name]
+        Background refreshes of stale tokens are never awaited, so without
+        this their errors would only surface as "Task exception was never
+        retrieved" when the task is collected.
+        """
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("⚠️  Token refresh for %s failed: %s", self.server_name, task.exception())
+    
+    async def __call__(self) -> Optional[str]:
+        """Get an access token, refreshing it if needed
         
-        if expired_servers:
-            self._save_tokens(tokens)
+        Returns:
+            Access token or None if no token is stored
+        """
+        token = self.token_storage.get_token(self.server_name)
+        if not token:
+            return None
         
-        return len(expired_servers)
-
-
-# Alias for compatibility
-TokenManager = TokenStorage 
\ No newline at end of file
+        if token.is_expired():
+            try:
+                if not await asyncio.shield(self._ensure_refresh()):
+                    return None
+            except Exception:
+                return None
+            token = self.token_storage.get_token(self.server_name)
+            return token.access_token if token else None
+        
+        if token.expires_soon(minutes=self.stale_minutes):
+            self._ensure_refresh()
+        
+        return token.access_token 
\ No newline at end of file
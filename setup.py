@@ -38,6 +38,11 @@ setup(
         "python-multipart>=0.0.5",
     ],
     extras_require={
+        "fast": [
+            "orjson>=3.6.0",
+            "uvloop>=0.15.0; sys_platform != 'win32'",
+            "httptools>=0.5.0",
+        ],
         "dev": [
             "pytest>=6.0.0",
             "pytest-asyncio>=0.15.0",
@@ -10,26 +10,162 @@ This server implements:
 """
 
 import asyncio
+import collections
+import heapq
 import json
+import os
 import secrets
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
 from urllib.parse import parse_qs, urlencode, urlparse
 import base64
 import hashlib
 
-from fastapi import FastAPI, Request, Response, HTTPException, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import RedirectResponse, JSONResponse
 import uvicorn
 import httpx
 
-app = FastAPI(title="Mock OAuth MCP Server", version="1.0.0")
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
 
-# In-memory storage (use a real database in production)
-clients = {}
-authorization_codes = {}
-access_tokens = {}
-refresh_tokens = {}
+# JSON is parsed and rendered with orjson when it is installed
+_json_loads = orjson.loads if orjson is not None else json.loads
+_json_dumps = orjson.dumps if orjson is not None else (lambda obj: json.dumps(obj).encode())
+
+class _JSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+    
+    def render(self, content: Any) -> bytes:
+        return _json_dumps(content)
+
+app = FastAPI(title="Mock OAuth MCP Server", version="1.0.0", default_response_class=_JSONResponse)
+
+class AccessToken(NamedTuple):
+    """Issued access token"""
+    client_id: str
+    user_id: str
+    scope: str
+    expires_at: float
+
+class RefreshToken(NamedTuple):
+    """Issued refresh token"""
+    client_id: str
+    user_id: str
+    scope: str
+
+class _BoundedStore(dict):
+    """Dict that drops its oldest entry once it holds maxsize entries"""
+    
+    def __init__(self, maxsize: int) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self and len(self) >= self.maxsize:
+            del self[next(iter(self))]
+        super().__setitem__(key, value)
+
+# In-memory storage (use a real database in production). State lives in
+# this process, so the server must run as a single uvicorn worker; tests
+# start exactly one and talk to it over HTTP. Each store is capped so long
+# test runs that mint many tokens do not grow without bound
+clients = _BoundedStore(10_000)
+authorization_codes = _BoundedStore(100_000)
+access_tokens = _BoundedStore(100_000)
+refresh_tokens = _BoundedStore(100_000)
+
+# Pending expiries of authorization codes and access tokens as a min-heap of
+# (expires_at, key, store). Lookups still reject expired entries themselves;
+# a background task only removes them, so the stores do not keep growing
+_expiry_heap: List[Tuple[float, str, Dict[str, Any]]] = []
+SWEEP_INTERVAL = 1.0
+# Entries removed between yields to the event loop, so a burst of expiries
+# does not hold up requests
+SWEEP_BATCH = 1000
+
+# Every error has a fixed status and detail, so each exception is built once
+# and re-raised. Raising an exception appends the raising frames to its
+# __traceback__, so it is cleared on every raise; otherwise the shared
+# instances would keep growing tracebacks (and the frames they reference)
+_ERR_INVALID_JSON = HTTPException(status_code=400, detail="Invalid JSON")
+_ERR_INVALID_CLIENT_ID = HTTPException(status_code=400, detail="Invalid client_id")
+_ERR_INVALID_REDIRECT_URI = HTTPException(status_code=400, detail="Invalid redirect_uri")
+_ERR_PKCE_REQUIRED = HTTPException(status_code=400, detail="PKCE required")
+_ERR_MISSING_PARAMETERS = HTTPException(status_code=400, detail="Missing required parameters")
+_ERR_INVALID_CODE = HTTPException(status_code=400, detail="Invalid authorization code")
+_ERR_CODE_EXPIRED = HTTPException(status_code=400, detail="Authorization code expired")
+_ERR_CLIENT_MISMATCH = HTTPException(status_code=400, detail="Client mismatch")
+_ERR_INVALID_CODE_VERIFIER = HTTPException(status_code=400, detail="Invalid code_verifier")
+_ERR_INVALID_REFRESH_TOKEN = HTTPException(status_code=400, detail="Invalid refresh token")
+_ERR_UNSUPPORTED_GRANT_TYPE = HTTPException(status_code=400, detail="Unsupported grant_type")
+_ERR_MISSING_AUTH = HTTPException(status_code=401, detail="Missing or invalid authorization header")
+_ERR_INVALID_TOKEN = HTTPException(status_code=401, detail="Invalid access token")
+_ERR_TOKEN_EXPIRED = HTTPException(status_code=401, detail="Access token expired")
+
+# Page shown for the out-of-band flow, split around the authorization code
+# and encoded once, so each response is a bytes concatenation rather than a
+# formatted and encoded template
+_OOB_HTML_PREFIX, _OOB_HTML_SUFFIX = (part.encode("utf-8") for part in """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Authorization Code</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; background-color: #f5f5f5; }
+        .container { background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); max-width: 600px; margin: 0 auto; }
+        .code { background: #f8f9fa; padding: 15px; border-radius: 4px; font-family: monospace; font-size: 16px; margin: 20px 0; border: 2px solid #007bff; }
+        .success { color: #28a745; }
+        .instructions { background: #e9ecef; padding: 15px; border-radius: 4px; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1 class="success">✅ Authorization Successful</h1>
+        <p>Your authorization has been approved for the MCP OAuth Bridge.</p>
+        
+        <h3>Authorization Code:</h3>
+        <div class="code" id="auth-code">{auth_code}</div>
+        
+        <div class="instructions">
+            <h4>Instructions:</h4>
+            <ol>
+                <li>Copy the authorization code above</li>
+                <li>Return to your terminal</li>
+                <li>Paste the code when prompted</li>
+                <li>Press Enter to complete the authorization</li>
+            </ol>
+        </div>
+        
+        <p><strong>Note:</strong> This code will expire in 10 minutes.</p>
+        
+        <button onclick="copyCode()" style="background: #007bff; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer; margin-top: 10px;">
+            Copy Code to Clipboard
+        </button>
+    </div>
+    
+    <script>
+        function copyCode() {
+            const code = document.getElementById('auth-code').textContent;
+            navigator.clipboard.writeText(code).then(function() {
+                alert('Authorization code copied to clipboard!');
+            }, function() {
+                alert('Failed to copy. Please select and copy manually.');
+            });
+        }
+    </script>
+</body>
+</html>
+""".split("{auth_code}"))
+
+# Pre-minted tokens (32 random bytes, unpadded base64url as with
+# secrets.token_urlsafe(32)); refilled a batch at a time from one
+# os.urandom call
+_TOKEN_BYTES = 32
+_TOKEN_BATCH = 1024
+_token_pool: collections.deque = collections.deque()
 
 # Server configuration
 AUTHORIZATION_ENDPOINT = "http://localhost:8080/oauth/authorize"
@@ -37,54 +173,93 @@ TOKEN_ENDPOINT = "http://localhost:8080/oauth/token"
 REGISTRATION_ENDPOINT = "http://localhost:8080/oauth/register"
 MCP_ENDPOINT = "http://localhost:8080/mcp"
 
+# Discovery responses never change, so they are serialized once
+_ROOT_BYTES = _json_dumps({
+    "name": "Mock OAuth MCP Server",
+    "version": "1.0.0",
+    "description": "Test server for MCP OAuth Bridge development",
+    "mcp_endpoint": MCP_ENDPOINT
+})
+_ROOT_HEADERS = {
+    "WWW-Authenticate": f'Bearer realm="{MCP_ENDPOINT}", '
+                       f'authorization_uri="{AUTHORIZATION_ENDPOINT}", '
+                       f'token_uri="{TOKEN_ENDPOINT}"'
+}
+_STATUS_ENDPOINTS = {
+    "authorization": AUTHORIZATION_ENDPOINT,
+    "token": TOKEN_ENDPOINT,
+    "registration": REGISTRATION_ENDPOINT,
+    "mcp": MCP_ENDPOINT
+}
+_METADATA_BYTES = _json_dumps({
+    "issuer": "http://localhost:8080",
+    "authorization_endpoint": AUTHORIZATION_ENDPOINT,
+    "token_endpoint": TOKEN_ENDPOINT,
+    "registration_endpoint": REGISTRATION_ENDPOINT,
+    "response_types_supported": ["code"],
+    "grant_types_supported": ["authorization_code", "refresh_token"],
+    "token_endpoint_auth_methods_supported": ["client_secret_post", "none"],
+    "code_challenge_methods_supported": ["S256"],
+    "scopes_supported": ["read", "write", "admin"],
+    "service_documentation": "https://example.com/docs"
+})
+
+def _new_token() -> str:
+    """Take a fresh random token from the pool"""
+    if not _token_pool:
+        entropy = os.urandom(_TOKEN_BYTES * _TOKEN_BATCH)
+        _token_pool.extend(
+            base64.urlsafe_b64encode(entropy[i:i + _TOKEN_BYTES]).rstrip(b"=").decode()
+            for i in range(0, len(entropy), _TOKEN_BYTES)
+        )
+    return _token_pool.popleft()
+
+def _expire_at(store: Dict[str, Any], key: str, expires_at: float) -> None:
+    """Schedule removal of store[key] at expires_at"""
+    heapq.heappush(_expiry_heap, (expires_at, key, store))
+
+async def _sweep_expired() -> None:
+    """Remove expired codes and tokens every SWEEP_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        now = time.time()
+        removed = 0
+        while _expiry_heap and _expiry_heap[0][0] <= now:
+            _, key, store = heapq.heappop(_expiry_heap)
+            store.pop(key, None)
+            removed += 1
+            if removed % SWEEP_BATCH == 0:
+                await asyncio.sleep(0)
+
+async def _start_sweeper() -> None:
+    asyncio.ensure_future(_sweep_expired())
+
+app.router.on_startup.append(_start_sweeper)
+
 @app.get("/")
 async def root():
     """Root endpoint with OAuth discovery headers"""
-    return Response(
-        content=json.dumps({
-            "name": "Mock OAuth MCP Server",
-            "version": "1.0.0",
-            "description": "Test server for MCP OAuth Bridge development",
-            "mcp_endpoint": MCP_ENDPOINT
-        }),
-        headers={
-            "WWW-Authenticate": f'Bearer realm="{MCP_ENDPOINT}", '
-                               f'authorization_uri="{AUTHORIZATION_ENDPOINT}", '
-                               f'token_uri="{TOKEN_ENDPOINT}"',
-            "Content-Type": "application/json"
-        }
-    )
+    return Response(content=_ROOT_BYTES, media_type="application/json", headers=_ROOT_HEADERS)
 
 @app.get("/.well-known/oauth-authorization-server")
 async def oauth_metadata():
     """OAuth 2.0 Authorization Server Metadata (RFC 8414)"""
-    return {
-        "issuer": "http://localhost:8080",
-        "authorization_endpoint": AUTHORIZATION_ENDPOINT,
-        "token_endpoint": TOKEN_ENDPOINT,
-        "registration_endpoint": REGISTRATION_ENDPOINT,
-        "response_types_supported": ["code"],
-        "grant_types_supported": ["authorization_code", "refresh_token"],
-        "token_endpoint_auth_methods_supported": ["client_secret_post", "none"],
-        "code_challenge_methods_supported": ["S256"],
-        "scopes_supported": ["read", "write", "admin"],
-        "service_documentation": "https://example.com/docs"
-    }
+    return Response(content=_METADATA_BYTES, media_type="application/json")
 
 @app.post("/oauth/register")
 async def register_client(request: Request):
     """Dynamic Client Registration (RFC 7591)"""
     try:
-        data = await request.json()
+        data = _json_loads(await request.body())
     except:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
+        raise _ERR_INVALID_JSON.with_traceback(None)
     
     # Generate client credentials
     client_id = f"client_{secrets.token_urlsafe(16)}"
-    client_secret = secrets.token_urlsafe(32)
+    client_secret = _new_token()
     
     # Store client
-    clients[client_id] = {
+    client = clients[client_id] = {
         "client_id": client_id,
         "client_secret": client_secret,
         "redirect_uris": data.get("redirect_uris", ["http://localhost:8081/oauth/callback", "urn:ietf:wg:oauth:2.0:oob"]),
@@ -99,9 +274,9 @@ async def register_client(request: Request):
         "client_secret": client_secret,
         "client_id_issued_at": int(time.time()),
         "client_secret_expires_at": 0,  # Never expires
-        "redirect_uris": clients[client_id]["redirect_uris"],
-        "grant_types": clients[client_id]["grant_types"],
-        "response_types": clients[client_id]["response_types"],
+        "redirect_uris": client["redirect_uris"],
+        "grant_types": client["grant_types"],
+        "response_types": client["response_types"],
         "token_endpoint_auth_method": "client_secret_post"
     }
 
@@ -118,86 +293,41 @@ async def authorize(
     """OAuth Authorization Endpoint"""
     
     # Validate client
-    if client_id not in clients:
-        raise HTTPException(status_code=400, detail="Invalid client_id")
-    
-    client = clients[client_id]
+    client = clients.get(client_id)
+    if client is None:
+        raise _ERR_INVALID_CLIENT_ID.with_traceback(None)
     
     # Validate redirect URI
     if redirect_uri not in client["redirect_uris"]:
-        raise HTTPException(status_code=400, detail="Invalid redirect_uri")
+        raise _ERR_INVALID_REDIRECT_URI.with_traceback(None)
     
     # Validate PKCE
     if not code_challenge or code_challenge_method != "S256":
-        raise HTTPException(status_code=400, detail="PKCE required")
+        raise _ERR_PKCE_REQUIRED.with_traceback(None)
     
     # For testing, auto-approve (in real scenarios, show user consent)
     # Generate authorization code
-    auth_code = secrets.token_urlsafe(32)
+    auth_code = _new_token()
+    expires_at = time.time() + 600  # 10 minutes
     authorization_codes[auth_code] = {
         "client_id": client_id,
         "redirect_uri": redirect_uri,
         "scope": scope or "read",
-        "code_challenge": code_challenge,
-        "expires_at": time.time() + 600,  # 10 minutes
+        # Kept as unpadded base64url bytes, the form the verifier check builds
+        "code_challenge": code_challenge.encode(),
+        "expires_at": expires_at,
         "user_id": "test_user"
     }
+    _expire_at(authorization_codes, auth_code, expires_at)
     
     # Handle out-of-band flow
     if redirect_uri == "urn:ietf:wg:oauth:2.0:oob":
         # Return authorization code directly to user
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Authorization Code</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 40px; background-color: #f5f5f5; }}
-                .container {{ background: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); max-width: 600px; margin: 0 auto; }}
-                .code {{ background: #f8f9fa; padding: 15px; border-radius: 4px; font-family: monospace; font-size: 16px; margin: 20px 0; border: 2px solid #007bff; }}
-                .success {{ color: #28a745; }}
-                .instructions {{ background: #e9ecef; padding: 15px; border-radius: 4px; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1 class="success">✅ Authorization Successful</h1>
-                <p>Your authorization has been approved for the MCP OAuth Bridge.</p>
-                
-                <h3>Authorization Code:</h3>
-                <div class="code" id="auth-code">{auth_code}</div>
-                
-                <div class="instructions">
-                    <h4>Instructions:</h4>
-                    <ol>
-                        <li>Copy the authorization code above</li>
-                        <li>Return to your terminal</li>
-                        <li>Paste the code when prompted</li>
-                        <li>Press Enter to complete the authorization</li>
-                    </ol>
-                </div>
-                
-                <p><strong>Note:</strong> This code will expire in 10 minutes.</p>
-                
-                <button onclick="copyCode()" style="background: #007bff; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer; margin-top: 10px;">
-                    Copy Code to Clipboard
-                </button>
-            </div>
-            
-            <script>
-                function copyCode() {{
-                    const code = document.getElementById('auth-code').textContent;
-                    navigator.clipboard.writeText(code).then(function() {{
-                        alert('Authorization code copied to clipboard!');
-                    }}, function() {{
-                        alert('Failed to copy. Please select and copy manually.');
-                    }});
-                }}
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content)
+        # Authorization codes are base64url, so ASCII
+        return Response(
+            content=_OOB_HTML_PREFIX + auth_code.encode("ascii") + _OOB_HTML_SUFFIX,
+            media_type="text/html; charset=utf-8"
+        )
     
     # Regular redirect flow
     # Build redirect URL
@@ -209,132 +339,132 @@ async def authorize(
     return RedirectResponse(url=redirect_url)
 
 @app.post("/oauth/token")
-async def token_endpoint(
-    grant_type: str = Form(...),
-    code: Optional[str] = Form(None),
-    redirect_uri: Optional[str] = Form(None),
-    client_id: Optional[str] = Form(None),
-    client_secret: Optional[str] = Form(None),
-    code_verifier: Optional[str] = Form(None),
-    refresh_token: Optional[str] = Form(None)
-):
-    """OAuth Token Endpoint"""
+async def token_endpoint(request: Request) -> Response:
+    """OAuth Token Endpoint
+    
+    The form is parsed once here rather than through a Form() parameter per
+    field, and the grant type is dispatched by hand.
+    """
+    form = await request.form()
+    grant_type = form.get("grant_type")
+    client_id = form.get("client_id")
     
     if grant_type == "authorization_code":
         # Authorization code flow
+        code = form.get("code")
+        redirect_uri = form.get("redirect_uri")
+        code_verifier = form.get("code_verifier")
         if not code or not redirect_uri or not client_id or not code_verifier:
-            raise HTTPException(status_code=400, detail="Missing required parameters")
+            raise _ERR_MISSING_PARAMETERS.with_traceback(None)
         
         # Validate authorization code
-        if code not in authorization_codes:
-            raise HTTPException(status_code=400, detail="Invalid authorization code")
-        
-        auth_data = authorization_codes[code]
+        auth_data = authorization_codes.get(code)
+        if auth_data is None:
+            raise _ERR_INVALID_CODE.with_traceback(None)
         
-        # Check expiration
+        # Check expiration; the sweeper may not have run yet
         if time.time() > auth_data["expires_at"]:
             del authorization_codes[code]
-            raise HTTPException(status_code=400, detail="Authorization code expired")
+            raise _ERR_CODE_EXPIRED.with_traceback(None)
         
         # Validate client
         if auth_data["client_id"] != client_id:
-            raise HTTPException(status_code=400, detail="Client mismatch")
+            raise _ERR_CLIENT_MISMATCH.with_traceback(None)
         
-        # Validate PKCE
-        code_challenge = auth_data["code_challenge"]
+        # Validate PKCE; a SHA-256 digest is 43 base64url characters plus
+        # one "=" of padding
         expected_challenge = base64.urlsafe_b64encode(
             hashlib.sha256(code_verifier.encode()).digest()
-        ).decode().rstrip('=')
+        )[:43]
         
-        if code_challenge != expected_challenge:
-            raise HTTPException(status_code=400, detail="Invalid code_verifier")
+        if auth_data["code_challenge"] != expected_challenge:
+            raise _ERR_INVALID_CODE_VERIFIER.with_traceback(None)
         
         # Generate tokens
-        access_token = secrets.token_urlsafe(32)
-        refresh_token_value = secrets.token_urlsafe(32)
+        access_token = _new_token()
+        refresh_token_value = _new_token()
         
         # Store tokens
-        access_tokens[access_token] = {
-            "client_id": client_id,
-            "user_id": auth_data["user_id"],
-            "scope": auth_data["scope"],
-            "expires_at": time.time() + 3600  # 1 hour
-        }
+        expires_at = time.time() + 3600  # 1 hour
+        access_tokens[access_token] = AccessToken(
+            client_id, auth_data["user_id"], auth_data["scope"], expires_at
+        )
+        _expire_at(access_tokens, access_token, expires_at)
         
-        refresh_tokens[refresh_token_value] = {
-            "client_id": client_id,
-            "user_id": auth_data["user_id"],
-            "scope": auth_data["scope"]
-        }
+        refresh_tokens[refresh_token_value] = RefreshToken(
+            client_id, auth_data["user_id"], auth_data["scope"]
+        )
         
         # Clean up authorization code
         del authorization_codes[code]
         
-        return {
+        return _JSONResponse({
             "access_token": access_token,
             "token_type": "Bearer",
             "expires_in": 3600,
             "refresh_token": refresh_token_value,
             "scope": auth_data["scope"]
-        }
+        })
     
     elif grant_type == "refresh_token":
         # Refresh token flow
+        refresh_token = form.get("refresh_token")
         if not refresh_token or not client_id:
-            raise HTTPException(status_code=400, detail="Missing required parameters")
+            raise _ERR_MISSING_PARAMETERS.with_traceback(None)
         
         # Validate refresh token
-        if refresh_token not in refresh_tokens:
-            raise HTTPException(status_code=400, detail="Invalid refresh token")
-        
-        refresh_data = refresh_tokens[refresh_token]
+        refresh_data = refresh_tokens.get(refresh_token)
+        if refresh_data is None:
+            raise _ERR_INVALID_REFRESH_TOKEN.with_traceback(None)
         
         # Validate client
-        if refresh_data["client_id"] != client_id:
-            raise HTTPException(status_code=400, detail="Client mismatch")
+        if refresh_data.client_id != client_id:
+            raise _ERR_CLIENT_MISMATCH.with_traceback(None)
         
         # Generate new access token
-        access_token = secrets.token_urlsafe(32)
+        access_token = _new_token()
         
-        access_tokens[access_token] = {
-            "client_id": client_id,
-            "user_id": refresh_data["user_id"],
-            "scope": refresh_data["scope"],
-            "expires_at": time.time() + 3600  # 1 hour
-        }
+        expires_at = time.time() + 3600  # 1 hour
+        access_tokens[access_token] = AccessToken(
+            client_id, refresh_data.user_id, refresh_data.scope, expires_at
+        )
+        _expire_at(access_tokens, access_token, expires_at)
         
-        return {
+        return _JSONResponse({
             "access_token": access_token,
             "token_type": "Bearer",
             "expires_in": 3600,
-            "scope": refresh_data["scope"]
-        }
+            "scope": refresh_data.scope
+        })
     
     else:
-        raise HTTPException(status_code=400, detail="Unsupported grant_type")
+        raise _ERR_UNSUPPORTED_GRANT_TYPE.with_traceback(None)
 
-def validate_token(authorization: str) -> Dict[str, Any]:
+def validate_token(authorization: str) -> AccessToken:
     """Validate Bearer token"""
     if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+        raise _ERR_MISSING_AUTH.with_traceback(None)
     
     token = authorization[7:]  # Remove "Bearer "
     
-    if token not in access_tokens:
-        raise HTTPException(status_code=401, detail="Invalid access token")
+    token_data = access_tokens.get(token)
+    if token_data is None:
+        raise _ERR_INVALID_TOKEN.with_traceback(None)
     
-    token_data = access_tokens[token]
-    
-    # Check expiration
-    if time.time() > token_data["expires_at"]:
+    # Check expiration; the sweeper may not have run yet
+    if time.time() > token_data.expires_at:
         del access_tokens[token]
-        raise HTTPException(status_code=401, detail="Access token expired")
+        raise _ERR_TOKEN_EXPIRED.with_traceback(None)
     
     return token_data
 
-@app.api_route("/mcp/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def mcp_endpoint(path: str, request: Request):
-    """Mock MCP endpoint that requires OAuth"""
+async def mcp_endpoint(request: Request) -> Response:
+    """Mock MCP endpoint that requires OAuth
+    
+    A plain Starlette route: it takes the request and returns a response
+    itself, without FastAPI's parameter parsing and response encoding.
+    """
+    path = request.path_params["path"]
     
     # Validate OAuth token
     authorization = request.headers.get("authorization", "")
@@ -342,48 +472,55 @@ async def mcp_endpoint(path: str, request: Request):
     
     # Mock MCP response based on the request
     if request.method == "POST":
+        raw_body = await request.body()
         try:
-            body = await request.json()
-        except:
+            body = _json_loads(raw_body) if raw_body else {}
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
             body = {}
+        method = body.get("method", "unknown")
+        request_id = body.get("id", 1)
         
         # Mock MCP JSON-RPC response
-        if body.get("method") == "tools/call":
-            return {
+        if method == "tools/call":
+            return _JSONResponse({
                 "jsonrpc": "2.0",
-                "id": body.get("id", 1),
+                "id": request_id,
                 "result": {
                     "content": [
                         {
                             "type": "text",
                             "text": f"Mock response from OAuth MCP Server! "
-                                   f"User: {token_data['user_id']}, "
-                                   f"Scope: {token_data['scope']}, "
+                                   f"User: {token_data.user_id}, "
+                                   f"Scope: {token_data.scope}, "
                                    f"Tool: {body.get('params', {}).get('name', 'unknown')}"
                         }
                     ]
                 }
-            }
+            })
         
         # Default response for other methods
-        return {
+        return _JSONResponse({
             "jsonrpc": "2.0",
-            "id": body.get("id", 1),
+            "id": request_id,
             "result": {
                 "message": "OAuth authentication successful",
-                "user": token_data['user_id'],
-                "scope": token_data['scope'],
-                "method": body.get("method", "unknown")
+                "user": token_data.user_id,
+                "scope": token_data.scope,
+                "method": method
             }
-        }
+        })
     
     # GET request
-    return {
+    return _JSONResponse({
         "message": "OAuth MCP Server is working!",
-        "user": token_data['user_id'],
-        "scope": token_data['scope'],
+        "user": token_data.user_id,
+        "scope": token_data.scope,
         "path": path
-    }
+    })
+
+app.add_route("/mcp/{path:path}", mcp_endpoint, methods=["GET", "POST", "PUT", "DELETE"])
 
 @app.get("/status")
 async def status():
@@ -392,12 +529,7 @@ async def status():
         "status": "running",
         "clients": len(clients),
         "active_tokens": len(access_tokens),
-        "endpoints": {
-            "authorization": AUTHORIZATION_ENDPOINT,
-            "token": TOKEN_ENDPOINT,
-            "registration": REGISTRATION_ENDPOINT,
-            "mcp": MCP_ENDPOINT
-        }
+        "endpoints": _STATUS_ENDPOINTS
     }
 
 if __name__ == "__main__":
@@ -411,4 +543,18 @@ if __name__ == "__main__":
     print("🔧 Use this URL with your OAuth bridge:")
     print("  mcp-oauth-bridge add mock http://localhost:8080")
     
-    uvicorn.run(app, host="localhost", port=8080) 
\ No newline at end of file
+    # "auto" runs on uvloop and httptools when they are installed (they are
+    # in the test extras) and on asyncio and h11 otherwise. One worker only:
+    # the stores above are per process. Access logging is off so load tests
+    # do not pay for a log line per request, and keep-alive connections are
+    # held long enough for clients to reuse them between test steps
+    uvicorn.run(
+        app,
+        host="localhost",
+        port=8080,
+        loop="auto",
+        http="auto",
+        access_log=False,
+        log_level="warning",
+        timeout_keep_alive=30,
+    ) 
\ No newline at end of file
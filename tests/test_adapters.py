@@ -0,0 +1,144 @@
+"""
+Tests for the OpenAI and Anthropic adapters
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import _json
+from mcp_oauth_bridge.adapters import AnthropicAdapter, OpenAIAdapter
+from mcp_oauth_bridge.adapters._http import close_shared_client, get_shared_client
+
+
+def mock_client(handler):
+    """Client sending requests to handler(request) -> httpx.Response"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('adapter_class', [OpenAIAdapter, AnthropicAdapter])
+async def test_forward_many_shared_by_adapters(adapter_class):
+    """Both adapters forward through the shared MCPForwarder code"""
+    seen = []
+    
+    def handler(request):
+        seen.append((str(request.url), request.headers.get('authorization')))
+        if request.url.host == 'down.example.com':
+            return httpx.Response(503, content=b'unavailable')
+        return httpx.Response(200, content=_json.dumps({'result': {'content': request.url.host}}))
+    
+    adapter = adapter_class()
+    adapter.client = mock_client(handler)
+    
+    async def provider():
+        return 'provided'
+    
+    requests = [
+        {'server_name': 'a', 'server_url': 'https://a.example.com/mcp', 'request': {'id': 1}},
+        {'server_name': 'b', 'server_url': 'https://down.example.com/mcp', 'request': {'id': 2}},
+    ]
+    results = await adapter.forward_many(requests, {'a': 'token-a'}, token_providers={'b': provider})
+    
+    assert results[0] == {'result': {'content': 'a.example.com'}}
+    assert isinstance(results[1], ValueError)
+    assert 'MCP server 503' in str(results[1])
+    assert sorted(seen) == [
+        ('https://a.example.com/mcp', 'Bearer token-a'),
+        ('https://down.example.com/mcp', 'Bearer provided'),
+    ]
+    
+    with pytest.raises(ValueError):
+        await adapter.forward_many(requests, {}, stop_on_error=True)
+    await adapter.client.aclose()
+
+
+def test_request_models_coerced():
+    """Dicts are validated into request models and models pass through"""
+    adapter = OpenAIAdapter()
+    request = {'model': 'gpt-4', 'input': 'hi', 'tools': [
+        {'type': 'mcp', 'server_label': 'srv', 'server_url': 'https://srv.example.com'}
+    ]}
+    
+    servers = adapter.extract_mcp_server_info(request)
+    assert [server['name'] for server in servers] == ['srv']
+    
+    model = adapter.parse_request(_json.dumps(request))
+    assert adapter.extract_mcp_server_info(model) == servers
+
+
+def test_non_mcp_tools_skipped():
+    """Function tools, non-object entries and unusable tools sit next to MCP tools"""
+    adapter = OpenAIAdapter()
+    request = {'model': 'gpt-4', 'input': 'hi', 'tools': [
+        {'type': 'function', 'name': 'fn'},
+        {'name': 'no-type'},
+        'not-a-tool',
+        None,
+        {'type': 'mcp', 'server_label': None, 'server_url': 'https://a.example.com'},
+        {'type': 'mcp', 'server_label': {'bad': 'label'}, 'server_url': 'https://bad.example.com'},
+        {'type': 'mcp', 'server_label': 'b', 'server_url': 'https://b.example.com'},
+    ]}
+    
+    expected = [
+        {'name': None, 'url': 'https://a.example.com', 'require_approval': 'always'},
+        {'name': 'b', 'url': 'https://b.example.com', 'require_approval': 'always'},
+    ]
+    assert adapter.extract_mcp_server_info(request) == expected
+    assert adapter.extract_mcp_server_info(adapter.parse_request(_json.dumps(request))) == expected
+    assert [item['server_url'] for item in adapter.convert_openai_to_mcp(request)] == [
+        'https://a.example.com', 'https://b.example.com'
+    ]
+
+
+def test_anthropic_messages_without_roles():
+    """Messages without a role, non-object messages and odd content are tolerated"""
+    adapter = AnthropicAdapter()
+    request = {
+        'messages': [
+            {'content': 'no role'},
+            'not-a-message',
+            {'role': 'user', 'content': 'hello'},
+            {'role': 'user', 'content': [{'type': 'text', 'text': 'there'}, 'stray', {'type': 'image'}]},
+            {'role': 'assistant', 'content': 'ignored'},
+        ],
+        'mcp_servers': [
+            'not-a-server',
+            {'name': 'srv', 'url': 'https://srv.example.com'},
+            {'name': 'no-url'},
+        ],
+    }
+    
+    assert adapter.extract_user_message(request) == 'hello there'
+    assert [server['name'] for server in adapter.extract_mcp_server_info(request)] == ['srv']
+
+
+def test_shared_client_per_event_loop():
+    """Each event loop gets its own shared client, reset by close_shared_client"""
+    adapter = OpenAIAdapter()
+    
+    async def clients():
+        first = adapter.client
+        assert get_shared_client() is first
+        await close_shared_client()
+        assert first.is_closed
+        second = adapter.client
+        await close_shared_client()
+        return first, second
+    
+    first, second = asyncio.run(clients())
+    assert first is not second
+    
+    # A client left open by a finished loop is not reused by the next one
+    async def client():
+        return adapter.client
+    
+    abandoned = asyncio.run(client())
+    assert asyncio.run(clients())[0] is not abandoned
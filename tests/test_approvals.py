@@ -0,0 +1,94 @@
+"""
+Tests for the approval manager
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge.approvals import ApprovalManager, ApprovalStatus
+
+pytestmark = pytest.mark.asyncio
+
+# About 60 ms, so expiry timers fire during the test
+SHORT_TIMEOUT_MINUTES = 0.001
+
+
+async def start_request(manager, timeout_minutes=None):
+    """Start an approval request and return its task and request"""
+    task = asyncio.ensure_future(manager.request_approval(
+        "srv", "tool", {"a": 1}, "Run tool", timeout_minutes=timeout_minutes
+    ))
+    await asyncio.sleep(0)
+    request = manager.get_pending_requests()[-1]
+    return task, request
+
+
+async def test_request_expires_on_its_timer():
+    """An unanswered request resolves False once its timer fires"""
+    manager = ApprovalManager()
+    events = []
+    manager.add_approval_callback(lambda request: events.append(request.status))
+    
+    task, request = await start_request(manager, SHORT_TIMEOUT_MINUTES)
+    assert manager.get_approval_stats()["pending"] == 1
+    
+    assert await asyncio.wait_for(task, 1) is False
+    assert events == [ApprovalStatus.PENDING, ApprovalStatus.EXPIRED]
+    assert manager._expiry_handles == {}
+    assert manager.get_approval_stats() == {
+        "pending": 0, "approved": 0, "denied": 0, "expired": 0, "total": 0
+    }
+
+
+async def test_answered_request_cancels_its_timer():
+    """Approving or denying cancels the expiry timer"""
+    manager = ApprovalManager()
+    
+    approved, request = await start_request(manager)
+    handle = manager._expiry_handles[request.id]
+    assert manager.approve_request(request.id)
+    assert handle.cancelled()
+    assert manager.get_approval_stats()["approved"] == 1
+    assert await approved is True
+    
+    denied, request = await start_request(manager)
+    assert manager.deny_request(request.id)
+    # Already resolved requests cannot change again
+    assert not manager.approve_request(request.id)
+    assert await denied is False
+    assert manager._expiry_handles == {}
+
+
+async def test_counts_track_transitions():
+    """Per-status counts follow every request through its lifecycle"""
+    manager = ApprovalManager()
+    started = [await start_request(manager) for _ in range(3)]
+    (t1, r1), (t2, r2), (t3, r3) = started
+    
+    assert manager.get_approval_stats() == {
+        "pending": 3, "approved": 0, "denied": 0, "expired": 0, "total": 3
+    }
+    
+    manager.approve_request(r1.id)
+    manager.deny_request(r2.id)
+    stats = manager.get_approval_stats()
+    assert (stats["pending"], stats["approved"], stats["denied"]) == (1, 1, 1)
+    
+    # Resolved requests are dropped once their caller has the answer
+    await asyncio.gather(t1, t2)
+    assert manager.get_approval_stats() == {
+        "pending": 1, "approved": 0, "denied": 0, "expired": 0, "total": 1
+    }
+    
+    t3.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await t3
+    assert manager.get_approval_stats()["total"] == 0
+    assert all(count == 0 for count in manager._counts.values())
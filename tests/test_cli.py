@@ -0,0 +1,75 @@
+"""
+Tests for the command-line interface
+"""
+
+import asyncio
+import io
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import cli
+from mcp_oauth_bridge.config import Config
+from mcp_oauth_bridge.discovery import OAuthDiscovery
+from mcp_oauth_bridge.oauth import OAuthHandler
+
+
+def test_importing_cli_starts_no_thread():
+    """The log listener is started by main(), not by importing the module"""
+    result = subprocess.run(
+        [sys.executable, "-c", "import threading, mcp_oauth_bridge.cli; print(threading.active_count())"],
+        cwd=project_root, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "1"
+
+
+def test_log_lines_formatted_once():
+    """Records go through the queue and are formatted by the listener only"""
+    stream = io.StringIO()
+    cli._stop_logging()
+    cli._setup_logging(stream)
+    try:
+        logging.getLogger("cli-test").info("hello %s", "world")
+    finally:
+        cli._stop_logging()
+    
+    line = stream.getvalue().strip()
+    assert line.endswith(" - cli-test - INFO - hello world")
+    assert "INFO:cli-test" not in line
+
+
+def test_add_writes_config_once(tmp_path, monkeypatch):
+    """The discovery result and the new server are saved in a single write"""
+    config = Config(tmp_path)
+    config.save()
+    oauth_config = {
+        'authorization_endpoint': 'https://auth.example.com/authorize',
+        'token_endpoint': 'https://auth.example.com/token',
+    }
+    
+    async def authorize(self, oauth_config, client_config=None, open_browser=True):
+        return {'access_token': 'access', 'expires_at': None}
+    
+    monkeypatch.setattr(OAuthDiscovery, 'discover_oauth_config', lambda self, url: dict(oauth_config))
+    monkeypatch.setattr(OAuthHandler, 'authorize_server_async', authorize)
+    writes = []
+    real_replace = os.replace
+    
+    def replace(src, dst):
+        if Path(dst).name == 'config.json':
+            writes.append(dst)
+        return real_replace(src, dst)
+    
+    monkeypatch.setattr(os, 'replace', replace)
+    asyncio.run(cli._add_server_async('example', 'https://mcp.example.com/mcp', config, True))
+    
+    assert len(writes) == 1
+    fresh = Config(tmp_path)
+    assert fresh.list_servers() == ['example']
+    assert fresh.get_cached_discovery('https://mcp.example.com/mcp')
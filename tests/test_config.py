@@ -0,0 +1,121 @@
+"""
+Tests for configuration management
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import config as config_module
+from mcp_oauth_bridge.config import Config, ServerConfig, DISCOVERY_CACHE_TTL
+
+OAUTH_CONFIG = {
+    'authorization_endpoint': 'https://auth.example.com/authorize',
+    'token_endpoint': 'https://auth.example.com/token',
+}
+
+
+@pytest.fixture
+def count_writes(monkeypatch):
+    """Count how many times config.json is replaced"""
+    writes = []
+    real_replace = os.replace
+    
+    def replace(src, dst):
+        writes.append(dst)
+        return real_replace(src, dst)
+    
+    monkeypatch.setattr(config_module.os, 'replace', replace)
+    return writes
+
+
+@pytest.fixture
+def count_parses(monkeypatch):
+    """Count how many times config.json is parsed"""
+    parses = []
+    real_loads = config_module._json.loads
+    
+    def loads(data):
+        parses.append(data)
+        return real_loads(data)
+    
+    monkeypatch.setattr(config_module._json, 'loads', loads)
+    return parses
+
+
+def test_parsed_config_reused_until_file_changes(tmp_path, count_parses):
+    """A second Config() reuses the parsed file until it changes on disk"""
+    config = Config(tmp_path)
+    config.add_server(ServerConfig('one', 'https://one.example.com/mcp', dict(OAUTH_CONFIG)))
+    
+    assert Config(tmp_path).list_servers() == ['one']
+    assert count_parses == []
+    
+    # Another process rewrites the file
+    config_file = tmp_path / 'config.json'
+    config_file.write_bytes(config_file.read_bytes().replace(b'"one"', b'"other"'))
+    
+    assert Config(tmp_path).list_servers() == ['other']
+    assert len(count_parses) == 1
+
+
+def test_cached_config_not_shared_with_live_config(tmp_path):
+    """Changes after a save don't reach what later instances load"""
+    config = Config(tmp_path)
+    config.add_server(ServerConfig('one', 'https://one.example.com/mcp', dict(OAUTH_CONFIG)))
+    
+    with config:
+        config.cache_discovery('https://one.example.com/mcp', OAUTH_CONFIG)
+        config.servers['one'].oauth_config['token_endpoint'] = 'changed'
+        
+        fresh = Config(tmp_path)
+        assert fresh.discovery_cache == {}
+        assert fresh.get_server('one').oauth_config == OAUTH_CONFIG
+
+
+def test_batched_changes_written_once(tmp_path, count_writes):
+    """Mutators inside ``with config:`` write config.json once, on exit"""
+    config = Config(tmp_path)
+    
+    with config:
+        config.add_server(ServerConfig('one', 'https://one.example.com/mcp', {}))
+        config.add_server(ServerConfig('two', 'https://two.example.com/mcp', {}))
+        config.set_proxy_settings(port=4000)
+        assert count_writes == []
+    
+    assert len(count_writes) == 1
+    fresh = Config(tmp_path)
+    assert fresh.list_servers() == ['one', 'two']
+    assert fresh.proxy_port == 4000
+
+
+def test_save_skipped_when_clean(tmp_path, count_writes):
+    """save() only writes a new file or unsaved changes"""
+    config = Config(tmp_path)
+    config.save()
+    assert len(count_writes) == 1
+    
+    config.save()
+    Config(tmp_path).save()
+    assert len(count_writes) == 1
+
+
+def test_discovery_cache_expires(tmp_path, monkeypatch):
+    """Discovery results are shared per origin and dropped after the TTL"""
+    now = [1000.0]
+    monkeypatch.setattr(config_module.time, 'time', lambda: now[0])
+    config = Config(tmp_path)
+    config.cache_discovery('https://one.example.com/mcp', OAUTH_CONFIG)
+    
+    cached = Config(tmp_path).get_cached_discovery('https://one.example.com/other')
+    assert cached == {**OAUTH_CONFIG, 'resource_url': 'https://one.example.com/other'}
+    assert config.get_cached_discovery('https://two.example.com/mcp') is None
+    
+    now[0] += DISCOVERY_CACHE_TTL
+    assert config.get_cached_discovery('https://one.example.com/mcp') is None
@@ -0,0 +1,211 @@
+"""
+Tests for OAuth server discovery
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import _json, discovery
+from mcp_oauth_bridge.discovery import OAuthDiscovery
+
+AUTH_SERVER = 'https://auth.example.com'
+RFC8414_URL = 'https://auth.example.com/.well-known/oauth-authorization-server'
+OIDC_URL = 'https://auth.example.com/.well-known/openid-configuration'
+
+METADATA = {
+    'issuer': AUTH_SERVER,
+    'authorization_endpoint': AUTH_SERVER + '/authorize',
+    'token_endpoint': AUTH_SERVER + '/token',
+}
+
+
+class FakeResponse:
+    """Just enough of requests.Response for discovery"""
+    
+    def __init__(self, url, status_code=200, body=None, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = body if isinstance(body, bytes) else _json.dumps(body or {})
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Session answering GETs from a URL table; exceptions in it are raised"""
+    
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+        self.streamed = []
+    
+    def get(self, url, timeout=None, stream=False):
+        self.calls.append(url)
+        route = self.routes.get(url)
+        if isinstance(route, Exception):
+            raise route
+        response = route or FakeResponse(url, status_code=404)
+        if stream:
+            self.streamed.append(response)
+        return response
+    
+    def all_closed(self):
+        """Whether every streamed response is closed, allowing background requests to finish"""
+        deadline = time.monotonic() + 2
+        while not all(response.closed for response in self.streamed):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    discovery._resource_cache.clear()
+    discovery._auth_server_cache.clear()
+    yield
+    discovery._resource_cache.clear()
+    discovery._auth_server_cache.clear()
+
+
+@pytest.mark.parametrize('failure', [
+    requests.ConnectionError('refused'),
+    requests.Timeout('slow'),
+    FakeResponse(RFC8414_URL, body=b'<html>not json</html>'),
+])
+def test_oidc_fallback_after_rfc8414_failure(failure):
+    """Any failure of the RFC 8414 request still tries OpenID Connect discovery"""
+    session = FakeSession({
+        RFC8414_URL: failure,
+        OIDC_URL: FakeResponse(OIDC_URL, body=METADATA),
+    })
+    
+    metadata = OAuthDiscovery(session=session).discover_authorization_server(AUTH_SERVER)
+    
+    assert metadata is not None
+    assert metadata.token_endpoint == AUTH_SERVER + '/token'
+
+
+def test_unused_fallback_is_closed():
+    """The OpenID Connect response is released when RFC 8414 answers first"""
+    fallback = FakeResponse(OIDC_URL, body=METADATA)
+    session = FakeSession({
+        RFC8414_URL: FakeResponse(RFC8414_URL, body=METADATA),
+        OIDC_URL: fallback,
+    })
+    
+    assert OAuthDiscovery(session=session).discover_authorization_server(AUTH_SERVER)
+    
+    # The fallback either never ran or was closed once it finished
+    assert session.all_closed()
+
+
+def test_metadata_cached_for_max_age():
+    """Metadata is reused while Cache-Control allows it"""
+    session = FakeSession({
+        RFC8414_URL: FakeResponse(RFC8414_URL, body=METADATA, headers={'Cache-Control': 'max-age=60'}),
+    })
+    client = OAuthDiscovery(session=session)
+    
+    assert client.discover_authorization_server(AUTH_SERVER)
+    calls = len(session.calls)
+    assert client.discover_authorization_server(AUTH_SERVER)
+    assert len(session.calls) == calls
+
+
+def test_metadata_not_cached_with_no_store():
+    """Cache-Control: no-store sends every discovery to the network"""
+    session = FakeSession({
+        RFC8414_URL: FakeResponse(RFC8414_URL, body=METADATA, headers={'Cache-Control': 'no-store'}),
+    })
+    client = OAuthDiscovery(session=session)
+    
+    assert client.discover_authorization_server(AUTH_SERVER)
+    assert client.discover_authorization_server(AUTH_SERVER)
+    assert session.calls.count(RFC8414_URL) == 2
+
+
+def test_cache_ttl_from_headers():
+    """The cache lifetime follows Cache-Control, then Expires, then the default"""
+    assert discovery._cache_ttl(FakeResponse('u', headers={'Cache-Control': 'public, max-age=120'})) == 120
+    assert discovery._cache_ttl(FakeResponse('u', headers={'Cache-Control': 'no-cache'})) == 0
+    assert discovery._cache_ttl(FakeResponse('u', headers={'Expires': 'Thu, 01 Jan 1970 00:00:00 GMT'})) == 0
+    assert discovery._cache_ttl(FakeResponse('u')) == discovery.DEFAULT_METADATA_TTL
+
+
+RESOURCE_URL = 'https://mcp.example.com/mcp'
+PRM_URL = 'https://mcp.example.com/.well-known/oauth-protected-resource'
+
+
+def test_www_authenticate_fallback():
+    """Without resource metadata, the WWW-Authenticate probe names the server"""
+    session = FakeSession({
+        RESOURCE_URL: FakeResponse(RESOURCE_URL, status_code=401, headers={
+            'WWW-Authenticate': f'Bearer realm="{AUTH_SERVER}", scope="read write"'
+        }),
+    })
+    
+    metadata = OAuthDiscovery(session=session).discover_protected_resource(RESOURCE_URL)
+    
+    assert metadata.authorization_servers == [AUTH_SERVER]
+    assert metadata.scopes_supported == ['read', 'write']
+    # The probe only follows a failed metadata request, and is closed
+    assert session.calls == [PRM_URL, RESOURCE_URL]
+    assert session.streamed[-1].closed
+
+
+def test_no_probe_when_metadata_found():
+    """The resource itself is not requested when its metadata answers"""
+    session = FakeSession({
+        PRM_URL: FakeResponse(PRM_URL, body={'resource': RESOURCE_URL, 'authorization_servers': [AUTH_SERVER]}),
+    })
+    
+    assert OAuthDiscovery(session=session).discover_protected_resource(RESOURCE_URL)
+    assert session.calls == [PRM_URL]
+
+
+def test_discover_oauth_config():
+    """Full discovery combines resource and authorization server metadata"""
+    session = FakeSession({
+        PRM_URL: FakeResponse(PRM_URL, body={
+            'resource': RESOURCE_URL,
+            'authorization_servers': [AUTH_SERVER],
+            'scopes_supported': ['mcp'],
+        }),
+        RFC8414_URL: FakeResponse(RFC8414_URL, body=dict(METADATA, code_challenge_methods_supported=['S256'])),
+    })
+    
+    config = OAuthDiscovery(session=session).discover_oauth_config(RESOURCE_URL)
+    
+    assert config['token_endpoint'] == AUTH_SERVER + '/token'
+    assert config['issuer'] == AUTH_SERVER
+    assert config['scopes_supported'] == ['mcp']
+    assert RESOURCE_URL not in session.calls
+    assert session.all_closed()
+
+
+def test_unused_speculative_request_released():
+    """The speculative authorization server request is closed when another server is named"""
+    session = FakeSession({
+        PRM_URL: FakeResponse(PRM_URL, body={
+            'resource': RESOURCE_URL,
+            'authorization_servers': [AUTH_SERVER],
+        }),
+        'https://mcp.example.com/.well-known/oauth-authorization-server': FakeResponse(
+            'https://mcp.example.com/.well-known/oauth-authorization-server', body=METADATA
+        ),
+        RFC8414_URL: FakeResponse(RFC8414_URL, body=METADATA),
+    })
+    
+    assert OAuthDiscovery(session=session).discover_oauth_config(RESOURCE_URL)
+    assert session.all_closed()
@@ -0,0 +1,229 @@
+"""
+Tests for the OAuth handler
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import _json
+from mcp_oauth_bridge.oauth import OAuthHandler
+from mcp_oauth_bridge.tokens import TokenData, TokenStorage
+
+OAUTH_CONFIG = {'token_endpoint': 'https://auth.example.com/token'}
+
+
+class FakeResponse:
+    """Just enough of requests.Response for the handler"""
+    
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = _json.dumps(body)
+        self.text = self.content.decode()
+
+
+class FakeSession:
+    """Session answering token requests with rotating refresh tokens"""
+    
+    def __init__(self):
+        self.posts = []
+    
+    def post(self, url, data=None, json=None, timeout=None):
+        self.posts.append(data)
+        n = len(self.posts)
+        return FakeResponse(200, {
+            'access_token': f'access-{n}',
+            'refresh_token': f'refresh-{n}',
+            'expires_in': 3600,
+        })
+
+
+def test_refresh_skipped_when_done_by_another_process(tmp_path, monkeypatch):
+    """A refresh that waited for the lock reuses the token stored meanwhile"""
+    storage = TokenStorage(tmp_path)
+    storage.store_token("srv", TokenData(access_token="old", refresh_token="refresh-0"))
+    session = FakeSession()
+    handler = OAuthHandler(token_storage=storage, session=session)
+    
+    # Another worker (its own storage) refreshes while this one waits
+    other = TokenStorage(tmp_path)
+    real_lock = storage.refresh_lock
+    
+    def refresh_lock(server_name):
+        other.store_token(server_name, TokenData(access_token="new", refresh_token="refresh-9"))
+        return real_lock(server_name)
+    
+    monkeypatch.setattr(storage, "refresh_lock", refresh_lock)
+    
+    assert handler.refresh_token("srv", OAUTH_CONFIG)
+    assert session.posts == []
+    assert storage.get_token("srv").access_token == "new"
+
+
+def test_refresh_writes_through_with_write_behind(tmp_path):
+    """A refreshed token reaches disk before the refresh lock is released"""
+    storage = TokenStorage(tmp_path)
+    storage.store_token("srv", TokenData(access_token="old", refresh_token="refresh-0"))
+    storage.write_behind = True
+    session = FakeSession()
+    handler = OAuthHandler(token_storage=storage, session=session)
+    
+    assert handler.refresh_token("srv", OAUTH_CONFIG)
+    assert session.posts == [{'grant_type': 'refresh_token', 'refresh_token': 'refresh-0'}]
+    assert not storage.has_pending_writes
+    assert TokenStorage(tmp_path).get_token("srv").refresh_token == "refresh-1"
+
+
+REDIRECT_URIS = ['http://localhost:8081/oauth/callback', 'urn:ietf:wg:oauth:2.0:oob']
+
+
+@pytest.mark.parametrize('registration, usable', [
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS}, True),
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS, 'client_secret_expires_at': None}, True),
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS, 'client_secret_expires_at': 0}, True),
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS, 'client_secret_expires_at': time.time() + 60}, True),
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS, 'client_secret_expires_at': time.time() - 60}, False),
+    ({'client_id': 'c', 'redirect_uris': REDIRECT_URIS[:1]}, False),
+    ({'redirect_uris': REDIRECT_URIS}, False),
+])
+def test_registration_usable(registration, usable):
+    """0 or a missing client_secret_expires_at means the secret never expires"""
+    assert OAuthHandler._registration_usable(registration, REDIRECT_URIS) is usable
+
+
+def test_stored_registration_reused(tmp_path):
+    """A second flow with the same issuer skips dynamic registration"""
+    storage = TokenStorage(tmp_path)
+    session = FakeSession()
+    session.post = lambda url, json=None, timeout=None, data=None: FakeResponse(201, {'client_id': 'registered'})
+    handler = OAuthHandler(token_storage=storage, session=session)
+    oauth_config = {'issuer': 'https://auth.example.com', 'registration_endpoint': 'https://auth.example.com/register'}
+    
+    assert handler._attempt_dynamic_registration(oauth_config, REDIRECT_URIS[0])['client_id'] == 'registered'
+    
+    session.post = None  # any further registration request would fail
+    fresh = OAuthHandler(token_storage=TokenStorage(tmp_path), session=session)
+    assert fresh._attempt_dynamic_registration(oauth_config, REDIRECT_URIS[0])['client_id'] == 'registered'
+
+
+@pytest.mark.asyncio
+async def test_register_client_uses_callback_redirect(tmp_path, monkeypatch):
+    """The registered redirect URI is the one the callback server listens on"""
+    session = FakeSession()
+    registered = []
+    
+    def post(url, json=None, timeout=None, data=None):
+        registered.append(json['redirect_uris'])
+        return FakeResponse(201, {'client_id': 'registered'})
+    
+    session.post = post
+    handler = OAuthHandler(token_storage=TokenStorage(tmp_path), session=session)
+    server = SimpleNamespace(server_address=('localhost', 50123))
+    monkeypatch.setattr(handler, '_get_callback_server', lambda: server)
+    oauth_config = {'issuer': 'https://auth.example.com', 'registration_endpoint': 'https://auth.example.com/register'}
+    
+    assert (await handler.register_client(oauth_config))['client_id'] == 'registered'
+    assert registered[0][0] == 'http://localhost:50123/oauth/callback'
+
+
+def test_concurrent_registrations_all_kept(tmp_path):
+    """Registrations stored from several threads at once are all saved"""
+    storage = TokenStorage(tmp_path)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(
+            lambda i: storage.store_client_registration(f'issuer-{i}', {'client_id': str(i)}),
+            range(32)
+        ))
+    
+    fresh = TokenStorage(tmp_path)
+    assert all(fresh.get_client_registration(f'issuer-{i}') == {'client_id': str(i)} for i in range(32))
+    assert not (tmp_path / 'clients.enc.tmp').exists()
+
+
+@pytest.mark.asyncio
+async def test_authorize_servers_partial_failure(tmp_path, monkeypatch):
+    """One server failing discovery or completion does not stop the others"""
+    handler = OAuthHandler(token_storage=TokenStorage(tmp_path), session=FakeSession())
+    flow = ({'issuer': 'https://auth.example.com'}, {'client_id': 'c'}, REDIRECT_URIS[0])
+    
+    def prepare(server_url):
+        if server_url == 'https://undiscoverable.example.com':
+            return None
+        if server_url == 'https://broken.example.com':
+            raise RuntimeError('discovery blew up')
+        return flow
+    
+    completed = []
+    
+    def complete(server_name, oauth_config, client_credentials, redirect_uri, flow_secrets):
+        completed.append(server_name)
+        return server_name != 'rejected'
+    
+    monkeypatch.setattr(handler, '_prepare_authorization', prepare)
+    monkeypatch.setattr(handler, '_complete_authorization', complete)
+    
+    results = await handler.authorize_servers([
+        ('good', 'https://good.example.com'),
+        ('undiscoverable', 'https://undiscoverable.example.com'),
+        ('broken', 'https://broken.example.com'),
+        ('rejected', 'https://rejected.example.com'),
+        ('also-good', 'https://also-good.example.com'),
+    ])
+    
+    assert results == {
+        'good': True,
+        'undiscoverable': False,
+        'broken': False,
+        'rejected': False,
+        'also-good': True,
+    }
+    # Servers that were not prepared never reach the browser step
+    assert completed == ['good', 'rejected', 'also-good']
+
+
+@pytest.mark.asyncio
+async def test_batched_refreshes_coalesce(tmp_path, monkeypatch):
+    """Concurrent refreshes of one server share a request; others join the batch"""
+    storage = TokenStorage(tmp_path)
+    for name in ('a', 'b'):
+        storage.store_token(name, TokenData(access_token=f'{name}-old', refresh_token=f'{name}-refresh'))
+    handler = OAuthHandler(token_storage=storage, session=FakeSession())
+    
+    refreshed = []
+    real_refresh = handler.refresh_token
+    
+    def refresh_token(server_name, oauth_config):
+        refreshed.append(server_name)
+        flush_tasks.append(handler._refresh_flush_task)
+        return real_refresh(server_name, oauth_config)
+    
+    flush_tasks = []
+    monkeypatch.setattr(handler, 'refresh_token', refresh_token)
+    
+    results = await asyncio.gather(
+        handler.refresh_token_batched('a', OAUTH_CONFIG),
+        handler.refresh_token_batched('a', OAUTH_CONFIG),
+        handler.refresh_token_batched('b', OAUTH_CONFIG),
+    )
+    
+    assert results == [True, True, True]
+    assert sorted(refreshed) == ['a', 'b']
+    assert handler._inflight_refresh == {}
+    assert storage.get_token('a').access_token.startswith('access-')
+    # The flush task is held while it runs and dropped once it finishes
+    assert all(task is not None for task in flush_tasks)
+    await asyncio.sleep(0)
+    assert handler._refresh_flush_task is None
+    
+    # A later request starts a new refresh rather than reusing the old result
+    assert await handler.refresh_token_batched('a', OAUTH_CONFIG)
+    assert sorted(refreshed) == ['a', 'a', 'b']
@@ -32,74 +32,95 @@ async def test_oauth_bridge():
         sys.executable, "tests/mock_oauth_server.py"
     ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     
-    # Wait for server to start
-    time.sleep(3)
+    # One pooled client for every request to the mock server, so calls reuse
+    # a keep-alive connection
+    import httpx
+    client = httpx.AsyncClient(
+        base_url="http://localhost:8080",
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
     
     try:
+        # Wait for the server to answer, polling with a short backoff
+        deadline = time.monotonic() + 10
+        delay = 0.005
+        while True:
+            try:
+                await client.get("/status", timeout=0.1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() >= deadline:
+                    print("   ❌ Mock server did not start")
+                    return False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        
         # Test discovery
         print("2. Testing OAuth server discovery...")
-        import httpx
         
         # Test root endpoint (should return WWW-Authenticate header)
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:8080/")
-            print(f"   Root endpoint status: {response.status_code}")
-            
-            if "WWW-Authenticate" in response.headers:
-                print(f"   ✅ OAuth discovery header found: {response.headers['WWW-Authenticate']}")
-            else:
-                print("   ❌ OAuth discovery header missing!")
-                return False
-            
-            # Test OAuth metadata
-            metadata_response = await client.get("http://localhost:8080/.well-known/oauth-authorization-server")
-            print(f"   OAuth metadata status: {metadata_response.status_code}")
-            
-            if metadata_response.status_code == 200:
-                metadata = metadata_response.json()
-                print(f"   ✅ OAuth metadata found: {metadata.get('authorization_endpoint')}")
-            else:
-                print("   ❌ OAuth metadata missing!")
-                return False
+        response = await client.get("/")
+        print(f"   Root endpoint status: {response.status_code}")
+        
+        if "WWW-Authenticate" in response.headers:
+            print(f"   ✅ OAuth discovery header found: {response.headers['WWW-Authenticate']}")
+        else:
+            print("   ❌ OAuth discovery header missing!")
+            return False
+        
+        # Test OAuth metadata
+        metadata_response = await client.get("/.well-known/oauth-authorization-server")
+        print(f"   OAuth metadata status: {metadata_response.status_code}")
+        
+        if metadata_response.status_code == 200:
+            metadata = metadata_response.json()
+            print(f"   ✅ OAuth metadata found: {metadata.get('authorization_endpoint')}")
+        else:
+            print("   ❌ OAuth metadata missing!")
+            return False
         
         print("3. Testing MCP OAuth Bridge commands...")
         
+        # The CLI runs in-process rather than as one interpreter per command.
+        # Commands that call asyncio.run() cannot run on this thread while
+        # its loop is running, so they are invoked on a worker thread
+        from click.testing import CliRunner
+        from mcp_oauth_bridge.cli import main as cli
+        runner = CliRunner()
+        loop = asyncio.get_running_loop()
+        
+        def invoke(*args, input=None):
+            return loop.run_in_executor(
+                None, lambda: runner.invoke(cli, list(args), input=input)
+            )
+        
         # Initialize the bridge
         print("   Initializing bridge...")
-        result = subprocess.run([
-            "mcp-oauth-bridge", "init"
-        ], capture_output=True, text=True)
+        result = await invoke("init")
         
-        if result.returncode == 0:
+        if result.exit_code == 0:
             print("   ✅ Bridge initialized successfully")
         else:
-            print(f"   ❌ Bridge initialization failed: {result.stderr}")
+            print(f"   ❌ Bridge initialization failed: {result.output}")
             return False
         
         # Add the mock server (this would normally open a browser)
         print("   Adding mock OAuth server...")
-        result = subprocess.run([
-            "mcp-oauth-bridge", "add", "mock", "http://localhost:8080", "--no-browser"
-        ], capture_output=True, text=True, input="y\n")
+        result = await invoke("add", "mock", "http://localhost:8080", "--no-browser", input="y\n")
         
-        print(f"   Add server output: {result.stdout}")
-        print(f"   Add server errors: {result.stderr}")
+        print(f"   Add server output: {result.output}")
         
         # List configured servers
         print("   Listing configured servers...")
-        result = subprocess.run([
-            "mcp-oauth-bridge", "list"
-        ], capture_output=True, text=True)
+        result = await invoke("list")
         
-        print(f"   Server list: {result.stdout}")
+        print(f"   Server list: {result.output}")
         
         # Check status
         print("   Checking bridge status...")
-        result = subprocess.run([
-            "mcp-oauth-bridge", "status"
-        ], capture_output=True, text=True)
+        result = await invoke("status")
         
-        print(f"   Status: {result.stdout}")
+        print(f"   Status: {result.output}")
         
         print("4. ✅ Test completed successfully!")
         print("\n🚀 Next steps:")
@@ -116,6 +137,7 @@ async def test_oauth_bridge():
     finally:
         # Clean up
         print("Cleaning up...")
+        await client.aclose()
         mock_server.terminate()
         mock_server.wait()
 
@@ -0,0 +1,276 @@
+"""
+Tests for the MCP proxy server
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge import proxy as proxy_module
+from mcp_oauth_bridge.config import Config
+from mcp_oauth_bridge.proxy import ProxyServer
+from mcp_oauth_bridge.tokens import TokenData
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    config = Config(tmp_path)
+    config.add_server("srv", {"url": "https://srv.example.com"})
+    config.add_server("other", {"url": "https://other.example.com"})
+    server = ProxyServer(config)
+    server.token_manager.store_token("srv", TokenData(access_token="token-1", refresh_token="refresh-1"))
+    return server
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Response body delivered in chunks, like one read off the network"""
+    
+    def __init__(self, data, chunk_size=4):
+        self.data = data
+        self.chunk_size = chunk_size
+    
+    async def __aiter__(self):
+        for i in range(0, len(self.data), self.chunk_size):
+            yield self.data[i:i + self.chunk_size]
+
+
+def serve_upstream(proxy, handler):
+    """Send the proxy's forwarded requests to handler(request) -> (status, headers, body)"""
+    async def handle(request):
+        await request.aread()
+        status, headers, body = handler(request)
+        return httpx.Response(status, headers=headers, stream=ChunkedStream(body))
+    
+    proxy._client_options["transport"] = httpx.MockTransport(handle)
+
+
+def app_client(proxy):
+    """HTTP client calling the proxy app in-process"""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=proxy.app), base_url="http://proxy")
+
+
+def fake_refresh(proxy, access_token="token-2"):
+    """Replace the OAuth refresh with one storing access_token; returns the call list"""
+    calls = []
+    
+    async def refresh_token_batched(server_name, oauth_config):
+        calls.append(server_name)
+        await asyncio.sleep(0.01)
+        proxy.token_manager.store_token(server_name, TokenData(access_token=access_token, refresh_token="refresh-2"))
+        return True
+    
+    proxy.oauth_handler.refresh_token_batched = refresh_token_batched
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_unchanged_servers_keep_their_client(proxy):
+    """Changing one server leaves the clients of the others alone"""
+    srv = proxy._get_upstream("srv")
+    other = proxy._get_upstream("other")
+    
+    proxy.config.add_server("other", {"url": "https://moved.example.com"})
+    
+    assert proxy._get_upstream("srv") is srv
+    moved = proxy._get_upstream("other")
+    assert moved is not other
+    assert str(moved.client.base_url).startswith("https://moved.example.com")
+    
+    await asyncio.gather(*proxy._closing)
+    assert other.client.is_closed
+    assert not srv.client.is_closed
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_retired_client_closed_after_inflight_response(proxy):
+    """A removed server's client stays open until its responses finish"""
+    srv = proxy._get_upstream("srv")
+    srv.active += 1
+    
+    proxy.config.remove_server("srv")
+    assert proxy._get_upstream("srv") is None
+    await asyncio.sleep(0)
+    assert not srv.client.is_closed
+    
+    proxy._release_upstream(srv)
+    await asyncio.gather(*proxy._closing)
+    assert srv.client.is_closed
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_token_changes_flushed_after_delay(proxy):
+    """The background flusher writes a burst of token changes once, shortly after"""
+    manager = proxy.token_manager
+    manager.write_behind = True
+    flushes = []
+    flush = manager.flush
+    manager.flush = lambda: (flushes.append(True), flush())
+    
+    flusher = asyncio.ensure_future(proxy._flush_tokens_in_background(delay=0.05))
+    try:
+        await asyncio.sleep(0.1)
+        assert flushes == []
+        
+        # Changes from the loop and from an executor thread both wake it
+        manager.store_token("srv", TokenData(access_token="token-2"))
+        await asyncio.get_running_loop().run_in_executor(
+            None, manager.store_token, "other", TokenData(access_token="token-3")
+        )
+        await asyncio.sleep(0.2)
+        
+        assert flushes == [True]
+        assert not manager.has_pending_writes
+    finally:
+        flusher.cancel()
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_response_streamed_with_upstream_headers(proxy):
+    """Upstream bodies and headers pass through; hop-by-hop headers do not"""
+    seen = []
+    
+    def handler(request):
+        seen.append(request)
+        return 200, [
+            ("content-type", "application/json"),
+            ("set-cookie", "a=1"),
+            ("set-cookie", "b=2"),
+            ("connection", "close"),
+        ], b'{"result": "ok"}'
+    
+    serve_upstream(proxy, handler)
+    async with app_client(proxy) as client:
+        response = await client.post("/mcp/srv/tools/call?x=1&x=2", content=b'{"q": 1}')
+    
+    assert response.status_code == 200
+    assert response.content == b'{"result": "ok"}'
+    assert response.headers.get_list("set-cookie") == ["a=1", "b=2"]
+    assert "connection" not in response.headers
+    
+    forwarded = seen[0]
+    assert str(forwarded.url) == "https://srv.example.com/mcp/tools/call?x=1&x=2"
+    assert forwarded.headers["authorization"] == "Bearer token-1"
+    assert forwarded.content == b'{"q": 1}'
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_buffered_body_replayed_after_401(proxy):
+    """A small body is sent again with the refreshed token after a 401"""
+    calls = fake_refresh(proxy)
+    seen = []
+    
+    def handler(request):
+        seen.append((request.headers["authorization"], request.content))
+        if request.headers["authorization"] == "Bearer token-1":
+            return 401, [], b""
+        return 200, [], b"done"
+    
+    serve_upstream(proxy, handler)
+    async with app_client(proxy) as client:
+        response = await client.post("/mcp/srv/x", content=b"small")
+    
+    assert response.status_code == 200
+    assert response.content == b"done"
+    assert calls == ["srv"]
+    assert seen == [("Bearer token-1", b"small"), ("Bearer token-2", b"small")]
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_not_replayed_after_401(proxy, monkeypatch):
+    """A streamed body cannot be resent: the 401 is returned, the token still refreshed"""
+    monkeypatch.setattr(proxy_module, "_STREAM_BODY_BYTES", 16)
+    calls = fake_refresh(proxy)
+    seen = []
+    
+    def handler(request):
+        seen.append((request.headers["authorization"], request.headers.get("content-length"), request.content))
+        return 401, [], b""
+    
+    serve_upstream(proxy, handler)
+    body = b"x" * 64
+    async with app_client(proxy) as client:
+        response = await client.post("/mcp/srv/x", content=body)
+    
+    assert response.status_code == 401
+    assert calls == ["srv"]
+    # Sent once, streamed with its declared length
+    assert seen == [("Bearer token-1", "64", body)]
+    assert proxy.token_manager.get_token("srv").access_token == "token-2"
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one(proxy):
+    """Requests refreshing the same server at once wait for a single refresh"""
+    calls = fake_refresh(proxy)
+    
+    results = await asyncio.gather(*(proxy._refresh_token("srv") for _ in range(5)))
+    
+    assert results == [True] * 5
+    assert calls == ["srv"]
+    assert proxy._refresh_futures == {}
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_servers_list_revalidated_with_etag(proxy):
+    """/config/servers answers a matching If-None-Match with a bare 304"""
+    async with app_client(proxy) as client:
+        response = await client.get("/config/servers")
+        etag = response.headers["etag"]
+        assert response.json() == {"servers": ["srv", "other"]}
+        
+        cached = await client.get("/config/servers", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        
+        # Any change to the configured servers changes the tag
+        proxy.config.remove_server("other")
+        changed = await client.get("/config/servers", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert changed.json() == {"servers": ["srv"]}
+    await proxy.stop()
+
+
+@pytest.mark.asyncio
+async def test_each_server_has_its_own_client(proxy):
+    """Servers get separate clients, pooled as configured"""
+    srv = proxy._get_upstream("srv")
+    other = proxy._get_upstream("other")
+    
+    assert srv.client is not other.client
+    assert str(srv.client.base_url).startswith("https://srv.example.com")
+    assert proxy._get_upstream("srv") is srv
+    assert proxy._get_upstream("missing") is None
+    
+    limits = proxy._client_options["limits"]
+    assert limits.max_connections == int(proxy.config.http_client["max_connections"])
+    await proxy.stop()
+    assert srv.client.is_closed and other.client.is_closed
+
+
+def test_uvicorn_implementations(monkeypatch):
+    """uvloop and httptools are used when installed, asyncio and h11 otherwise"""
+    installed = set()
+    monkeypatch.setattr(proxy_module.importlib.util, "find_spec", lambda name: name if name in installed else None)
+    monkeypatch.setattr(proxy_module.sys, "platform", "linux")
+    
+    assert proxy_module._uvicorn_implementations() == ("asyncio", "h11")
+    installed.update({"uvloop", "httptools"})
+    assert proxy_module._uvicorn_implementations() == ("uvloop", "httptools")
+    
+    monkeypatch.setattr(proxy_module.sys, "platform", "win32")
+    assert proxy_module._uvicorn_implementations() == ("asyncio", "httptools")
@@ -0,0 +1,197 @@
+"""
+Tests for encrypted token storage
+"""
+
+import asyncio
+import gc
+import logging
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from mcp_oauth_bridge.tokens import RefreshingTokenProvider, TokenData, TokenStorage
+
+
+def test_saves_merge_changes_from_other_storages(tmp_path):
+    """Two storages on one directory (e.g. two workers) keep each other's writes"""
+    first = TokenStorage(tmp_path)
+    second = TokenStorage(tmp_path)
+    first.write_behind = True
+    
+    # Both load the (empty) file before either writes
+    assert first.list_tokens() == {}
+    assert second.list_tokens() == {}
+    
+    first.store_token("alpha", TokenData(access_token="a"))
+    second.store_token("beta", TokenData(access_token="b"))
+    first.flush()
+    
+    tokens = TokenStorage(tmp_path).list_tokens()
+    assert set(tokens) == {"alpha", "beta"}
+    
+    # Removals are merged the same way and stay visible to the other storage
+    second.remove_token("alpha")
+    assert set(first.list_tokens()) == {"beta"}
+
+
+def test_write_behind_waits_for_flush(tmp_path):
+    """With write_behind, changes reach tokens.enc only when flushed"""
+    storage = TokenStorage(tmp_path)
+    storage.write_behind = True
+    queued = []
+    storage.on_write_pending = lambda: queued.append(True)
+    
+    storage.store_token("srv", TokenData(access_token="a"))
+    storage.update_token("srv", access_token="b")
+    
+    assert storage.has_pending_writes
+    assert len(queued) == 2
+    assert not storage.tokens_file.exists()
+    assert storage.get_token("srv").access_token == "b"
+    
+    storage.flush()
+    assert not storage.has_pending_writes
+    assert TokenStorage(tmp_path).get_token("srv").access_token == "b"
+
+
+def test_save_replaces_file_atomically(tmp_path, monkeypatch):
+    """A failed write leaves the previous tokens.enc intact"""
+    storage = TokenStorage(tmp_path)
+    storage.store_token("srv", TokenData(access_token="a"))
+    before = storage.tokens_file.read_bytes()
+    
+    def fail(src, dst):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr("mcp_oauth_bridge.tokens.os.replace", fail)
+    try:
+        storage.store_token("srv", TokenData(access_token="b"))
+    except OSError:
+        pass
+    else:
+        raise AssertionError("store_token should have failed")
+    
+    assert storage.tokens_file.read_bytes() == before
+    # The failed change is dropped and the stored token read back
+    assert storage.get_token("srv").access_token == "a"
+
+
+def test_cache_reloaded_when_file_changes(tmp_path):
+    """A cached storage sees tokens written by another storage"""
+    reader = TokenStorage(tmp_path)
+    TokenStorage(tmp_path).store_token("srv", TokenData(access_token="a"))
+    assert reader.get_token("srv").access_token == "a"
+    
+    # Unchanged file: the cached object itself is returned
+    assert reader.get_token("srv") is reader.get_token("srv")
+    
+    TokenStorage(tmp_path).store_token("srv", TokenData(access_token="b"))
+    assert reader.get_token("srv").access_token == "b"
+
+
+def test_update_token_normalizes_expiry(tmp_path):
+    """An ISO 8601 expires_at given to update_token is stored as a timestamp"""
+    storage = TokenStorage(tmp_path)
+    storage.store_token("srv", TokenData(access_token="a"))
+    
+    assert storage.update_token("srv", expires_at="2030-01-01T00:00:00Z", unknown="ignored")
+    assert storage.get_token("srv").expires_at == 1893456000.0
+    assert not storage.update_token("missing", access_token="x")
+
+
+def make_provider(tmp_path, expires_in, refresh_result=True):
+    """Provider for a stored token expiring in expires_in seconds, with a counted fake refresh"""
+    storage = TokenStorage(tmp_path)
+    storage.store_token("srv", TokenData(
+        access_token="old", refresh_token="r", expires_at=time.time() + expires_in
+    ))
+    calls = []
+    
+    async def refresh():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        if refresh_result is False:
+            return False
+        if refresh_result is not True:
+            raise refresh_result
+        storage.store_token("srv", TokenData(
+            access_token="new", refresh_token="r", expires_at=time.time() + 3600
+        ))
+        return True
+    
+    return RefreshingTokenProvider(storage, "srv", refresh), calls
+
+
+@pytest.mark.asyncio
+async def test_provider_fresh_token(tmp_path):
+    """A fresh token is returned without refreshing"""
+    provider, calls = make_provider(tmp_path, expires_in=3600)
+    assert await provider() == "old"
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_provider_stale_token_refreshed_in_background(tmp_path):
+    """A stale token is returned at once while one refresh runs behind it"""
+    provider, calls = make_provider(tmp_path, expires_in=60)
+    
+    assert await asyncio.gather(provider(), provider()) == ["old", "old"]
+    assert calls == [True]
+    
+    await provider._refresh_task
+    assert await provider() == "new"
+    assert calls == [True]
+
+
+@pytest.mark.asyncio
+async def test_provider_expired_token_waits_for_refresh(tmp_path):
+    """Callers with an expired token wait for one shared refresh"""
+    provider, calls = make_provider(tmp_path, expires_in=-1)
+    
+    assert await asyncio.gather(provider(), provider(), provider()) == ["new"] * 3
+    assert calls == [True]
+
+
+@pytest.mark.asyncio
+async def test_provider_failed_refresh(tmp_path):
+    """A failed refresh of an expired token yields no token"""
+    provider, calls = make_provider(tmp_path, expires_in=-1, refresh_result=RuntimeError("refresh failed"))
+    assert await provider() is None
+
+
+@pytest.mark.asyncio
+async def test_provider_unsuccessful_refresh(tmp_path):
+    """An expired token is not handed out when its refresh reports failure"""
+    provider, calls = make_provider(tmp_path, expires_in=-1, refresh_result=False)
+    assert await provider() is None
+    assert calls == [True]
+
+
+@pytest.mark.asyncio
+async def test_provider_background_failure_logged(tmp_path, caplog):
+    """A failed background refresh is logged rather than left unretrieved"""
+    unhandled = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+    provider, calls = make_provider(tmp_path, expires_in=60, refresh_result=RuntimeError("refresh failed"))
+    
+    with caplog.at_level(logging.WARNING, logger="mcp_oauth_bridge.tokens"):
+        assert await provider() == "old"
+        await asyncio.sleep(0.05)
+    provider._refresh_task = None
+    gc.collect()
+    
+    assert "refresh failed" in caplog.text
+    assert unhandled == []
+
+
+@pytest.mark.asyncio
+async def test_provider_without_token(tmp_path):
+    """No stored token gives None without refreshing"""
+    provider = RefreshingTokenProvider(TokenStorage(tmp_path), "missing", refresh=None)
+    assert await provider() is None